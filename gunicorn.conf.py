@@ -2,3 +2,10 @@ import os
 
 # set gunicorn proc name
 proc_name = os.getenv("APP_NAME", "peachjam")
+
+
+def post_worker_init(worker):
+    # load the query classifier model before the worker serves its first search
+    from peachjam_search.classifier import get_query_classifier
+
+    get_query_classifier().warm_up()
@@ -1,6 +1,10 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import requests
+from django.db import transaction
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +13,8 @@ class Adapter:
     def __init__(self, ingestor, settings):
         self.ingestor = ingestor
         self.settings = settings
+        # shared objects looked up during a batch, see batch()
+        self.lookups = None
         self.predicates = {
             "amended-by": {
                 "name": "amended by",
@@ -68,6 +74,16 @@ class Adapter:
         """
         raise NotImplementedError()
 
+    def get_changes(self, last_refreshed, position=None):
+        """Generate (updated, deleted, position) tuples of document identifiers to update and delete, as they are
+        found. Passing a position back in resumes from just after the changes it was generated with.
+
+        By default, all the changes from check_for_updates are generated at once.
+        """
+        with transaction.atomic():
+            updated, deleted = self.check_for_updates(last_refreshed)
+        yield updated, deleted, None
+
     def update_document(self, document_id):
         """Update the document identified by some opaque id, returned by check_for_updates."""
         raise NotImplementedError()
@@ -76,6 +92,31 @@ class Adapter:
         """Handle webhook from a remote server."""
         pass
 
+    @contextmanager
+    def batch(self):
+        """Update a batch of documents within this context. Shared objects, such as countries and languages, are
+        looked up once and then re-used for the rest of the batch."""
+        self.lookups = {}
+        try:
+            yield
+        finally:
+            self.lookups = None
+
+    def lookup(self, model, key, get):
+        """Get the object of this model identified by key. When updating a batch, get() is only called the first
+        time the object is needed."""
+        if self.lookups is None:
+            return get()
+        if (model, key) not in self.lookups:
+            self.lookups[(model, key)] = get()
+        return self.lookups[(model, key)]
+
+    def clear_lookups(self):
+        """Forget shared objects looked up so far, such as when the transaction that created them was rolled
+        back."""
+        if self.lookups is not None:
+            self.lookups.clear()
+
     def get_edit_url(self, document):
         """Get an adapter-specific edit URL for this document."""
         pass
@@ -86,10 +127,41 @@ class Adapter:
 
 
 class RequestsAdapter(Adapter):
+    # maximum number of concurrent requests when prefetching
+    prefetch_workers = 8
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.client = requests.session()
+        # keep enough connections alive for concurrent prefetching
+        http_adapter = HTTPAdapter(pool_maxsize=self.prefetch_workers)
+        self.client.mount("http://", http_adapter)
+        self.client.mount("https://", http_adapter)
         self.api_url = self.settings["api_url"]
+        # url -> future for the response to a prefetched GET request
+        self.prefetched = {}
+        self.executor = None
+
+    def prefetch(self, urls):
+        """Start fetching these URLs concurrently, in the background. The next client_get for one of these URLs
+        returns the prefetched response (or raises its error), rather than making a new request.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.prefetch_workers,
+                thread_name_prefix=f"{self.name()}-prefetch",
+            )
+        for url in urls:
+            if url not in self.prefetched:
+                self.prefetched[url] = self.executor.submit(
+                    self.client_request, "get", url
+                )
+
+    def clear_prefetched(self):
+        """Discard prefetched responses that weren't used."""
+        for future in self.prefetched.values():
+            future.cancel()
+        self.prefetched.clear()
 
     def client_request(self, method, url, **kwargs):
         logger.debug(f"{method.upper()} {url} kwargs={kwargs}")
@@ -102,6 +174,9 @@ class RequestsAdapter(Adapter):
         return r
 
     def client_get(self, url, **kwargs):
+        future = None if kwargs else self.prefetched.pop(url, None)
+        if future:
+            return future.result()
         return self.client_request("get", url, **kwargs)
 
     def client_post(self, url, **kwargs):
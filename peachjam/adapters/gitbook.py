@@ -17,7 +17,7 @@ from lxml import etree
 
 from peachjam.adapters.base import Adapter
 from peachjam.analysis.html import generate_toc_json_from_html
-from peachjam.helpers import markdownify_pandoc
+from peachjam.helpers import markdownify_pandoc, markdownify_pandoc_many
 from peachjam.models import Book, Image, Language, get_country_and_locality
 from peachjam.plugins import plugins
 from peachjam.tasks import run_ingestor
@@ -185,11 +185,27 @@ class GitbookAdapter(Adapter):
         self.fetch_images(book, repo_path)
 
     def compile_pages(self, book, toc, repo_path):
+        # convert all the pages to html in one batch
+        entries = []
+
+        def collect_entries(entry):
+            entries.append(entry)
+            for kid in entry["children"]:
+                collect_entries(kid)
+
+        for entry in toc:
+            collect_entries(entry)
+        pages_html = self.compile_many_pages(
+            [
+                self.get_repo_file(f"{repo_path}/{entry['path']}").decode("utf-8")
+                for entry in entries
+            ]
+        )
+        page_html = {id(entry): html for entry, html in zip(entries, pages_html)}
+
         def process_entry(entry):
             # html for this page
-            entry_html = self.compile_page(
-                self.get_repo_file(f"{repo_path}/{entry['path']}").decode("utf-8")
-            )
+            entry_html = page_html[id(entry)]
 
             # html for all its children
             entry_html += "\n".join(process_entry(kid) for kid in entry["children"])
@@ -216,10 +232,14 @@ class GitbookAdapter(Adapter):
         doc_content.set_source_html("\n".join(process_entry(e) for e in toc))
 
     def compile_page(self, markdown_text):
+        return self.compile_many_pages([markdown_text])[0]
+
+    def compile_many_pages(self, markdown_texts):
         # preprocess with jinja
-        template = self.jinja_env.from_string(markdown_text)
-        markdown_text = template.render()
-        return markdownify_pandoc(markdown_text)
+        markdown_texts = [
+            self.jinja_env.from_string(text).render() for text in markdown_texts
+        ]
+        return markdownify_pandoc_many(markdown_texts)
 
     def build_toc(self, toc_html):
         """Build a TOC structure from the provided markdown content."""
@@ -17,7 +17,7 @@ from django.utils import translation
 from django.utils.text import slugify
 from languages_plus.models import Language
 
-from peachjam.adapters.base import RequestsAdapter
+from peachjam.adapters.base import Adapter, RequestsAdapter
 from peachjam.helpers import get_update_or_create
 from peachjam.logging import set_log_context
 from peachjam.models import (
@@ -37,6 +37,7 @@ from peachjam.models import (
     Relationship,
     SourceFile,
     Taxonomy,
+    TaxonomyDocumentCount,
     UncommencedProvision,
     UnconstitutionalProvision,
     Work,
@@ -100,12 +101,44 @@ class IndigoAdapter(RequestsAdapter):
 
         return updated_docs, deleted_docs
 
+    def get_changes(self, last_refreshed, position=None):
+        """Generate updated documents as each page of the document lists is fetched. Deleted documents can only be
+        found once all the lists have been fetched, and so aren't checked for when resuming from a position.
+        """
+        uris = set() if position is None else None
+
+        for docs, position in self.get_doc_pages(position):
+            if uris is not None:
+                uris.update(self.get_expression_frbr_uris(docs))
+            yield self.check_for_updated(docs, last_refreshed), [], position
+
+        if uris is None:
+            logger.info("Resumed part way through, not checking for deleted documents")
+        else:
+            yield [], self.find_deleted(uris), position
+
     def get_doc_list(self):
-        results = []
+        return [doc for docs, _ in self.get_doc_pages() for doc in docs]
+
+    def get_doc_list_urls(self):
+        """Get (name, url) tuples for the paginated document lists to fetch."""
+        return [
+            (place_code, f"{self.api_url}/akn/{place_code}/.json")
+            for place_code in self.place_codes
+        ]
 
-        for place_code in self.place_codes:
-            logger.info(f"Getting document list for {place_code}")
-            url = f"{self.api_url}/akn/{place_code}/.json"
+    def get_doc_pages(self, position=None):
+        """Generate (documents, position) tuples for each page of the document lists, as they are fetched. The
+        position can be passed back in to resume from the next page."""
+        doc_lists = self.get_doc_list_urls()
+        if position:
+            names = [name for name, _ in doc_lists]
+            if position["name"] in names:
+                i = names.index(position["name"])
+                doc_lists = [(position["name"], position["url"])] + doc_lists[i + 1 :]
+
+        for name, url in doc_lists:
+            logger.info(f"Getting document list for {name}")
             while url:
                 try:
                     res = self.client_get(url).json()
@@ -114,10 +147,11 @@ class IndigoAdapter(RequestsAdapter):
                         logger.warning(f"Ignoring 404 for {url}")
                         break
                     raise e
-                results.extend(self.filter_document_list(res["results"]))
                 url = res["next"]
-
-        return results
+                yield self.filter_document_list(res["results"]), {
+                    "name": name,
+                    "url": url,
+                }
 
     @cached_property
     def place_codes(self):
@@ -141,7 +175,8 @@ class IndigoAdapter(RequestsAdapter):
             else:
                 codes.append(code)
 
-        return list(set(codes))
+        # sorted, so that the order is stable for resuming
+        return sorted(set(codes))
 
     @cached_property
     def places(self):
@@ -232,16 +267,30 @@ class IndigoAdapter(RequestsAdapter):
         return True
 
     def check_for_deleted(self, docs):
+        return self.find_deleted(self.get_expression_frbr_uris(docs))
+
+    def get_expression_frbr_uris(self, docs):
         uris = {d["expression_frbr_uri"] for d in docs}
         for doc in docs:
             for pit in doc["points_in_time"]:
                 for expr in pit["expressions"]:
                     uris.add(expr["expression_frbr_uri"])
+        return uris
 
-        qs = self.filter_queryset(Legislation.objects)
-        return qs.exclude(expression_frbr_uri__in=list(uris)).values_list(
-            "expression_frbr_uri", flat=True
+    def get_local_documents(self):
+        """The local documents that this adapter is responsible for."""
+        return self.filter_queryset(Legislation.objects)
+
+    def find_deleted(self, uris):
+        """Get the expression FRBR URIs of local documents that aren't in uris (a set), and so have been deleted
+        on the server. This is a set difference done in memory, rather than sending all the URIs to the database.
+        """
+        local_uris = (
+            self.get_local_documents()
+            .values_list("expression_frbr_uri", flat=True)
+            .iterator()
         )
+        return [uri for uri in local_uris if uri not in uris]
 
     def check_for_updated(self, docs, last_refreshed):
         docs = [
@@ -281,11 +330,71 @@ class IndigoAdapter(RequestsAdapter):
                 logger.info("Skipping stub document without publication document")
                 return
 
+        model = self.get_model(document)
+        # fetch everything else we need about the document concurrently, while we update the database
+        self.prefetch(self.get_prefetch_urls(url, document, model))
+        try:
+            self.import_document(url, document, model)
+        finally:
+            self.clear_prefetched()
+
+    def get_prefetch_urls(self, url, document, model):
+        """Get the URLs of the independent resources that import_document will fetch for this document, so that only
+        responses that will be used are fetched."""
+        urls = [f"{url}/toc.json"]
+        pubdoc = document["publication_document"] or {}
+
+        if document["stub"]:
+            # the publication document is the source file
+            urls.append(pubdoc["url"])
+        else:
+            urls.append(document["url"] + ".html?resolver=none")
+            # the source file
+            urls.append(f"{url}.pdf")
+            # the publication file is downloaded unless it is linked to, but its size may still be needed
+            if pubdoc.get("url") and (
+                not pubdoc.get("has_trusted_url") or not pubdoc.get("size")
+            ):
+                urls.append(pubdoc["url"])
+
+        if hasattr(model, "timeline_json") and not self.settings.get("skip_timeline"):
+            urls.append(f"{url}/timeline.json")
+
+        if hasattr(model, "commencements_json") and not self.settings.get(
+            "skip_commencements"
+        ):
+            urls.append(f"{url}/commencements.json")
+
+        if model is Legislation:
+            urls.append(f"{url}/provision-enrichments.json")
+
+        # images are listed from the first media link that has any, which is almost always the first one
+        for link in document["links"] or []:
+            if link["href"].endswith("media.json"):
+                urls.append(link["href"])
+                break
+
+        if self.taxonomy_topic_root_mapping:
+            tree_url = self.get_taxonomy_tree_url()
+            if tree_url:
+                urls.append(tree_url)
+
+        return urls
+
+    def import_document(self, url, document, model):
         frbr_uri = FrbrUri.parse(document["frbr_uri"])
         title = document["title"]
         toc_json = self.get_toc_json(url)
-        jurisdiction = Country.objects.get(iso__iexact=document["country"])
-        language = Language.objects.get(iso_639_2T__iexact=document["language"])
+        jurisdiction = self.lookup(
+            Country,
+            document["country"].lower(),
+            lambda: Country.objects.get(iso__iexact=document["country"]),
+        )
+        language = self.lookup(
+            Language,
+            document["language"].lower(),
+            lambda: Language.objects.get(iso_639_2T__iexact=document["language"]),
+        )
 
         field_data = {
             "title": title,
@@ -313,7 +422,11 @@ class IndigoAdapter(RequestsAdapter):
             "date": datetime.strptime(document["expression_date"], "%Y-%m-%d").date(),
         }
         if document["locality"]:
-            frbr_uri_data["locality"] = Locality.objects.get(code=document["locality"])
+            frbr_uri_data["locality"] = self.lookup(
+                Locality,
+                document["locality"],
+                lambda: Locality.objects.get(code=document["locality"]),
+            )
 
         doc = CoreDocument(**frbr_uri_data)
         doc.work_frbr_uri = doc.generate_work_frbr_uri()
@@ -322,7 +435,6 @@ class IndigoAdapter(RequestsAdapter):
         if frbr_uri.work_uri() != doc.work_frbr_uri:
             raise Exception("FRBR URIs do not match.")
 
-        model = self.get_model(document)
         logger.info(f"Importing as {model}")
 
         if document["subtype"]:
@@ -335,11 +447,15 @@ class IndigoAdapter(RequestsAdapter):
             # we know we're ingesting English names, so to avoid incorrectly overwriting the default language name
             # (which may not be English), for us to use English here
             with translation.override("en"):
-                field_data["nature"] = get_update_or_create(
+                field_data["nature"] = self.lookup(
                     DocumentNature,
-                    {"name": document_nature_name},
-                    code=slugify(document["subtype"]),
-                )[0]
+                    (slugify(document["subtype"]), document_nature_name),
+                    lambda: get_update_or_create(
+                        DocumentNature,
+                        {"name": document_nature_name},
+                        code=slugify(document["subtype"]),
+                    )[0],
+                )
 
         if hasattr(model, "metadata_json"):
             field_data["metadata_json"] = document
@@ -387,9 +503,13 @@ class IndigoAdapter(RequestsAdapter):
         logger.info(f"New document: {new}")
 
         if hasattr(model, "author") and frbr_uri.actor:
-            author = Author.objects.get_or_create(
-                code=frbr_uri.actor, defaults={"name": frbr_uri.actor}
-            )[0]
+            author = self.lookup(
+                Author,
+                frbr_uri.actor,
+                lambda: Author.objects.get_or_create(
+                    code=frbr_uri.actor, defaults={"name": frbr_uri.actor}
+                )[0],
+            )
             created_doc.author.set([author])
 
         self.attach_source_and_publication_file(url, document, created_doc)
@@ -445,6 +565,11 @@ class IndigoAdapter(RequestsAdapter):
         # we ignore duplicate filenames
         filenames = set()
         if image_list:
+            image_urls = {}
+            for result in image_list:
+                if result["mime_type"].startswith("image/"):
+                    image_urls.setdefault(result["filename"], result["url"])
+            self.prefetch(image_urls.values())
             for result in image_list:
                 filename = result["filename"]
                 if (
@@ -786,6 +911,10 @@ class IndigoAdapter(RequestsAdapter):
                             for topic in topics
                         ]
                     )
+                    # bulk_create doesn't send signals
+                    TaxonomyDocumentCount.documents_added(
+                        [(created_document.pk, topic.pk) for topic in topics]
+                    )
 
         if self.add_topics:
             taxonomies = list(Taxonomy.objects.filter(slug__in=self.add_topics))
@@ -908,8 +1037,12 @@ class IndigoAdapter(RequestsAdapter):
 
         return root_mapping, tree_mapping
 
+    def get_taxonomy_tree_url(self):
+        """The URL that get_taxonomy_tree fetches for each document, or None if the tree isn't fetched each time."""
+        return f"{self.api_url}/taxonomy-topics.json"
+
     def get_taxonomy_tree(self):
-        return self.client_get(f"{self.api_url}/taxonomy-topics.json").json()["results"]
+        return self.client_get(self.get_taxonomy_tree_url()).json()["results"]
 
     def handle_webhook(self, request, data):
         from peachjam.tasks import delete_document, update_document
@@ -951,42 +1084,21 @@ class IndigoTopicAdapter(IndigoAdapter):
         super().__init__(*args, **kwargs)
         self.topics = self.settings.get("topics", "").split()
 
-    def get_doc_list(self):
-        results = []
-
-        for topic in self.topics:
-            logger.info(f"Getting document list for topic {topic}")
-            url = f"{self.api_url}/taxonomy-topics/{topic}/work-expressions.json"
-            while url:
-                try:
-                    res = self.client_get(url).json()
-                except requests.exceptions.HTTPError as e:
-                    if e.response.status_code == 404:
-                        logger.warning(f"Ignoring 404 for {url}")
-                        break
-                    raise e
-
-                results.extend(self.filter_document_list(res["results"]))
-                url = res["next"]
-
-        return results
+    def get_doc_list_urls(self):
+        return [
+            (
+                f"topic {topic}",
+                f"{self.api_url}/taxonomy-topics/{topic}/work-expressions.json",
+            )
+            for topic in self.topics
+        ]
 
-    def check_for_deleted(self, docs):
-        """Check for documents this ingestor owns that have been deleted on the server and should be deleted
-        locally.
+    def get_local_documents(self):
+        """Documents this ingestor owns, which may have been deleted on the server and should be deleted locally.
 
         We rely on checking the documents this ingestor owns, because our local topics may not match the server's.
         """
-        uris = {d["expression_frbr_uri"] for d in docs}
-        for doc in docs:
-            for pit in doc["points_in_time"]:
-                for expr in pit["expressions"]:
-                    uris.add(expr["expression_frbr_uri"])
-
-        qs = Legislation.objects.filter(ingestor=self.ingestor)
-        return qs.exclude(expression_frbr_uri__in=list(uris)).values_list(
-            "expression_frbr_uri", flat=True
-        )
+        return Legislation.objects.filter(ingestor=self.ingestor)
 
 
 @plugins.register("ingestor-adapter")
@@ -1016,6 +1128,9 @@ class IndigoEnrichmentDatasetIngestor(IndigoAdapter):
         self.dataset_id = self.settings["dataset_id"]
         self.taxonomy_topic_root = self.settings["taxonomy_topic_root"]
 
+    # changes are found from the dataset as a whole, not page by page
+    get_changes = Adapter.get_changes
+
     def check_for_updates(self, last_refreshed):
         """Check whether the dataset or works referenced by the dataset changed.
 
@@ -1087,6 +1202,10 @@ class IndigoEnrichmentDatasetIngestor(IndigoAdapter):
             roots.append(self.normalize_taxonomy_topic_slugs(root))
         return roots
 
+    def get_taxonomy_tree_url(self):
+        # the tree is fetched once and cached
+        return None
+
     def get_taxonomy_tree(self):
         """Return the cached taxonomy tree for the base taxonomy importer."""
         return self.taxonomy_tree
@@ -1217,6 +1336,9 @@ class IndigoGlossaryAdapter(IndigoAdapter):
     * places: space-separated list of place codes, such as: bw za-*
     """
 
+    # there are only a few glossaries, so they are all checked at once
+    get_changes = Adapter.get_changes
+
     def get_doc_list(self):
         """Returns a list of glossary results that looks like:
         [
@@ -74,29 +74,44 @@ class JudgmentAdapter(BaseJudgmentAdapter):
 
     def check_for_updated(self, last_refreshed):
         log.info(f"Checking for updated decisions since {last_refreshed}")
+        results = [
+            url for urls, _ in self.get_updated_pages(last_refreshed) for url in urls
+        ]
+        log.info(f"Found {len(results)} updated decisions")
+        return results
 
-        results = []
-        params = dict(self.filters)
-        if last_refreshed:
-            # convert to UTC timezone and add suffix Z
-            params["updated_at__gte"] = (
-                last_refreshed.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
-                + "Z"
-            )
+    def get_changes(self, last_refreshed, position=None):
+        log.info(f"Checking for updated decisions since {last_refreshed}")
+        for urls, position in self.get_updated_pages(last_refreshed, position):
+            yield urls, [], position
+
+    def get_updated_pages(self, last_refreshed, position=None):
+        """Generate (urls, position) tuples for each page of decisions updated since last_refreshed, as the pages
+        are fetched. The position is the URL of the next page, and can be passed back in to resume from there.
+        """
+        if position:
+            url = position
+            params = {}
+        else:
+            url = f"{self.api_url}/judgments"
+            params = dict(self.filters)
+            if last_refreshed:
+                # convert to UTC timezone and add suffix Z
+                params["updated_at__gte"] = (
+                    last_refreshed.astimezone(timezone.utc)
+                    .replace(tzinfo=None)
+                    .isoformat()
+                    + "Z"
+                )
 
-        url = f"{self.api_url}/judgments"
         while url:
             res = self.client_get(url, params=params).json()
             params = {}
-            urls = [
+            url = res["next"]
+            yield [
                 f"{self.api_url}/judgments{r['expression_frbr_uri']}"
                 for r in res["results"]
-            ]
-            results.extend(urls)
-            url = res["next"]
-
-        log.info(f"Found {len(results)} updated decisions")
-        return results
+            ], url
 
     def check_for_deleted(self, docs):
         # This is implemented in its own adapter
@@ -114,10 +129,22 @@ class JudgmentAdapter(BaseJudgmentAdapter):
             raise e
 
         frbr_uri = FrbrUri.parse(doc["work_frbr_uri"])
-        jurisdiction = Country.objects.get(iso__iexact=doc["jurisdiction"])
-        language = Language.objects.get(iso_639_1__iexact=doc["language"])
-        court, _ = Court.objects.get_or_create(
-            code=doc["court"]["code"], defaults={"name": doc["court"]["name"]}
+        jurisdiction = self.lookup(
+            Country,
+            doc["jurisdiction"].lower(),
+            lambda: Country.objects.get(iso__iexact=doc["jurisdiction"]),
+        )
+        language = self.lookup(
+            Language,
+            doc["language"].lower(),
+            lambda: Language.objects.get(iso_639_1__iexact=doc["language"]),
+        )
+        court = self.lookup(
+            Court,
+            doc["court"]["code"],
+            lambda: Court.objects.get_or_create(
+                code=doc["court"]["code"], defaults={"name": doc["court"]["name"]}
+            )[0],
         )
         registry = self.get_registry(doc, court)
         locality = self.get_locality(doc, jurisdiction)
@@ -224,18 +251,25 @@ class JudgmentAdapter(BaseJudgmentAdapter):
 
     def get_registry(self, doc, court):
         if doc.get("registry"):
-            registry, _ = CourtRegistry.objects.get_or_create(
-                court=court,
-                code=doc["registry"]["code"],
-                defaults={"name": doc["registry"]["name"]},
+            return self.lookup(
+                CourtRegistry,
+                (court.pk, doc["registry"]["code"]),
+                lambda: CourtRegistry.objects.get_or_create(
+                    court=court,
+                    code=doc["registry"]["code"],
+                    defaults={"name": doc["registry"]["name"]},
+                )[0],
             )
-            return registry
         return None
 
     def get_locality(self, doc, jurisdiction):
         if doc.get("locality"):
-            return Locality.objects.get(
-                code=doc["locality"]["code"], jurisdiction=jurisdiction
+            return self.lookup(
+                Locality,
+                (jurisdiction.pk, doc["locality"]["code"]),
+                lambda: Locality.objects.get(
+                    code=doc["locality"]["code"], jurisdiction=jurisdiction
+                ),
             )
         return None
 
@@ -243,8 +277,12 @@ class JudgmentAdapter(BaseJudgmentAdapter):
         CaseNumber.objects.filter(document=doc).delete()
         for case_number in case_numbers:
             if case_number["matter_type"]:
-                matter_type, _ = MatterType.objects.get_or_create(
-                    name=case_number["matter_type"]
+                matter_type = self.lookup(
+                    MatterType,
+                    case_number["matter_type"],
+                    lambda: MatterType.objects.get_or_create(
+                        name=case_number["matter_type"]
+                    )[0],
                 )
             else:
                 matter_type = None
@@ -261,7 +299,9 @@ class JudgmentAdapter(BaseJudgmentAdapter):
         doc.judges.clear()
         if judges:
             for judge in judges:
-                j, _ = Judge.objects.get_or_create(name=judge)
+                j = self.lookup(
+                    Judge, judge, lambda: Judge.objects.get_or_create(name=judge)[0]
+                )
                 doc.judges.add(j)
 
     def get_taxonomies(self, topics, doc):
@@ -269,7 +309,11 @@ class JudgmentAdapter(BaseJudgmentAdapter):
         if topics:
             for topic in topics:
                 # we are not building a tree here
-                taxonomy = Taxonomy.objects.filter(slug=topic).first()
+                taxonomy = self.lookup(
+                    Taxonomy,
+                    topic,
+                    lambda: Taxonomy.objects.filter(slug=topic).first(),
+                )
                 if taxonomy:
                     DocumentTopic.objects.create(
                         document=doc,
@@ -151,6 +151,7 @@ from peachjam.resources import (
 from peachjam.tasks import extract_citations as extract_citations_task
 from peachjam.tasks import (
     generate_judgment_summary,
+    render_social_image,
     update_extracted_citations_for_a_work,
 )
 from peachjam_search.models import SavedSearch
@@ -1046,7 +1047,7 @@ class DocumentAdmin(BackgroundTasksAdminMixin, AccessGroupMixin, BaseAdmin):
             form, alternative_names_has_changed, change
         ):
             cp = citations_processor()
-            cp.queue_re_extract_citations(form.instance.date)
+            cp.queue_re_extract_citations(form.instance.date, form.instance)
 
         super().save_related(request, form, formsets, change)
         form.instance.save()
@@ -1182,7 +1183,12 @@ class DocumentAdmin(BackgroundTasksAdminMixin, AccessGroupMixin, BaseAdmin):
 
     def publish(self, request, queryset):
         with transaction.atomic():
+            unpublished = list(
+                queryset.filter(published=False).values_list("pk", flat=True)
+            )
             queryset.update(published=True)
+            for pk in unpublished:
+                render_social_image(pk)
         self.message_user(request, _("Documents published."))
 
     publish.short_description = gettext_lazy("Publish selected documents")
@@ -2170,11 +2176,12 @@ class IngestorAdmin(BackgroundTasksAdminMixin, admin.ModelAdmin):
         "last_refreshed_at",
         "enabled",
     )
-    readonly_fields = ("background_tasks",)
+    readonly_fields = ("cursor", "background_tasks")
     fields = (
         "adapter",
         "name",
         "last_refreshed_at",
+        "cursor",
         "repeat",
         "schedule",
         "enabled",
@@ -2187,7 +2194,7 @@ class IngestorAdmin(BackgroundTasksAdminMixin, admin.ModelAdmin):
         form.instance.queue_task()
 
     def refresh_all_content(self, request, queryset):
-        queryset.update(last_refreshed_at=None)
+        queryset.update(last_refreshed_at=None, cursor=None)
         for ing in queryset:
             # queue up the background ingestor update task
             ing.queue_task()
@@ -3036,11 +3043,15 @@ class CitationLinkAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(CitationProcessing)
+class CitationProcessingAdmin(admin.ModelAdmin):
+    raw_id_fields = ("works",)
+
+
 admin.site.register(
     [
         AttachedFileNature,
         CaseAction,
-        CitationProcessing,
         CourtDivision,
         CustomPropertyLabel,
         DocumentAccessGroup,
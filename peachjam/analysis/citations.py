@@ -1,5 +1,6 @@
 import logging
 from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 
 import lxml.html
 import requests
@@ -7,9 +8,10 @@ from cobalt import FrbrUri
 from django.conf import settings
 from docpipe.matchers import ExtractedCitation
 from lxml.etree import ParseError
+from requests.adapters import HTTPAdapter
 
 from peachjam.models import CitationLink, ProvisionCitation
-from peachjam.xmlutils import get_following_text, get_preceding_text, parse_html_str
+from peachjam.xmlutils import get_surrounding_texts, parse_html_str
 
 log = logging.getLogger(__name__)
 
@@ -110,9 +112,11 @@ class CitationAnalyser:
         return None
 
     def create_from_html(self, document):
-        """Create citation contexts from an HTML document."""
-        from peachjam.models import Work
+        """Create citation contexts from an HTML document.
 
+        This is done in two passes: first all the links are collected and their works are looked up in a single
+        query, then the context for all the links is calculated with a single traversal of the document.
+        """
         doc_content = document.get_or_create_document_content()
         if not doc_content.content_html:
             log.warning("No HTML content to extract citation contexts from.")
@@ -128,122 +132,204 @@ class CitationAnalyser:
             xpath = '//a[starts-with(@href, "/akn")]'
             attr = "href"
 
-        for a in doc_content.content_html_tree.xpath(xpath):
-            try:
-                href = a.attrib[attr]
-                log.debug(f"Processing citation link to: {href}")
-                work_frbr_uri = FrbrUri.parse(href).work_uri()
-                work = Work.objects.get(frbr_uri=work_frbr_uri)
-                exact = a.text_content().strip()
-
-                prefix = get_preceding_text(
-                    a, self.context_not_above, self.context_length
-                )
-                suffix = get_following_text(
-                    a, self.context_not_above, self.context_length
-                )
-                ctx = ProvisionCitation.objects.create(
+        root = doc_content.content_html_tree
+        links = [(a, a.attrib[attr]) for a in root.xpath(xpath)]
+        works = self.resolve_works(document, [href for a, href in links])
+        links = [(a, href) for a, href in links if href in works]
+
+        contexts = get_surrounding_texts(
+            root, [a for a, href in links], self.context_not_above, self.context_length
+        )
+        ProvisionCitation.bulk_create_citations(
+            [
+                ProvisionCitation(
                     citing_document=document,
                     prefix=prefix,
                     suffix=suffix,
-                    exact=exact,
-                    work=work,
+                    exact=a.text_content().strip(),
+                    work_id=works[href],
                     provision_eid=self.get_provision_eid(href),
                 )
-                log.debug(f"Created citation context {ctx}")
-            except ValueError as e:
-                log.warning(
-                    "Invalid FRBR URI in citation link %s in document %s: %s",
-                    a.attrib[attr],
-                    document,
-                    e,
-                )
-            except Work.DoesNotExist:
-                log.warning(
-                    "No work found for FRBR URI %s in document %s",
-                    a.attrib[attr],
-                    document,
-                )
+                for (a, href), (prefix, suffix) in zip(links, contexts)
+            ]
+        )
 
     def create_from_citation_links(self, document):
         """Create a citation context from an existing CitationLink."""
-        from peachjam.models import Work
-
-        for citation_link in CitationLink.objects.filter(document=document):
-
-            try:
-                url = citation_link.url
-                frbr_uri = FrbrUri.parse(url).work_uri()
-                target_work = Work.objects.get(frbr_uri=frbr_uri)
-                exact = None
-                prefix = None
-                suffix = None
-                if citation_link.target_selectors:
-                    for selector in citation_link.target_selectors:
-                        if selector["type"] == "TextQuoteSelector":
-                            exact = selector.get("exact")
-                            prefix = selector.get("prefix")
-                            suffix = selector.get("suffix")
-
-                ProvisionCitation.objects.create(
+        citation_links = list(CitationLink.objects.filter(document=document))
+        works = self.resolve_works(document, [link.url for link in citation_links])
+
+        citations = []
+        for citation_link in citation_links:
+            if citation_link.url not in works:
+                continue
+
+            exact = None
+            prefix = None
+            suffix = None
+            if citation_link.target_selectors:
+                for selector in citation_link.target_selectors:
+                    if selector["type"] == "TextQuoteSelector":
+                        exact = selector.get("exact")
+                        prefix = selector.get("prefix")
+                        suffix = selector.get("suffix")
+
+            citations.append(
+                ProvisionCitation(
                     citing_document=document,
                     prefix=prefix,
                     suffix=suffix,
                     exact=exact,
-                    work=target_work,
+                    work_id=works[citation_link.url],
                     provision_eid=self.get_provision_eid(citation_link.url),
                 )
+            )
+
+        ProvisionCitation.bulk_create_citations(citations)
+
+    def resolve_works(self, document, urls):
+        """Resolve the cited urls to works with a single query. Returns a dict from url to work id, for those urls
+        that have a work."""
+        from peachjam.models import Work
+
+        url_work_uris = {}
+        for url in urls:
+            if url in url_work_uris:
+                continue
+            try:
+                url_work_uris[url] = FrbrUri.parse(url).work_uri()
             except ValueError as e:
                 log.warning(
                     "Invalid FRBR URI in citation link %s in document %s: %s",
-                    citation_link.url,
+                    url,
                     document,
                     e,
                 )
-            except Work.DoesNotExist:
+
+        work_ids = dict(
+            Work.objects.filter(frbr_uri__in=set(url_work_uris.values())).values_list(
+                "frbr_uri", "pk"
+            )
+        )
+
+        works = {}
+        for url, work_frbr_uri in url_work_uris.items():
+            if work_frbr_uri in work_ids:
+                works[url] = work_ids[work_frbr_uri]
+            else:
                 log.warning(
-                    "No work found for FRBR URI %s in document %s",
-                    citation_link.url,
-                    document,
+                    "No work found for FRBR URI %s in document %s", url, document
                 )
+        return works
 
 
 class CitatorMatcher:
-    """Matcher that delegates to the Citator service."""
+    """Matcher that delegates to the Citator service.
+
+    Large documents are split into chunks that are sent to Citator concurrently, and the results are merged back
+    together. Text is split on page boundaries, and pages that are too large on their own are split into overlapping
+    pieces. HTML is split into groups of sibling sections.
+    """
 
     citator_url = settings.PEACHJAM["CITATOR_API"]
     citator_key = settings.PEACHJAM["LAWSAFRICA_API_KEY"]
-    max_text_size = 1024 * 1024 * 2
+    # maximum size of a chunk of text or HTML sent to Citator in one request
+    chunk_size = 256 * 1024
+    # overlap between pieces of a page that is larger than chunk_size, which must be longer than any citation
+    overlap = 1000
+    # maximum number of concurrent requests to Citator
+    max_workers = 4
+    timeout = 60 * 10
+    _session = None
 
     def __init__(self):
         # extracted citations
         self.citations = []
 
+    @classmethod
+    def get_session(cls):
+        """A session shared by all matchers, so that connections to Citator are kept alive and re-used."""
+        if cls._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=cls.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Authorization"] = f"token {cls.citator_key}"
+            cls._session = session
+        return cls._session
+
     def markup_html_matches(self, frbr_uri, html):
-        html_text = lxml.html.tostring(html, encoding="unicode")
-        resp = self.call_citator(
+        chunks = self.chunk_html(html)
+        if len(chunks) <= 1:
+            html_text = lxml.html.tostring(html, encoding="unicode")
+            resp = self.call_citator(
+                {
+                    "frbr_uri": frbr_uri.expression_uri(),
+                    "format": "html",
+                    "body": html_text,
+                }
+            )
+            # returned the new, marked up, html
+            return lxml.html.fromstring(resp["body"])
+
+        log.info(f"Sending HTML to Citator in {len(chunks)} chunks")
+        bodies = [
             {
                 "frbr_uri": frbr_uri.expression_uri(),
                 "format": "html",
-                "body": html_text,
+                "body": "<div>"
+                + "".join(lxml.html.tostring(e, encoding="unicode") for e in chunk)
+                + "</div>",
             }
-        )
-        # returned the new, marked up, html
-        return lxml.html.fromstring(resp["body"])
+            for parent, chunk in chunks
+        ]
+        for (parent, chunk), resp in zip(chunks, self.call_citator_many(bodies)):
+            self.replace_elements(parent, chunk, lxml.html.fromstring(resp["body"]))
+        return html
 
-    def extract_text_matches(self, frbr_uri, text):
-        # Only extract citations from the first 2MB of text. In practice, this impacts only very large gazettes
-        # from SA.
-        # Size distribution of gazettes:
-        # - over 1MB: 1000
-        # - over 2MB: 306
-        # - over 5MB: 112
-        if len(text) > self.max_text_size:
-            log.info(
-                f"Limiting to first {self.max_text_size} bytes of text (actual size: {len(text)} bytes)"
-            )
-            text = text[: self.max_text_size]
+    def chunk_html(self, html):
+        """Split the children of the outermost element with more than one child into groups of siblings, each
+        smaller than chunk_size when serialised (unless a single element is larger). Returns a list of
+        (parent, [elements]) tuples."""
+        parent = html
+        while len(parent) == 1:
+            parent = parent[0]
+
+        if (parent.text or "").strip():
+            # text directly in the parent can't be chunked
+            return []
+
+        chunks = []
+        chunk = []
+        size = 0
+        for element in parent:
+            element_size = len(lxml.html.tostring(element, encoding="unicode"))
+            if chunk and size + element_size > self.chunk_size:
+                chunks.append((parent, chunk))
+                chunk = []
+                size = 0
+            chunk.append(element)
+            size += element_size
+        if chunk:
+            chunks.append((parent, chunk))
+        return chunks
+
+    def replace_elements(self, parent, old, container):
+        """Replace the old elements in parent with the children of container."""
+        index = parent.index(old[0])
+        for element in old:
+            parent.remove(element)
+        if container.text:
+            # the container's leading text goes after the previous sibling
+            if index > 0:
+                prev = parent[index - 1]
+                prev.tail = (prev.tail or "") + container.text
+            else:
+                parent.text = (parent.text or "") + container.text
+        for i, element in enumerate(list(container)):
+            parent.insert(index + i, element)
 
+    def extract_text_matches(self, frbr_uri, text):
         # For text documents, we need to provide the existing citations for context. For html, existing citations
         # are already marked up in the HTML.
         citations = [
@@ -253,19 +339,26 @@ class CitatorMatcher:
             )
         ]
 
-        resp = self.call_citator(
+        chunks = self.chunk_text(text)
+        if len(chunks) > 1:
+            log.info(f"Sending text to Citator in {len(chunks)} chunks")
+
+        bodies = [
             {
                 "frbr_uri": frbr_uri.expression_uri(),
                 "format": "text",
-                "body": text,
-                "citations": citations,
+                "body": "\x0c".join(page[0] for page in pages),
+                "citations": self.citations_for_chunk(citations, pages),
             }
-        )
+            for pages in chunks
+        ]
+        responses = self.call_citator_many(bodies)
+        found = self.merge_chunk_citations(chunks, [r["citations"] for r in responses])
 
         # only keep new citations
-        existing = {(c["start"], c["end"]) for c in citations}
-        citations = [
-            c for c in resp["citations"] if (c["start"], c["end"]) not in existing
+        existing = {(c["target_id"], c["start"], c["end"]) for c in citations}
+        found = [
+            c for c in found if (c["target_id"], c["start"], c["end"]) not in existing
         ]
 
         # store the extracted citations
@@ -279,16 +372,110 @@ class CitatorMatcher:
                 c["prefix"],
                 c["suffix"],
             )
-            for c in citations
+            for c in found
         ]
 
+    def chunk_text(self, text):
+        """Split text into chunks of whole pages, each at most chunk_size long. A page longer than chunk_size is split
+        into overlapping pieces, each in a chunk of its own.
+
+        Returns a list of chunks, each of which is a list of (text, page number, offset in page, owned until) tuples.
+        Citations that start at or after "owned until" are left to the next, overlapping, piece of the page.
+        """
+        chunks = []
+        chunk = []
+        size = 0
+        for page_num, page in enumerate(text.split("\x0c")):
+            if len(page) > self.chunk_size:
+                if chunk:
+                    chunks.append(chunk)
+                    chunk = []
+                    size = 0
+                step = self.chunk_size - self.overlap
+                for start in range(0, len(page) - self.overlap, step):
+                    has_next = start + step < len(page) - self.overlap
+                    chunks.append(
+                        [
+                            (
+                                page[start : start + self.chunk_size],
+                                page_num,
+                                start,
+                                start + step if has_next else None,
+                            )
+                        ]
+                    )
+                continue
+
+            if chunk and size + len(page) + 1 > self.chunk_size:
+                chunks.append(chunk)
+                chunk = []
+                size = 0
+            chunk.append((page, page_num, 0, None))
+            size += len(page) + 1
+
+        if chunk or not chunks:
+            chunks.append(chunk or [("", 0, 0, None)])
+        return chunks
+
+    def citations_for_chunk(self, citations, pages):
+        """Existing citations that fall within a chunk's pages, adjusted to be relative to the chunk."""
+        result = []
+        for i, (page, page_num, offset, _) in enumerate(pages):
+            for c in citations:
+                if (
+                    c["target_id"] == page_num
+                    and c["start"] >= offset
+                    and c["end"] <= offset + len(page)
+                ):
+                    result.append(
+                        {
+                            **c,
+                            "target_id": i,
+                            "start": c["start"] - offset,
+                            "end": c["end"] - offset,
+                        }
+                    )
+        return result
+
+    def merge_chunk_citations(self, chunks, chunk_citations):
+        """Merge citations found in each chunk back into page numbers and offsets for the whole text.
+
+        Where pieces of a page overlap, a citation belongs to the piece it starts in, before the next piece starts.
+        Partial citations found at the start of the next piece overlap those, and are ignored.
+        """
+        merged = []
+        # the last citation kept for each page, to check for overlaps
+        last = {}
+        for pages, citations in zip(chunks, chunk_citations):
+            for c in sorted(citations, key=lambda c: (c["target_id"], c["start"])):
+                _, page_num, offset, owned_until = pages[c["target_id"]]
+                c = {
+                    **c,
+                    "target_id": page_num,
+                    "start": c["start"] + offset,
+                    "end": c["end"] + offset,
+                }
+                if owned_until is not None and c["start"] >= owned_until:
+                    continue
+                prev = last.get(page_num)
+                if prev and c["start"] < prev["end"]:
+                    continue
+                merged.append(c)
+                last[page_num] = c
+        return merged
+
+    def call_citator_many(self, bodies):
+        """Call Citator for each body concurrently, returning the responses in order."""
+        if len(bodies) == 1:
+            return [self.call_citator(bodies[0])]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.call_citator, bodies))
+
     def call_citator(self, body):
-        headers = {"Authorization": f"token {self.citator_key}"}
-        resp = requests.post(
+        resp = self.get_session().post(
             self.citator_url + "extract-citations",
             json=body,
-            headers=headers,
-            timeout=60 * 10,
+            timeout=self.timeout,
         )
         resp.raise_for_status()
         return resp.json()
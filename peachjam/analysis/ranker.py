@@ -3,12 +3,12 @@ import logging
 import math
 
 import igraph as ig
-from elasticsearch import helpers
 
-from peachjam.models import CoreDocument, pj_settings
-from peachjam_search.documents import MultiLanguageIndexManager, SearchableDocument
+from peachjam.citation_graph import citation_graph_store
+from peachjam.models import CoreDocument, Work, pj_settings
+from peachjam_search.models import PendingSearchUpdate
 
-from ..models import ExtractedCitation
+from ..models import CitationSummary, ExtractedCitation
 
 log = logging.getLogger(__name__)
 
@@ -87,7 +87,12 @@ class GraphRanker:
         self.publish_ranks()
 
     def populate_graph(self):
-        """Build the graph database from our database."""
+        """Build the graph database from the citation graph snapshot, or from our database if numpy isn't
+        available."""
+        if citation_graph_store.enabled():
+            self.populate_graph_from_snapshot()
+            return
+
         citations = ExtractedCitation.objects.prefetch_related(
             "citing_work", "target_work"
         ).all()
@@ -108,6 +113,28 @@ class GraphRanker:
         self.graph = ig.Graph(n=len(self.work_ids), edges=edges, directed=True)
         log.info("Created graph")
 
+    def populate_graph_from_snapshot(self):
+        # bring the snapshot up to date first
+        snapshot = citation_graph_store.update()
+
+        log.info("Creating graph from snapshot")
+        works = Work.objects.in_bulk(snapshot.works.tolist())
+        # map the snapshot's nodes to igraph's 0-indexed vertices, skipping works that have since been deleted
+        vertices = {}
+        self.work_ids = {}
+        for node, work_id in enumerate(snapshot.works.tolist()):
+            work = works.get(work_id)
+            if work is not None:
+                vertices[node] = self.work_ids[work] = len(self.work_ids)
+        citing, target = snapshot.edges()
+        edges = [
+            (vertices[c], vertices[t])
+            for c, t in zip(citing.tolist(), target.tolist())
+            if c in vertices and t in vertices
+        ]
+        self.graph = ig.Graph(n=len(self.work_ids), edges=edges, directed=True)
+        log.info("Created graph")
+
     def calculate_ranks(self):
         log.info("Running pagerank")
         self.ranks = self.graph.pagerank()
@@ -193,34 +220,17 @@ class GraphRanker:
                     pagerank_changed.append(work)
 
         log.info(f"Updated database with {count} works")
+        if count:
+            CitationSummary.refresh_authority_scores()
         self.update_elasticsearch(pagerank_changed)
 
     def update_elasticsearch(self, works):
-        """use elasticsearch client to bulk update the "ranking" field on the provided docs"""
-        docs = CoreDocument.objects.filter(work__in=works).values(
-            "id", "work__pagerank", "language__iso_639_2T"
-        )
-        log.info(
-            f"updating elasticsearch with {len(docs)} documents",
-        )
-        actions = (
-            {
-                "_op_type": "update",
-                "_index": MultiLanguageIndexManager.get_instance().get_index_for_language(
-                    doc["language__iso_639_2T"]
-                ),
-                "_id": doc["id"],
-                "doc": {"ranking": doc["work__pagerank"]},
-            }
-            for doc in docs
-        )
-        helpers.bulk(
-            SearchableDocument._index._get_connection(),
-            actions,
-            chunk_size=1000,
-            request_timeout=60 * 60 * 30,
+        """Queue partial updates of the "ranking" field in the search index for the documents of the given works."""
+        doc_ids = list(
+            CoreDocument.objects.filter(work__in=works).values_list("id", flat=True)
         )
-        log.info("Updated elasticsearch")
+        log.info(f"Queuing ranking updates for {len(doc_ids)} documents")
+        PendingSearchUpdate.queue(doc_ids, ["ranking"])
 
 
 def percentile(values, percent):
@@ -16,6 +16,7 @@ class PeachJamConfig(AppConfig):
         import peachjam.adapters  # noqa
         import peachjam.checks  # noqa
         import peachjam.signals  # noqa
+        import peachjam.soffice
         from peachjam.auth import create_all_users_permission_group_after_migrate
         from peachjam.helpers import get_country_absolute_url
 
@@ -50,13 +51,23 @@ class PeachJamConfig(AppConfig):
                 "soffice",
                 "--headless",
             ]
+            # the pooled soffice instances are long-lived, so only limit their memory
+            peachjam.soffice.TIMEOUT = soffice.TIMEOUT
+            peachjam.soffice.SOFFICE_CMD = [
+                "prlimit",
+                f"--as={2 * 1024 * 1024 * 1024}",
+                "--",
+                "soffice",
+            ]
 
             from background_task.models import Task
 
             from peachjam.models import Ingestor
             from peachjam.tasks import (
                 rank_works,
+                reconcile_taxonomy_document_counts,
                 send_timeline_email_alerts,
+                update_citation_graph,
                 update_user_follows,
             )
 
@@ -72,3 +83,6 @@ class PeachJamConfig(AppConfig):
             rank_works(schedule=run_at, repeat=Task.WEEKLY)
             update_user_follows(schedule=Task.HOURLY, repeat=Task.DAILY)
             send_timeline_email_alerts(schedule=Task.HOURLY, repeat=Task.DAILY)
+            reconcile_taxonomy_document_counts(schedule=Task.HOURLY, repeat=Task.DAILY)
+            # rebuild the citation graph from scratch daily, in case a change was missed
+            update_citation_graph(full=True, schedule=Task.HOURLY, repeat=Task.DAILY)
@@ -0,0 +1,471 @@
+"""A compact, read-only snapshot of the citation graph between works, for answering "cites" and "cited by" queries
+without going to the database.
+
+The snapshot is stored as compressed sparse row (CSR) arrays in .npy files, which are memory-mapped when they are
+loaded, so that the processes on a host share one copy of the graph through the OS page cache:
+
+* works: the sorted ids of all works that cite or are cited by another work; a work's index in this array is its node
+* out_indptr, out_indices: for node i, out_indices[out_indptr[i]:out_indptr[i + 1]] are the nodes it cites
+* in_indptr, in_indices: for node i, in_indices[in_indptr[i]:in_indptr[i + 1]] are the nodes that cite it
+
+Changes to ExtractedCitations are recorded as CitationGraphChange rows (see signals.py), one for each citing work when
+the transaction commits, and the update_citation_graph task applies them to the snapshot by replacing the outgoing
+citations of the changed works. Until that has happened, get_citation_graph() returns a graph that patches the
+snapshot with the changed works' citations from the database.
+
+Each update writes a new snapshot directory and then switches the "current" symlink to it, so readers always see a
+complete snapshot. Updates hold a lock file, so only one runs at a time. The snapshot directory
+(PEACHJAM["CITATION_GRAPH_DIR"]) must be shared by the processes that update and read it.
+"""
+
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from peachjam.models import CitationGraphChange, ExtractedCitation
+
+try:
+    # NOTE: if numpy is not installed, run: pip install -e '.[ml]'
+    import numpy as np
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+# the works whose citations have changed since the snapshot was updated, cached briefly so that most queries don't need
+# to check the database
+PENDING_KEY = "peachjam:citation_graph_pending"
+PENDING_TIMEOUT = 60
+# if more works than this have changed, the snapshot isn't patched and the database is used instead
+MAX_PENDING_WORKS = 1000
+
+
+class CitationGraphSnapshot:
+    """The citation graph, loaded from a snapshot directory."""
+
+    ARRAYS = ["works", "out_indptr", "out_indices", "in_indptr", "in_indices"]
+
+    def __init__(self, path, mmap_mode="r"):
+        self.path = path
+        for name in self.ARRAYS:
+            setattr(
+                self,
+                name,
+                np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode),
+            )
+
+    @classmethod
+    def write(cls, path, citing, target):
+        """Write a snapshot of the edges from the citing work ids to the target work ids into the directory path."""
+        pairs = np.stack(
+            [np.asarray(citing, dtype=np.int64), np.asarray(target, dtype=np.int64)],
+            axis=1,
+        )
+        # sorted by citing and then target work id, without duplicates
+        pairs = np.unique(pairs, axis=0) if len(pairs) else pairs
+        works = np.unique(pairs)
+        n = len(works)
+        src = np.searchsorted(works, pairs[:, 0])
+        dst = np.searchsorted(works, pairs[:, 1])
+
+        arrays = {"works": works}
+        arrays["out_indptr"] = cls.indptr(src, n)
+        arrays["out_indices"] = dst.astype(np.int32)
+        arrays["in_indptr"] = cls.indptr(dst, n)
+        arrays["in_indices"] = src[np.lexsort((src, dst))].astype(np.int32)
+
+        os.makedirs(path)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+
+    @classmethod
+    def indptr(cls, rows, n):
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return indptr
+
+    def __len__(self):
+        return len(self.works)
+
+    def node(self, work_id):
+        """The node for the work, or None if it isn't in the graph."""
+        i = int(np.searchsorted(self.works, work_id))
+        if i < len(self.works) and self.works[i] == work_id:
+            return i
+
+    def edges(self):
+        """The (citing, target) node arrays of all the edges in the graph."""
+        return (
+            np.repeat(
+                np.arange(len(self.works), dtype=np.int32), np.diff(self.out_indptr)
+            ),
+            np.asarray(self.out_indices),
+        )
+
+    def out_nodes(self, i):
+        return self.out_indices[self.out_indptr[i] : self.out_indptr[i + 1]]
+
+    def in_nodes(self, i):
+        return self.in_indices[self.in_indptr[i] : self.in_indptr[i + 1]]
+
+    def neighbour_nodes(self, nodes, incoming):
+        """The nodes that cite (incoming) or are cited by any of nodes, with repeats."""
+        indptr, indices = (
+            (self.in_indptr, self.in_indices)
+            if incoming
+            else (self.out_indptr, self.out_indices)
+        )
+        if not len(nodes):
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([indices[indptr[i] : indptr[i + 1]] for i in nodes])
+
+    def cites(self, work_id):
+        """The ids of the works that the work cites."""
+        i = self.node(work_id)
+        return [] if i is None else self.works[self.out_nodes(i)].tolist()
+
+    def cited_by(self, work_id):
+        """The ids of the works that cite the work."""
+        i = self.node(work_id)
+        return [] if i is None else self.works[self.in_nodes(i)].tolist()
+
+    def cited_by_many(self, work_ids):
+        """A dict from each of the work ids to the ids of the works that cite it."""
+        return {work_id: self.cited_by(work_id) for work_id in work_ids}
+
+    def in_degree(self, work_id):
+        """The number of works that cite the work."""
+        i = self.node(work_id)
+        return 0 if i is None else int(self.in_indptr[i + 1] - self.in_indptr[i])
+
+    def two_hop_neighbours(self, work_id, incoming=False):
+        """The ids of the works two citations away from the work, but not one, following citations from the work
+        (or to it, if incoming is True)."""
+        i = self.node(work_id)
+        if i is None:
+            return []
+        one = self.neighbour_nodes([i], incoming)
+        two = np.setdiff1d(self.neighbour_nodes(one, incoming), one)
+        return self.works[two[two != i]].tolist()
+
+    def co_cited(self, work_id, limit=10):
+        """The works most often cited by the works that cite the work, as a list of (work id, count) tuples."""
+        i = self.node(work_id)
+        if i is None:
+            return []
+        nodes, counts = np.unique(
+            self.neighbour_nodes(self.in_nodes(i), incoming=False), return_counts=True
+        )
+        keep = nodes != i
+        nodes, counts = nodes[keep], counts[keep]
+        # most often first, then by work id
+        order = np.lexsort((nodes, -counts))[:limit]
+        return list(zip(self.works[nodes[order]].tolist(), counts[order].tolist()))
+
+
+class DatabaseCitationGraph:
+    """Answers the same queries as CitationGraphSnapshot, from the database."""
+
+    def cites(self, work_id):
+        return list(
+            ExtractedCitation.objects.filter(citing_work_id=work_id)
+            .values_list("target_work_id", flat=True)
+            .order_by("target_work_id")
+            .distinct()
+        )
+
+    def cited_by(self, work_id):
+        return list(
+            ExtractedCitation.objects.filter(target_work_id=work_id)
+            .values_list("citing_work_id", flat=True)
+            .order_by("citing_work_id")
+            .distinct()
+        )
+
+    def cited_by_many(self, work_ids):
+        result = {work_id: [] for work_id in work_ids}
+        for citing_work_id, target_work_id in (
+            ExtractedCitation.objects.filter(target_work_id__in=list(result))
+            .values_list("citing_work_id", "target_work_id")
+            .order_by("target_work_id", "citing_work_id")
+            .distinct()
+        ):
+            result[target_work_id].append(citing_work_id)
+        return result
+
+    def in_degree(self, work_id):
+        return (
+            ExtractedCitation.objects.filter(target_work_id=work_id)
+            .values("citing_work_id")
+            .distinct()
+            .count()
+        )
+
+    def two_hop_neighbours(self, work_id, incoming=False):
+        near, far = (
+            ("target_work_id", "citing_work_id")
+            if incoming
+            else ("citing_work_id", "target_work_id")
+        )
+        one = ExtractedCitation.objects.filter(**{near: work_id}).values(far)
+        return list(
+            ExtractedCitation.objects.filter(**{f"{near}__in": one})
+            .exclude(**{f"{far}__in": one})
+            .exclude(**{far: work_id})
+            .values_list(far, flat=True)
+            .order_by(far)
+            .distinct()
+        )
+
+    def co_cited(self, work_id, limit=10):
+        citing = ExtractedCitation.objects.filter(target_work_id=work_id).values(
+            "citing_work_id"
+        )
+        return list(
+            ExtractedCitation.objects.filter(citing_work_id__in=citing)
+            .exclude(target_work_id=work_id)
+            .values("target_work_id")
+            .annotate(n=Count("citing_work_id", distinct=True))
+            .order_by("-n", "target_work_id")
+            .values_list("target_work_id", "n")[:limit]
+        )
+
+
+class PendingCitationGraph(DatabaseCitationGraph):
+    """A snapshot that is patched with the citations of the works that have changed since it was written.
+
+    Queries about the citations to and from a work combine the snapshot (without the changed works' citations) with
+    the changed works' citations from the database. Other queries use the database.
+    """
+
+    def __init__(self, snapshot, changed):
+        self.snapshot = snapshot
+        self.changed = changed
+
+    def cites(self, work_id):
+        if work_id in self.changed:
+            return super().cites(work_id)
+        return self.snapshot.cites(work_id)
+
+    def cited_by_many(self, work_ids):
+        result = {
+            work_id: [
+                w for w in self.snapshot.cited_by(work_id) if w not in self.changed
+            ]
+            for work_id in work_ids
+        }
+        for citing_work_id, target_work_id in (
+            ExtractedCitation.objects.filter(
+                citing_work_id__in=list(self.changed), target_work_id__in=list(result)
+            )
+            .values_list("citing_work_id", "target_work_id")
+            .order_by()
+            .distinct()
+        ):
+            result[target_work_id].append(citing_work_id)
+        return {work_id: sorted(citing) for work_id, citing in result.items()}
+
+    def cited_by(self, work_id):
+        return self.cited_by_many([work_id])[work_id]
+
+    def in_degree(self, work_id):
+        return len(self.cited_by(work_id))
+
+
+class CitationGraphStore:
+    """Reads and updates the citation graph snapshot in a directory."""
+
+    def __init__(self, root=None):
+        self.root = root
+        self._snapshot = None
+        self._lock = threading.Lock()
+        # the changes being collected for the current transaction in this thread
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        return self.root or settings.PEACHJAM["CITATION_GRAPH_DIR"]
+
+    @property
+    def current_link(self):
+        return os.path.join(self.path, "current")
+
+    @property
+    def lock_file(self):
+        return os.path.join(self.path, "update.lock")
+
+    def enabled(self):
+        return np is not None
+
+    def get_snapshot(self):
+        """The current snapshot, which may be stale, or None if there isn't one."""
+        if not self.enabled():
+            return None
+
+        try:
+            target = os.readlink(self.current_link)
+        except OSError:
+            return None
+
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.path != target:
+            with self._lock:
+                if self._snapshot is None or self._snapshot.path != target:
+                    try:
+                        self._snapshot = CitationGraphSnapshot(target)
+                    except OSError as e:
+                        # it may have been replaced while we were loading it
+                        log.warning(
+                            f"Could not load citation graph from {target}", exc_info=e
+                        )
+                        return None
+                snapshot = self._snapshot
+        return snapshot
+
+    def get_changed_works(self):
+        """The ids of the works whose citations have changed since the snapshot was updated. No more than
+        MAX_PENDING_WORKS + 1 are returned."""
+        return cache.get_or_set(
+            PENDING_KEY,
+            lambda: list(
+                CitationGraphChange.objects.values_list("work_id", flat=True)
+                .order_by()
+                .distinct()[: MAX_PENDING_WORKS + 1]
+            ),
+            PENDING_TIMEOUT,
+        )
+
+    def get_graph(self):
+        """The snapshot, patched with any changes since it was updated, or a graph that uses the database if there
+        is no snapshot or too much has changed."""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return DatabaseCitationGraph()
+        changed = self.get_changed_works()
+        if not changed:
+            return snapshot
+        if len(changed) > MAX_PENDING_WORKS:
+            return DatabaseCitationGraph()
+        return PendingCitationGraph(snapshot, set(changed))
+
+    def citations_changed(self, citing_work_id):
+        """Record that the outgoing citations of a work have changed. Changes are collected until the transaction
+        commits, and then recorded once for each work."""
+        if not self.enabled():
+            return
+
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            self.record_changes({citing_work_id})
+            return
+
+        # Committing or rolling back the transaction (or rolling back a savepoint) replaces the connection's list
+        # of on-commit callbacks, so when it changes, start collecting changes again with a new callback.
+        pending = getattr(self._local, "pending", None)
+        if pending is None or pending[0] is not connection.run_on_commit:
+            work_ids = set()
+            transaction.on_commit(partial(self.record_changes, work_ids))
+            pending = self._local.pending = (connection.run_on_commit, work_ids)
+        pending[1].add(citing_work_id)
+
+    def record_changes(self, work_ids):
+        """Record that the outgoing citations of the works have changed, and queue up updating the snapshot."""
+        from peachjam.tasks import update_citation_graph
+
+        pending = getattr(self._local, "pending", None)
+        if pending is not None and pending[1] is work_ids:
+            self._local.pending = None
+
+        CitationGraphChange.objects.bulk_create(
+            [CitationGraphChange(work_id=work_id) for work_id in sorted(work_ids)]
+        )
+        cache.delete(PENDING_KEY)
+        # this doesn't postpone an update that is already scheduled
+        update_citation_graph()
+
+    def update(self, full=False):
+        """Apply the pending changes to the snapshot, or rebuild it from scratch if full is True or there is no
+        snapshot. Returns the updated snapshot.
+
+        Only one update runs at a time; others wait for the lock file."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return self._update(full)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _update(self, full):
+        snapshot = None if full else self.get_snapshot()
+        changes = list(CitationGraphChange.objects.values_list("pk", "work_id"))
+        if snapshot is not None and not changes:
+            return snapshot
+
+        start = time.monotonic()
+        if snapshot is None:
+            edges = ExtractedCitation.objects.values_list(
+                "citing_work_id", "target_work_id"
+            ).distinct()
+            citing, target = self.unzip(edges)
+        else:
+            work_ids = np.unique([work_id for _, work_id in changes])
+            # keep the edges from works that haven't changed, and replace the rest
+            src, dst = snapshot.edges()
+            citing, target = snapshot.works[src], snapshot.works[dst]
+            keep = ~np.isin(citing, work_ids)
+            edges = (
+                ExtractedCitation.objects.filter(citing_work_id__in=work_ids.tolist())
+                .values_list("citing_work_id", "target_work_id")
+                .distinct()
+            )
+            new_citing, new_target = self.unzip(edges)
+            citing = np.concatenate([citing[keep], new_citing])
+            target = np.concatenate([target[keep], new_target])
+
+        path = os.path.join(self.path, "snapshots", str(time.time_ns()))
+        CitationGraphSnapshot.write(path, citing, target)
+        self.switch_to(path)
+        CitationGraphChange.objects.filter(pk__in=[pk for pk, _ in changes]).delete()
+        cache.delete(PENDING_KEY)
+
+        snapshot = self.get_snapshot()
+        log.info(
+            f"Updated citation graph with {len(changes)} changes in {time.monotonic() - start:.2f}s: "
+            f"{len(snapshot)} works, {len(snapshot.out_indices)} citations"
+        )
+        return snapshot
+
+    def unzip(self, edges):
+        edges = np.array(list(edges), dtype=np.int64).reshape(-1, 2)
+        return edges[:, 0], edges[:, 1]
+
+    def switch_to(self, path):
+        """Point the current link at the snapshot in path, and delete older snapshots. The caller must hold the
+        update lock, so that no other snapshot is being written."""
+        tmp = f"{self.current_link}.{os.getpid()}"
+        os.symlink(path, tmp)
+        os.replace(tmp, self.current_link)
+
+        # processes that have older snapshots mapped can keep using them after they're deleted
+        snapshots = os.path.dirname(path)
+        for name in os.listdir(snapshots):
+            if os.path.join(snapshots, name) != path:
+                shutil.rmtree(os.path.join(snapshots, name), ignore_errors=True)
+
+
+citation_graph_store = CitationGraphStore()
+
+
+def get_citation_graph():
+    """The citation graph, from the snapshot if it is up to date, otherwise from the database."""
+    return citation_graph_store.get_graph()
@@ -1,3 +1,5 @@
+import logging
+import shutil
 import string
 import subprocess
 import tempfile
@@ -11,8 +13,14 @@ from django.utils.translation import get_language_from_request
 from languages_plus.models import Language
 from lxml import html as lxml_html
 
+from peachjam.html_to_png import HtmlToPngError, get_html_to_png_pool
+from peachjam.languages import language_registry
+from peachjam.pandoc import markdown_to_html, markdown_to_html_many
+from peachjam.pdfjs import PdfjsError, get_pdfjs_pool
 from peachjam.xmlutils import parse_html_str
 
+log = logging.getLogger(__name__)
+
 
 def lowercase_alphabet():
     return " ".join(string.ascii_lowercase).split()
@@ -41,13 +49,52 @@ def get_language(request):
     """Get language from the request object and return its 3-letter language code."""
     if not hasattr(request, "language"):
         language = get_language_from_request(request)
+        lang = language_registry.get(language)
+        if lang is None:
+            raise Language.DoesNotExist(f"Language {language} does not exist")
         # store it on the request object because it won't change
-        request.language = Language.objects.get(iso_639_1__iexact=language).iso_639_3
+        request.language = lang.iso_639_3
     return request.language
 
 
 def pdfjs_to_text(fname):
-    """Extract text from fname using pdfjs-compatible script."""
+    """Extract text from fname using pdfjs-compatible script. Pages are separated with form-feed characters.
+
+    Uses the pool of long-lived pdfjs workers if it is enabled, falling back to running the script directly.
+    """
+    pool = get_pdfjs_pool()
+    if pool:
+        try:
+            return "\x0c".join(pool.iter_pages(fname=fname))
+        except (PdfjsError, OSError) as e:
+            log.warning(
+                f"pdfjs worker failed for {fname}, running pdfjs-to-text directly",
+                exc_info=e,
+            )
+
+    return pdfjs_to_text_subprocess(fname)
+
+
+def pdfjs_file_to_text(f):
+    """Extract text from a PDF file object, such as a FieldFile, without copying it to a temporary file if it is
+    stored locally."""
+    try:
+        # local storage
+        return pdfjs_to_text(f.path)
+    except (AttributeError, NotImplementedError):
+        pass
+
+    # remote files are passed to pdfjs by filename, rather than sending the whole file to a worker
+    f.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        shutil.copyfileobj(f, tmp)
+        tmp.flush()
+        f.seek(0)
+        return pdfjs_to_text(tmp.name)
+
+
+def pdfjs_to_text_subprocess(fname):
+    """Extract text from fname by running the pdfjs-compatible script."""
     with tempfile.NamedTemporaryFile(suffix=".txt") as outf:
         cmd = [
             settings.PEACHJAM["PDFJS_TO_TEXT"],
@@ -101,22 +148,13 @@ markdownify_orig = martor.utils.markdownify
 
 
 def markdownify_pandoc(text):
-    """Convert markdown text to html using pandoc on the commandline."""
-    with tempfile.NamedTemporaryFile(suffix=".md") as inf:
-        with tempfile.NamedTemporaryFile(suffix=".html") as outf:
-            inf.write(text.encode("utf-8"))
-            inf.flush()
-            cmd = [
-                "pandoc",
-                "--wrap=none",
-                "--from=markdown",
-                "--to=html",
-                "--output",
-                outf.name,
-                inf.name,
-            ]
-            subprocess.run(cmd, check=True)
-            return outf.read().decode("utf-8")
+    """Convert markdown text to html using pandoc. See peachjam.pandoc for details on caching and batching."""
+    return markdown_to_html(text)
+
+
+def markdownify_pandoc_many(texts):
+    """Convert a list of markdown texts to html using pandoc, in batches."""
+    return markdown_to_html_many(texts)
 
 
 # override martor's markownify to use pandoc, so that we get alpha-numbered list support
@@ -153,7 +191,24 @@ def get_country_absolute_url(self):
 
 
 def html_to_png(html_str, clip):
-    """Extract text from fname using pdfjs-compatible script."""
+    """Render html_str to a PNG image, clipped to clip (eg. 1200x600), and return the image data.
+
+    Uses the pool of warm browsers if it is enabled, falling back to running the script directly.
+    """
+    pool = get_html_to_png_pool()
+    if pool:
+        try:
+            return pool.render(html_str, clip)
+        except (HtmlToPngError, OSError) as e:
+            log.warning(
+                "html-to-png worker failed, running html-to-png directly", exc_info=e
+            )
+
+    return html_to_png_subprocess(html_str, clip)
+
+
+def html_to_png_subprocess(html_str, clip):
+    """Render html_str to a PNG image by running the html-to-png script."""
     with tempfile.NamedTemporaryFile(suffix=".html") as inf:
         inf.write(html_str.encode("utf-8"))
         inf.flush()
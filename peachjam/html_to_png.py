@@ -0,0 +1,44 @@
+"""A pool of warm headless browsers for rendering HTML to PNG images.
+
+Each worker runs the HTML_TO_PNG script in --server mode, which starts a browser once and renders each request in a
+new page. See bin/html-to-png for the protocol.
+"""
+
+import base64
+from threading import Lock
+
+from django.conf import settings
+
+from peachjam.workers import WorkerError, WorkerPool
+
+
+class HtmlToPngError(WorkerError):
+    pass
+
+
+class HtmlToPngPool(WorkerPool):
+    error_class = HtmlToPngError
+    timeout = 60
+
+    def __init__(self, size):
+        super().__init__(size, [settings.PEACHJAM["HTML_TO_PNG"], "--server"])
+
+    def render(self, html_str, clip):
+        """Render html_str and return the PNG image data, clipped to clip (eg. 1200x600)."""
+        msg = self.request({"html": html_str, "clip": clip})
+        return base64.b64decode(msg["png"])
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_html_to_png_pool():
+    """The process-wide pool, or None if it is disabled."""
+    global _pool
+    size = settings.PEACHJAM["HTML_TO_PNG_POOL_SIZE"]
+    if size and _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HtmlToPngPool(size)
+    return _pool
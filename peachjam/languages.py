@@ -0,0 +1,63 @@
+"""A process-wide registry of languages, so that looking up a language by its code doesn't need a database query.
+
+Languages almost never change, so they are loaded once, on first use, and the registry is cleared when a language is
+saved or deleted in this process (see signals.py). Other processes pick up changes when they restart.
+
+Rolling back a transaction doesn't clear the registry, so tests that change languages must clear it themselves.
+"""
+
+from threading import Lock
+
+from languages_plus.models import Language
+
+
+class LanguageRegistry:
+    def __init__(self):
+        self._by_code = None
+        self._lock = Lock()
+
+    def load(self):
+        by_code = {}
+        for language in Language.objects.all():
+            # the ISO 639-1 code is the primary key
+            for code in [language.iso_639_3, language.iso_639_2T, language.pk]:
+                if code:
+                    by_code.setdefault(code.lower(), language)
+        return by_code
+
+    @property
+    def by_code(self):
+        by_code = self._by_code
+        if by_code is None:
+            with self._lock:
+                if self._by_code is None:
+                    self._by_code = self.load()
+                by_code = self._by_code
+        return by_code
+
+    def clear(self):
+        with self._lock:
+            self._by_code = None
+
+    def get(self, code):
+        """Get a language by its ISO 639-1, 639-2T or 639-3 code (case insensitive), or None if it is not known.
+
+        The returned object is shared, and must not be changed."""
+        if not code:
+            return None
+        return self.by_code.get(code.lower())
+
+    def iso_639_1(self, code):
+        language = self.get(code)
+        return language.iso_639_1 if language else None
+
+    def iso_639_2T(self, code):
+        language = self.get(code)
+        return language.iso_639_2T if language else None
+
+    def iso_639_3(self, code):
+        language = self.get(code)
+        return language.iso_639_3 if language else None
+
+
+language_registry = LanguageRegistry()
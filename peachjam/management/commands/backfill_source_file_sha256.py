@@ -1,3 +1,7 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 from django.core.management.base import BaseCommand
 
 from peachjam.models import CoreDocument, SourceFile
@@ -13,6 +17,18 @@ class Command(BaseCommand):
             type=str,
             help=f"Limit to document types (comma-separated): {choices}",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of files to read from storage concurrently",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of source files to update at a time",
+        )
 
     def handle(self, *args, **kwargs):
         source_files = SourceFile.objects.filter(sha256__isnull=True)
@@ -25,14 +41,26 @@ class Command(BaseCommand):
         total = source_files.count()
         self.stdout.write(f"Found {total} SourceFile objects without sha256")
 
-        for source_file in source_files.order_by("-id").iterator(100):
-            try:
-                source_file.calculate_sha256()
-                source_file.save()
-                self.stdout.write(f"Updated sha256 for SourceFile id {source_file.id}")
-            except Exception as e:
-                self.stderr.write(
-                    f"Error updating sha256 for SourceFile id {source_file.id}: {e}"
+        updated = 0
+        start = time.monotonic()
+        # only the fields needed to read the file, so that we don't load documents or trigger hooks
+        source_files = (
+            source_files.only("id", "file", "sha256")
+            .order_by("-id")
+            .iterator(kwargs["batch_size"])
+        )
+        with ThreadPoolExecutor(max_workers=kwargs["workers"]) as pool:
+            while batch := list(islice(source_files, kwargs["batch_size"])):
+                hashed = [
+                    source_file
+                    for source_file in pool.map(self.hash_source_file, batch)
+                    if source_file
+                ]
+                SourceFile.objects.bulk_update(hashed, ["sha256"])
+                updated += len(hashed)
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f"Updated sha256 for {updated}/{total} SourceFile objects ({updated / elapsed:.1f}/sec)"
                 )
 
         self.stdout.write(
@@ -40,3 +68,13 @@ class Command(BaseCommand):
                 "Successfully backfilled sha256 for all SourceFile objects"
             )
         )
+
+    def hash_source_file(self, source_file):
+        try:
+            with source_file.file.open("rb") as f:
+                source_file.sha256 = SourceFile.hash_file(f)
+            return source_file
+        except Exception as e:
+            self.stderr.write(
+                f"Error updating sha256 for SourceFile id {source_file.id}: {e}"
+            )
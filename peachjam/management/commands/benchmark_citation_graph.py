@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from peachjam.citation_graph import DatabaseCitationGraph, citation_graph_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the latency of citation graph queries answered from the database and from the citation graph "
+        "snapshot. The snapshot is brought up to date first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--works", type=int, default=200, help="Number of works to query"
+        )
+
+    def handle(self, *args, **options):
+        if not citation_graph_store.enabled():
+            raise CommandError("numpy is not installed")
+
+        snapshot = citation_graph_store.update()
+        if not len(snapshot):
+            raise CommandError("There are no citations")
+
+        work_ids = random.choices(snapshot.works.tolist(), k=options["works"])
+        self.stdout.write(
+            f"Querying {len(work_ids)} of {len(snapshot)} works with {len(snapshot.out_indices)} citations"
+        )
+
+        for graph_name, graph in [
+            ("database", DatabaseCitationGraph()),
+            ("snapshot", snapshot),
+        ]:
+            for query in [
+                "cites",
+                "cited_by",
+                "in_degree",
+                "two_hop_neighbours",
+                "co_cited",
+            ]:
+                self.run(f"{graph_name} {query}", getattr(graph, query), work_ids)
+
+    def run(self, name, query, work_ids):
+        times = []
+        for work_id in work_ids:
+            start = time.monotonic()
+            query(work_id)
+            times.append(time.monotonic() - start)
+        times.sort()
+        self.stdout.write(
+            f"{name}: median {times[len(times) // 2] * 1000000:.0f}µs, "
+            f"max {times[-1] * 1000000:.0f}µs per query"
+        )
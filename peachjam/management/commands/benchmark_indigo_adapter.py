@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from peachjam.adapters import IndigoAdapter
+from peachjam.models import Legislation
+
+
+class StubIndigoServer:
+    """A local HTTP server that serves just enough of the Indigo API to fetch a document, with a fixed latency
+    for every request."""
+
+    def __init__(self, latency, n_images):
+        self.latency = latency
+        self.n_images = n_images
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                content_type, body = server.respond(self.path.split("?")[0])
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/api/v3"
+
+    def document(self, i):
+        url = f"{self.url}/akn/za/act/2020/{i}/eng@2020-01-01"
+        return url, {
+            "url": url,
+            "frbr_uri": f"/akn/za/act/2020/{i}",
+            "stub": False,
+            "publication_document": None,
+            "links": [{"href": f"{url}/media.json"}],
+        }
+
+    def respond(self, path):
+        if path.endswith("/countries.json"):
+            return self.json({"results": [{"code": "za", "localities": []}]})
+        if path.endswith("/media.json"):
+            return self.json(
+                {
+                    "results": [
+                        {
+                            "filename": f"image{i}.png",
+                            "mime_type": "image/png",
+                            "url": f"{self.url}/media/image{i}.png",
+                        }
+                        for i in range(self.n_images)
+                    ]
+                }
+            )
+        if path.endswith(".json"):
+            # toc, timeline, commencements, provision enrichments
+            return self.json({"toc": [], "timeline": [], "commencements": []})
+        if path.endswith(".pdf"):
+            return "application/pdf", b"%PDF-1.4" + b"x" * 50000
+        if path.endswith(".png"):
+            return "image/png", b"\x89PNG" + b"x" * 20000
+        return "text/html", b"<akomaNtoso>" + b"x" * 50000 + b"</akomaNtoso>"
+
+    def json(self, data):
+        return "application/json", json.dumps(data).encode("utf-8")
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare fetching documents from a local stub Indigo server sequentially with a new adapter per document, "
+        "against prefetching concurrently with a re-used adapter"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--documents", type=int, default=10, help="Number of documents to fetch"
+        )
+        parser.add_argument(
+            "--latency", type=int, default=50, help="Latency per request, in ms"
+        )
+        parser.add_argument(
+            "--images", type=int, default=3, help="Number of images per document"
+        )
+
+    def handle(self, *args, **options):
+        with StubIndigoServer(options["latency"] / 1000, options["images"]) as server:
+            settings = {"token": "XXX", "api_url": server.url, "places": "za"}
+            documents = [server.document(i) for i in range(options["documents"])]
+
+            def sequential():
+                for url, document in documents:
+                    # as each task used to, create a new adapter and fetch everything one request at a time
+                    adapter = IndigoAdapter(None, settings)
+                    adapter.places
+                    self.fetch(adapter, url, document, prefetch=False)
+
+            adapter = IndigoAdapter(None, settings)
+            adapter.places
+
+            def prefetched():
+                for url, document in documents:
+                    try:
+                        self.fetch(adapter, url, document, prefetch=True)
+                    finally:
+                        adapter.clear_prefetched()
+
+            self.stdout.write(
+                f"Fetching {len(documents)} documents with {options['latency']}ms latency per request"
+            )
+            self.run("sequential, new adapter per document", len(documents), sequential)
+            self.run("prefetched, re-used adapter", len(documents), prefetched)
+
+    def fetch(self, adapter, url, document, prefetch):
+        """Make the same requests that update_document makes for a document."""
+        adapter.client_get(f"{url}.json")
+        urls = adapter.get_prefetch_urls(url, document, Legislation)
+        if prefetch:
+            adapter.prefetch(urls)
+        for resource_url in urls:
+            r = adapter.client_get(resource_url)
+            if resource_url.endswith("media.json"):
+                image_urls = [i["url"] for i in r.json()["results"]]
+                if prefetch:
+                    adapter.prefetch(image_urls)
+                for image_url in image_urls:
+                    adapter.client_get(image_url)
+
+    def run(self, name, n_documents, fetch):
+        start = time.monotonic()
+        fetch()
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f"{name}: {elapsed:.2f}s, {n_documents / elapsed:.1f} documents/sec"
+        )
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from peachjam.models import Book
+from peachjam.pandoc import (
+    PandocServer,
+    convert_subprocess,
+    get_lru_cache,
+    markdown_to_html_many,
+)
+
+SAMPLE_MARKDOWN = """
+# Article {i}
+
+Some *introductory* text with a [link](https://example.com) and a footnote.[^1]
+
+a. first point
+b. second point
+c. third point
+
+| Column | Value |
+|--------|-------|
+| one    | {i}   |
+
+[^1]: The footnote.
+"""
+
+
+class Command(BaseCommand):
+    help = "Compare the latency of rendering a page of markdown documents with pandoc, with and without caching"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size", type=int, default=20, help="Number of documents on a page"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of times to render the page"
+        )
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"]
+        texts = list(
+            Book.objects.exclude(content_markdown=None)
+            .exclude(content_markdown="")
+            .values_list("content_markdown", flat=True)[:page_size]
+        )
+        # make up the rest
+        texts.extend(SAMPLE_MARKDOWN.format(i=i) for i in range(page_size - len(texts)))
+        self.stdout.write(f"Rendering a page of {len(texts)} markdown documents")
+
+        self.run(
+            "one pandoc process per document",
+            options["repeat"],
+            lambda: [convert_subprocess(text) for text in texts],
+        )
+
+        server = PandocServer()
+        try:
+            # start the server before timing, as a long-running process would have done
+            server.ensure_started()
+            self.run(
+                "batched through pandoc server",
+                options["repeat"],
+                lambda: server.convert_many(texts),
+            )
+        finally:
+            server.stop()
+
+        get_lru_cache().clear()
+        markdown_to_html_many(texts)
+        self.run("cached", options["repeat"], lambda: markdown_to_html_many(texts))
+
+    def run(self, name, repeat, render):
+        times = []
+        for _ in range(repeat):
+            start = time.monotonic()
+            render()
+            times.append(time.monotonic() - start)
+        times.sort()
+        self.stdout.write(
+            f"{name}: median {times[len(times) // 2] * 1000:.1f}ms, "
+            f"max {times[-1] * 1000:.1f}ms per page"
+        )
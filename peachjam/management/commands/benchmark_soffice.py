@@ -0,0 +1,58 @@
+import glob
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from docpipe import soffice as docpipe_soffice
+
+from peachjam.soffice import SOfficePool
+
+
+class Command(BaseCommand):
+    help = "Compare the throughput of cold-start and pooled LibreOffice conversions of DOCX files to PDF"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files",
+            nargs="*",
+            help="DOCX files to convert (default: the DOCX fixtures)",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of times to convert each file"
+        )
+        parser.add_argument(
+            "--pool-size", type=int, default=2, help="Number of pooled instances"
+        )
+
+    def handle(self, *args, **options):
+        files = options["files"] or glob.glob(
+            "peachjam/fixtures/**/*.docx", recursive=True
+        )
+        files = files * options["repeat"]
+        self.stdout.write(f"Converting {len(files)} files")
+
+        self.run("cold start", files, docpipe_soffice.soffice_convert, 1)
+
+        pool = SOfficePool(options["pool_size"])
+        try:
+            # start the instances before timing, as a long-running process would have done
+            for slot in pool.slots:
+                slot.start()
+            self.run("pooled", files, pool.convert, options["pool_size"])
+        finally:
+            pool.shutdown()
+
+    def run(self, name, files, convert, workers):
+        def convert_file(fname):
+            with open(fname, "rb") as f:
+                outf, tmpdir = convert(f, "docx", "pdf")
+                outf.close()
+                tmpdir.cleanup()
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(convert_file, files))
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f"{name}: {len(files)} conversions in {elapsed:.1f}s ({len(files) / elapsed:.2f}/sec)"
+        )
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from peachjam.management.commands.backfill_source_file_sha256 import (
+    Command as BackfillCommand,
+)
+from peachjam.models import SourceFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare hashing large PDFs on local storage all at once and in chunks, and the throughput of the sha256 "
+        "backfill with and without concurrent reads"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files",
+            nargs="*",
+            help="PDF files to hash (default: generate large PDFs)",
+        )
+        parser.add_argument(
+            "--count", type=int, default=20, help="Number of PDFs to generate"
+        )
+        parser.add_argument(
+            "--size", type=int, default=50, help="Size of generated PDFs, in MB"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of files to read concurrently when backfilling",
+        )
+
+    def handle(self, *args, **options):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            storage = FileSystemStorage(location=tmpdir)
+            names = self.store_files(storage, options)
+            total = sum(storage.size(name) for name in names)
+            self.stdout.write(
+                f"Hashing {len(names)} PDFs ({total / 1024 / 1024:.0f}MB) on local storage"
+            )
+
+            self.run_hash("read all at once", storage, names, self.hash_all)
+            self.run_hash("chunked", storage, names, SourceFile.hash_file)
+
+            self.run_backfill("backfill, 1 worker", storage, names, 1)
+            self.run_backfill(
+                f"backfill, {options['workers']} workers",
+                storage,
+                names,
+                options["workers"],
+            )
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def store_files(self, storage, options):
+        if options["files"]:
+            names = []
+            for fname in options["files"]:
+                with open(fname, "rb") as f:
+                    names.append(storage.save(os.path.basename(fname), f))
+            return names
+
+        names = []
+        chunk = os.urandom(1024 * 1024)
+        for i in range(options["count"]):
+            name = storage.path(f"{i}.pdf")
+            with open(name, "wb") as f:
+                f.write(b"%PDF-1.4\n")
+                for _ in range(options["size"]):
+                    f.write(chunk)
+            names.append(f"{i}.pdf")
+        return names
+
+    def hash_all(self, f):
+        return hashlib.sha256(f.read()).hexdigest()
+
+    def run_hash(self, name, storage, names, hash_file):
+        tracemalloc.start()
+        start = time.monotonic()
+        for fname in names:
+            with storage.open(fname, "rb") as f:
+                hash_file(f)
+        elapsed = time.monotonic() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{name}: {len(names)} files in {elapsed:.1f}s ({len(names) / elapsed:.2f}/sec), "
+            f"peak memory {peak / 1024 / 1024:.1f}MB"
+        )
+
+    def run_backfill(self, name, storage, names, workers):
+        # unsaved source files on local storage, hashed the same way the backfill hashes them
+        source_files = []
+        for fname in names:
+            source_file = SourceFile(file=fname)
+            source_file.file.storage = storage
+            source_files.append(source_file)
+        backfill = BackfillCommand(stdout=self.stdout, stderr=self.stderr)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashed = [
+                sf for sf in pool.map(backfill.hash_source_file, source_files) if sf
+            ]
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f"{name}: {len(hashed)} files in {elapsed:.1f}s ({len(hashed) / elapsed:.2f}/sec)"
+        )
@@ -0,0 +1,95 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from peachjam.models import Taxonomy
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the latency of building the allowed taxonomy tree for a request, with and without the cached tree. "
+        "A large taxonomy is created for the benchmark and rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--nodes", type=int, default=20000, help="Number of taxonomy nodes"
+        )
+        parser.add_argument(
+            "--breadth", type=int, default=30, help="Number of children per node"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=10, help="Number of requests to simulate"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_tree(options["nodes"], options["breadth"])
+            self.stdout.write(
+                f"Building the allowed taxonomy tree of {Taxonomy.objects.count()} nodes"
+            )
+
+            user = AnonymousUser()
+
+            def uncached():
+                # as it used to be, dump and filter the whole tree for every request
+                Taxonomy.bump_tree_version()
+                Taxonomy.get_allowed_taxonomies(user)
+
+            self.run("uncached", options["repeat"], uncached)
+            Taxonomy.get_allowed_taxonomies(user)
+            self.run(
+                "cached",
+                options["repeat"],
+                lambda: Taxonomy.get_allowed_taxonomies(user),
+            )
+
+            transaction.set_rollback(True)
+        Taxonomy.bump_tree_version()
+
+    def create_tree(self, n_nodes, breadth):
+        """Create a tree of n_nodes below a new root, breadth first, with some restricted nodes. The nodes are bulk
+        created, which is much faster than adding them one at a time."""
+        last_root = Taxonomy.get_last_root_node()
+        root = Taxonomy(
+            name="Benchmark",
+            slug=f"benchmark-{time.time_ns()}",
+            depth=1,
+            path=last_root._inc_path() if last_root else Taxonomy._get_path(None, 1, 1),
+            numchild=0,
+        )
+        nodes = [root]
+        parents = [root]
+        while len(nodes) < n_nodes:
+            children = []
+            for parent in parents:
+                for i in range(breadth):
+                    if len(nodes) >= n_nodes:
+                        break
+                    parent.numchild += 1
+                    child = Taxonomy(
+                        name=f"Topic {len(nodes)}",
+                        slug=f"{root.slug}-{len(nodes)}",
+                        depth=parent.depth + 1,
+                        path=Taxonomy._get_path(parent.path, parent.depth + 1, i + 1),
+                        numchild=0,
+                        restricted=len(nodes) % 100 == 0,
+                    )
+                    nodes.append(child)
+                    children.append(child)
+            parents = children
+        Taxonomy.objects.bulk_create(nodes, batch_size=1000)
+
+    def run(self, name, repeat, build):
+        times = []
+        for _ in range(repeat):
+            start = time.monotonic()
+            build()
+            times.append(time.monotonic() - start)
+        times.sort()
+        self.stdout.write(
+            f"{name}: median {times[len(times) // 2] * 1000:.1f}ms, "
+            f"max {times[-1] * 1000:.1f}ms per request"
+        )
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.29 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import peachjam.models.attachments
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("peachjam", "0318_onboarding_profile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentContentPDF",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=1024,
+                        upload_to=peachjam.models.attachments.file_location,
+                        verbose_name="file",
+                    ),
+                ),
+                (
+                    "fingerprint",
+                    models.CharField(max_length=64, verbose_name="fingerprint"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+                (
+                    "document",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="content_pdf",
+                        to="peachjam.coredocument",
+                        verbose_name="document",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "document content PDF",
+                "verbose_name_plural": "document content PDFs",
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.29 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("peachjam", "0319_documentcontentpdf"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestor",
+            name="cursor",
+            field=models.JSONField(
+                blank=True,
+                help_text="Where to resume checking for updates, if it was interrupted.",
+                null=True,
+                verbose_name="cursor",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.29 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("peachjam", "0320_ingestor_cursor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="citationprocessing",
+            name="works",
+            field=models.ManyToManyField(
+                blank=True,
+                help_text="Works added or changed since the processing date, that newer documents may cite.",
+                related_name="+",
+                to="peachjam.work",
+                verbose_name="works",
+            ),
+        ),
+    ]
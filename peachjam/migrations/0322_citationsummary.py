@@ -0,0 +1,116 @@
+# Generated by Django 4.2.29 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("peachjam", "0321_citationprocessing_works"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CitationSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "direction",
+                    models.CharField(
+                        choices=[("incoming", "Incoming"), ("outgoing", "Outgoing")],
+                        max_length=16,
+                        verbose_name="direction",
+                    ),
+                ),
+                (
+                    "authority_score",
+                    models.FloatField(default=0.0, verbose_name="authority score"),
+                ),
+                (
+                    "sort_title",
+                    models.CharField(max_length=255, verbose_name="sort title"),
+                ),
+                (
+                    "nature",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="peachjam.documentnature",
+                        verbose_name="nature",
+                    ),
+                ),
+                (
+                    "other_work",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="peachjam.work",
+                        verbose_name="other work",
+                    ),
+                ),
+                (
+                    "work",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="citation_summaries",
+                        to="peachjam.work",
+                        verbose_name="work",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "citation summary",
+                "verbose_name_plural": "citation summaries",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="citationsummary",
+            index=models.Index(
+                fields=[
+                    "work",
+                    "direction",
+                    "nature",
+                    "-authority_score",
+                    "sort_title",
+                    "other_work",
+                ],
+                name="citation_summary_listing",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="citationsummary",
+            constraint=models.UniqueConstraint(
+                fields=("work", "direction", "other_work"),
+                name="unique_citation_summary",
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO peachjam_citationsummary
+                    (work_id, direction, other_work_id, nature_id, authority_score, sort_title)
+                SELECT DISTINCT ON (pair.work_id, pair.direction, pair.other_work_id)
+                    pair.work_id, pair.direction, pair.other_work_id, doc.nature_id, other.authority_score,
+                    left(doc.title, 255)
+                FROM (
+                    SELECT target_work_id AS work_id, 'incoming'::varchar AS direction, citing_work_id AS other_work_id
+                    FROM peachjam_extractedcitation
+                    UNION
+                    SELECT citing_work_id, 'outgoing'::varchar, target_work_id
+                    FROM peachjam_extractedcitation
+                ) pair
+                INNER JOIN peachjam_work other ON other.id = pair.other_work_id
+                INNER JOIN peachjam_coredocument doc ON doc.work_id = pair.other_work_id
+                ORDER BY pair.work_id, pair.direction, pair.other_work_id, doc.date DESC, doc.id DESC
+                """,
+            reverse_sql="DELETE FROM peachjam_citationsummary",
+        ),
+    ]
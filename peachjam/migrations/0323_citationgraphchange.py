@@ -0,0 +1,32 @@
+# Generated by Django 4.2.29 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("peachjam", "0322_citationsummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CitationGraphChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("work_id", models.BigIntegerField(verbose_name="work id")),
+            ],
+            options={
+                "verbose_name": "citation graph change",
+                "verbose_name_plural": "citation graph changes",
+            },
+        ),
+    ]
@@ -4,6 +4,7 @@ import io
 import logging
 import os
 import re
+from functools import cache
 
 import magic
 from django.contrib.staticfiles.finders import find as find_static
@@ -14,14 +15,17 @@ from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django_lifecycle import AFTER_SAVE, BEFORE_SAVE
-from docpipe.soffice import soffice_convert
 
 from peachjam.helpers import html_to_png
 from peachjam.models.lifecycle import AttributeHooksMixin, on_attribute_changed
+from peachjam.soffice import soffice_convert
 from peachjam.storage import DynamicStorageFileField
 
 log = logging.getLogger(__name__)
 
+# the size of the chunks that files are read in when they are hashed
+HASH_CHUNK_SIZE = 1024 * 1024
+
 
 def file_location(instance, filename):
     if not instance.document.pk:
@@ -132,8 +136,8 @@ class SourceFile(AttributeHooksMixin, AttachmentAbstractModel):
     )
     # These two fields provide support for anonymised source files for use with judgments that must be anonymised.
     # If file_is_anonymised is True, then file (and file_as_pdf) are anonymised and can be safely sent to the user.
-    # Otherwise, we can create a PDF from the anonymised HTML and it is stored as anonymised_file_as_pdf, which is
-    # shared with the user instead.
+    # Otherwise, the PDF rendered from the anonymised HTML (see DocumentContentPDF) is shared with the user instead.
+    # Older anonymised PDFs were copied into anonymised_file_as_pdf, which is still used when it is present.
     file_is_anonymised = models.BooleanField(_("file is anonymised"), default=False)
     anonymised_file_as_pdf = models.FileField(
         _("anonymised file as pdf"),
@@ -191,14 +195,38 @@ class SourceFile(AttributeHooksMixin, AttachmentAbstractModel):
                 CopySource=src, MetadataDirective="REPLACE", **src, **metadata
             )
 
-    def calculate_sha256(self):
-        f = self.file
-        # this is a shared file handle that may not be at the start of the file, so reset it
+    def etag_for(self, f):
+        """Return an ETag for serving f, which is either the source file itself or a PDF derived from it. Derived
+        files are regenerated under new (unique) names, so their name distinguishes them from the original.
+        """
+        if not self.sha256:
+            return None
+        if f.name == self.file.name:
+            return self.sha256
+        return hashlib.sha256(f"{self.sha256}:{f.name}".encode()).hexdigest()
+
+    @staticmethod
+    def hash_file(f, chunk_size=HASH_CHUNK_SIZE):
+        """Calculate the SHA-256 hex digest of a file, reading it in chunks rather than all at once."""
+        sha = hashlib.sha256()
+        # chunks() rewinds the file first, which is important because this may be a shared file handle
+        for chunk in f.chunks(chunk_size):
+            sha.update(chunk)
         f.seek(0)
-        self.sha256 = hashlib.sha256(f.read()).hexdigest()
+        return sha.hexdigest()
+
+    def file_needs_hashing(self):
+        """Has the file changed since sha256 was calculated? A newly assigned file is not yet committed to storage,
+        so it is hashed from the upload before it is saved, rather than being read back from storage.
+        """
+        return not self.sha256 or not self.file._committed
+
+    def calculate_sha256(self):
+        self.sha256 = self.hash_file(self.file)
 
     def save(self, *args, **kwargs):
-        self.calculate_sha256()
+        if self.file_needs_hashing():
+            self.calculate_sha256()
         pk = self.pk
         super().save(*args, **kwargs)
         if not pk:
@@ -261,6 +289,12 @@ class SourceFile(AttributeHooksMixin, AttachmentAbstractModel):
                     f"Ignoring error while deleting {self.file_as_pdf}", exc_info=e
                 )
 
+        self.delete_anonymised_file_as_pdf()
+
+        return super().delete(*args, **kwargs)
+
+    def delete_anonymised_file_as_pdf(self):
+        """Delete the anonymised PDF, if present, and silently ignore errors. The caller must save the change."""
         if self.anonymised_file_as_pdf:
             try:
                 self.anonymised_file_as_pdf.delete(False)
@@ -269,8 +303,7 @@ class SourceFile(AttributeHooksMixin, AttachmentAbstractModel):
                     f"Ignoring error while deleting {self.anonymised_file_as_pdf}",
                     exc_info=e,
                 )
-
-        return super().delete(*args, **kwargs)
+            self.anonymised_file_as_pdf = None
 
 
 class PublicationFile(AttachmentAbstractModel):
@@ -422,18 +455,121 @@ class DocumentSocialImage(models.Model):
             "debug": debug,
         }
 
-        # find the logo to use and inject it as base 64
+        logo_b64 = cls.logo_b64()
+        if logo_b64:
+            context["logo_b64"] = logo_b64
+
+        return render_to_string(cls.template_name, context)
+
+    @staticmethod
+    @cache
+    def logo_b64():
+        """Find the logo to use and return it as a base 64 data URL. Static files don't change while the process
+        is running, so this is only done once."""
         for fname in ["images/hero-logo.jpg", "images/logo.png"]:
             fname = find_static(fname)
             if fname:
                 with open(fname, "rb") as f:
-                    file_content = f.read()
-                    base64_encoded = base64.b64encode(file_content).decode("utf-8")
-                    context["logo_b64"] = f"data:image/jpg;base64,{base64_encoded}"
-                    break
+                    base64_encoded = base64.b64encode(f.read()).decode("utf-8")
+                    return f"data:image/jpg;base64,{base64_encoded}"
 
-        return render_to_string(cls.template_name, context)
+    @classmethod
+    def render_for_document(cls, document):
+        """Get the social image for a document, rendering it if the document has changed."""
+        return cls.get_or_create_for_document(document, cls.html_for_document(document))
 
     @classmethod
     def make_image(cls, html_str):
         return html_to_png(html_str, "1200x600")
+
+
+class DocumentContentPDF(models.Model):
+    """A PDF rendered from a document's content HTML.
+
+    Rendering involves inlining all the document's images and running LibreOffice, so the result is stored and
+    re-used until the HTML or the images change, which is detected using a fingerprint of both.
+    """
+
+    SAVE_FOLDER = "content-pdf"
+
+    document = models.OneToOneField(
+        "peachjam.CoreDocument",
+        related_name="content_pdf",
+        on_delete=models.CASCADE,
+        verbose_name=_("document"),
+    )
+    file = models.FileField(_("file"), upload_to=file_location, max_length=1024)
+    fingerprint = models.CharField(_("fingerprint"), max_length=64)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("document content PDF")
+        verbose_name_plural = _("document content PDFs")
+
+    def delete(self, *args, **kwargs):
+        self.delete_file()
+        return super().delete(*args, **kwargs)
+
+    def delete_file(self):
+        """Delete the file, if present, and silently ignore errors."""
+        if self.file:
+            try:
+                self.file.delete(False)
+            except Exception as e:
+                log.warning(f"Ignoring error while deleting {self.file}", exc_info=e)
+
+    @classmethod
+    def fingerprint_for_document(cls, document):
+        """A fingerprint of the content HTML and images that a PDF of the document is rendered from. Image files
+        are never overwritten (each upload gets a new name), so an image's name and size stand in for its
+        contents."""
+        doc_content = document.get_or_create_document_content()
+        sha = hashlib.sha256((doc_content.content_html or "").encode())
+        for filename, name, size in document.images.order_by("filename").values_list(
+            "filename", "file", "size"
+        ):
+            sha.update(f"\0{filename}\0{name}\0{size}".encode())
+        return sha.hexdigest()
+
+    @classmethod
+    def can_render_document(cls, document):
+        """Can a PDF be rendered from the document's content HTML? Akoma Ntoso HTML isn't rendered."""
+        doc_content = document.get_or_create_document_content()
+        return bool(
+            doc_content
+            and doc_content.content_html
+            and not doc_content.content_html_is_akn
+        )
+
+    @classmethod
+    def get_current_for_document(cls, document):
+        """Get the PDF of the document's content if it was rendered from the current content and images, without
+        rendering it."""
+        content_pdf = cls.objects.filter(document=document).first()
+        if (
+            content_pdf
+            and content_pdf.file
+            and content_pdf.fingerprint == cls.fingerprint_for_document(document)
+        ):
+            return content_pdf
+
+    def filename_for_download(self):
+        title = re.sub(r"[^a-zA-Z0-9() ]", "", self.document.title)
+        return title + ".pdf"
+
+    @classmethod
+    def get_or_create_for_document(cls, document):
+        """Get the PDF of the document's content, rendering it if the content or images have changed."""
+        # calculate the fingerprint before rendering, so that it describes what was rendered
+        fingerprint = cls.fingerprint_for_document(document)
+        content_pdf = cls.objects.filter(document=document).first()
+        if content_pdf and content_pdf.file and content_pdf.fingerprint == fingerprint:
+            return content_pdf
+
+        f = File(document.convert_html_to_pdf(), name="content.pdf")
+        if content_pdf:
+            content_pdf.delete_file()
+        content_pdf, _ = cls.objects.update_or_create(
+            document=document, defaults={"file": f, "fingerprint": fingerprint}
+        )
+        return content_pdf
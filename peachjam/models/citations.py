@@ -1,9 +1,11 @@
+import itertools
 import logging
+import re
 from datetime import timedelta
 from random import randint
 
-from django.db import models
-from django.db.models import F, Window
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Q, Window
 from django.db.models.functions import RowNumber
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -119,56 +121,279 @@ class ExtractedCitation(models.Model):
 
     @classmethod
     def update_counts_for_work(cls, work):
-        work.n_cited_works = cls.for_citing_works(work).count()
-        work.n_citing_works = cls.for_target_works(work).count()
+        counts = dict(
+            CitationSummary.objects.filter(work=work)
+            .values("direction")
+            .annotate(n=Count("pk"))
+            .values_list("direction", "n")
+        )
+        work.n_cited_works = counts.get(CitationSummary.Direction.OUTGOING, 0)
+        work.n_citing_works = counts.get(CitationSummary.Direction.INCOMING, 0)
         work.save(update_fields=["n_cited_works", "n_citing_works"])
 
+
+class CitationSummary(models.Model):
+    """A denormalised row for each work that a work cites (outgoing) or is cited by (incoming), with what's needed to
+    list them grouped by nature and ordered by authority, without having to look at all the documents of all the
+    works. Only works with documents are included.
+
+    The nature and sort title are from the latest document of the other work. Rows are kept up to date as
+    ExtractedCitations and documents change, and after works are ranked.
+    """
+
+    class Direction(models.TextChoices):
+        INCOMING = "incoming", _("Incoming")
+        OUTGOING = "outgoing", _("Outgoing")
+
+    work = models.ForeignKey(
+        "peachjam.Work",
+        on_delete=models.CASCADE,
+        related_name="citation_summaries",
+        verbose_name=_("work"),
+    )
+    direction = models.CharField(
+        _("direction"), max_length=16, choices=Direction.choices
+    )
+    other_work = models.ForeignKey(
+        "peachjam.Work",
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("other work"),
+    )
+    nature = models.ForeignKey(
+        "peachjam.DocumentNature",
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("nature"),
+    )
+    authority_score = models.FloatField(_("authority score"), default=0.0)
+    # truncated, so that it can be indexed
+    sort_title = models.CharField(_("sort title"), max_length=255)
+
+    UPSERT_SQL = """
+        INSERT INTO peachjam_citationsummary
+            (work_id, direction, other_work_id, nature_id, authority_score, sort_title)
+        SELECT DISTINCT ON (pair.work_id, pair.direction, pair.other_work_id)
+            pair.work_id, pair.direction, pair.other_work_id, doc.nature_id, other.authority_score,
+            left(doc.title, 255)
+        FROM (
+            SELECT ec.target_work_id AS work_id, 'incoming'::varchar AS direction, ec.citing_work_id AS other_work_id
+            FROM peachjam_extractedcitation ec WHERE {incoming}
+            UNION
+            SELECT ec.citing_work_id, 'outgoing'::varchar, ec.target_work_id
+            FROM peachjam_extractedcitation ec WHERE {outgoing}
+        ) pair
+        INNER JOIN peachjam_work other ON other.id = pair.other_work_id
+        INNER JOIN peachjam_coredocument doc ON doc.work_id = pair.other_work_id
+        ORDER BY pair.work_id, pair.direction, pair.other_work_id, doc.date DESC, doc.id DESC
+        ON CONFLICT (work_id, direction, other_work_id) DO UPDATE
+        SET nature_id = EXCLUDED.nature_id,
+            authority_score = EXCLUDED.authority_score,
+            sort_title = EXCLUDED.sort_title
+        WHERE (peachjam_citationsummary.nature_id, peachjam_citationsummary.authority_score,
+               peachjam_citationsummary.sort_title)
+            IS DISTINCT FROM (EXCLUDED.nature_id, EXCLUDED.authority_score, EXCLUDED.sort_title)
+    """
+
+    class Meta:
+        verbose_name = _("citation summary")
+        verbose_name_plural = _("citation summaries")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("work", "direction", "other_work"),
+                name="unique_citation_summary",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=[
+                    "work",
+                    "direction",
+                    "nature",
+                    "-authority_score",
+                    "sort_title",
+                    "other_work",
+                ],
+                name="citation_summary_listing",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.work_id} {self.direction} {self.other_work_id}"
+
+    @classmethod
+    def refresh_for_citation(cls, citing_work_id, target_work_id):
+        """Refresh the rows for a citation from one work to another, after it has been created or deleted."""
+        with transaction.atomic():
+            cls.objects.filter(
+                Q(
+                    work_id=target_work_id,
+                    direction=cls.Direction.INCOMING,
+                    other_work_id=citing_work_id,
+                )
+                | Q(
+                    work_id=citing_work_id,
+                    direction=cls.Direction.OUTGOING,
+                    other_work_id=target_work_id,
+                )
+            ).delete()
+            condition = "ec.citing_work_id = %s AND ec.target_work_id = %s"
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    cls.UPSERT_SQL.format(incoming=condition, outgoing=condition),
+                    [citing_work_id, target_work_id] * 2,
+                )
+
+    @classmethod
+    def refresh_for_other_work(cls, work_id):
+        """Refresh the rows in which the work is the other work, after its documents have changed."""
+        from .core_document import CoreDocument
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    cls.UPSERT_SQL.format(
+                        incoming="ec.citing_work_id = %s",
+                        outgoing="ec.target_work_id = %s",
+                    ),
+                    [work_id, work_id],
+                )
+            # the work may no longer have any documents
+            if not CoreDocument.objects.filter(work_id=work_id).exists():
+                cls.objects.filter(other_work_id=work_id).delete()
+
+    @classmethod
+    def refresh_authority_scores(cls):
+        """Copy the authority scores of works into the rows in which they are the other work, after works have
+        been ranked."""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE peachjam_citationsummary cs
+                SET authority_score = w.authority_score
+                FROM peachjam_work w
+                WHERE w.id = cs.other_work_id AND cs.authority_score <> w.authority_score
+                """)
+            log.info(
+                "Updated authority scores of %s citation summaries", cursor.rowcount
+            )
+
+    @classmethod
+    def fetch_grouped_citation_docs(cls, work, direction, language, n_per_group=10):
+        """Fetch the top n_per_group documents for each nature, for works that the work cites (outgoing) or is cited
+        by (incoming), ordered by authority score and title.
+
+        Returns a list of (nature_id, n_docs, docs) tuples, ordered by nature.
+        """
+        rows = list(
+            cls.objects.filter(work=work, direction=direction)
+            .annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=[F("nature_id")],
+                    order_by=cls.listing_order(),
+                ),
+                n_in_nature=Window(
+                    expression=Count("pk"), partition_by=[F("nature_id")]
+                ),
+            )
+            .filter(row_number__lte=n_per_group)
+            .order_by("nature_id", "row_number")
+        )
+        docs = cls.get_documents(rows, language)
+
+        groups = []
+        for nature_id, group in itertools.groupby(rows, lambda r: r.nature_id):
+            group = list(group)
+            groups.append(
+                (
+                    nature_id,
+                    group[0].n_in_nature,
+                    [docs[r.other_work_id] for r in group if r.other_work_id in docs],
+                )
+            )
+        return groups
+
     @classmethod
-    def fetch_grouped_citation_docs(
-        self, works, language, n_per_group=10, offset=0, nature=None
+    def fetch_citation_docs_page(
+        cls, work, direction, nature, language, after=None, n=10
     ):
-        """Fetch documents for the given works, grouped by nature and ordered by the most incoming citations.
-        Returns a list of documents ordered by nature, -citing works, title."""
+        """Fetch a page of n documents of the given nature, for works that the work cites (outgoing) or is cited by
+        (incoming). Pages are keyed by the id of the last work on the previous page (after), so that deep pages are
+        as cheap as the first.
+
+        Returns (docs, truncated).
+        """
+        qs = cls.objects.filter(work=work, direction=direction, nature=nature)
+        if after is not None:
+            last = cls.objects.filter(
+                work=work, direction=direction, other_work_id=after
+            ).first()
+            if last:
+                qs = qs.filter(
+                    Q(authority_score__lt=last.authority_score)
+                    | Q(
+                        authority_score=last.authority_score,
+                        sort_title__gt=last.sort_title,
+                    )
+                    | Q(
+                        authority_score=last.authority_score,
+                        sort_title=last.sort_title,
+                        other_work_id__gt=last.other_work_id,
+                    )
+                )
+
+        rows = list(qs.order_by(*cls.listing_order())[: n + 1])
+        truncated = len(rows) > n
+        rows = rows[:n]
+        docs = cls.get_documents(rows, language)
+        return [
+            docs[r.other_work_id] for r in rows if r.other_work_id in docs
+        ], truncated
+
+    @classmethod
+    def listing_order(cls):
+        return [F("authority_score").desc(), F("sort_title"), F("other_work_id")]
+
+    @classmethod
+    def get_documents(cls, rows, language):
+        """Get the best document for each of the other works in rows, as a dict from work id to document."""
         from .core_document import CoreDocument
 
-        # get the best documents for these works
+        work_ids = [r.other_work_id for r in rows]
+        if not work_ids:
+            return {}
+
+        # the most recent document for each work, in the preferred language
         docs = (
-            CoreDocument.objects.filter(work__in=works)
+            CoreDocument.objects.filter(work__in=work_ids)
             .distinct("work_frbr_uri")
-            # we're fetching documents, so we want the most recent one for each work
             .order_by("work_frbr_uri", "-date")
             .preferred_language(language)
         )
-
-        qs = (
-            CoreDocument.objects.prefetch_related("work")
+        return {
+            doc.work_id: doc
+            for doc in CoreDocument.objects.prefetch_related("work")
             .select_related("nature")
             .filter(pk__in=docs)
             .for_document_table()
-        )
+        }
 
-        truncated = False
-        # get the top n_per_group documents for each nature, ordering by the number of incoming citations
-        if nature:
-            # just one group, don't need a window function
-            qs = qs.filter(nature=nature).order_by("-work__authority_score", "title")
-            truncated = qs.count() > offset + n_per_group
-            qs = qs[offset : offset + n_per_group]
-        else:
-            # use a window function to apply a row number within each nature group, ordering by number of citations
-            # offset is not supported
-            assert offset == 0
-            qs = qs.annotate(
-                row_number=Window(
-                    expression=RowNumber(),
-                    partition_by=[F("nature__name")],
-                    order_by=[F("work__authority_score").desc(), F("title")],
-                )
-            ).filter(row_number__lte=n_per_group)
-        return (
-            sorted(qs, key=lambda d: [d.nature.name, -d.work.authority_score, d.title]),
-            truncated,
-        )
+
+class CitationGraphChange(models.Model):
+    """A work whose outgoing citations have changed since the citation graph snapshot was last updated.
+
+    See peachjam.citation_graph. This is deliberately not a foreign key, so that changes to works that are then
+    deleted are still applied to the snapshot.
+    """
+
+    work_id = models.BigIntegerField(_("work id"))
+
+    class Meta:
+        verbose_name = _("citation graph change")
+        verbose_name_plural = _("citation graph changes")
+
+    def __str__(self):
+        return f"{self.work_id}"
 
 
 class Treatment(models.Model):
@@ -180,6 +405,23 @@ class Treatment(models.Model):
 
 class CitationProcessing(SingletonModel):
     processing_date = models.DateField(_("processing date"), null=True, blank=True)
+    works = models.ManyToManyField(
+        "peachjam.Work",
+        blank=True,
+        related_name="+",
+        verbose_name=_("works"),
+        help_text=_(
+            "Works added or changed since the processing date, that newer documents may cite."
+        ),
+    )
+
+    # candidate strings shorter than this match too many documents to be useful
+    MIN_CANDIDATE_LENGTH = 5
+    # maximum number of candidate strings to look for in one query
+    CANDIDATES_PER_QUERY = 50
+    # each query scans the text of every later document, so with more candidate strings than this it's cheaper to
+    # re-extract all of them
+    MAX_CANDIDATES = 500
 
     class Meta:
         verbose_name = verbose_name_plural = _("citation processing")
@@ -187,11 +429,17 @@ class CitationProcessing(SingletonModel):
     def __str__(self):
         return "Citation processing"
 
-    def queue_re_extract_citations(self, date):
+    def queue_re_extract_citations(self, date, document=None):
+        """Queue up re-extracting citations for documents dated on or after date, because document (dated date)
+        was added or changed. If document is given, only documents that may cite its work are re-extracted.
+        """
         from peachjam.models import pj_settings
         from peachjam.tasks import re_extract_citations
 
         if pj_settings().re_extract_citations:
+            if document is not None and document.work_id:
+                self.works.add(document.work_id)
+
             if self.processing_date is None or date < self.processing_date:
                 log.info("Updating processing date to %s", date)
                 self.processing_date = date
@@ -205,30 +453,141 @@ class CitationProcessing(SingletonModel):
 
     def re_extract_citations(self):
         """
-        Queues up background tasks to re-extract citations for all documents dated on or after the processing date.
+        Queues up background tasks to re-extract citations for documents dated on or after the processing date.
         This is to handle the case where an older document has just been added to the system, and newer documents may
         therefore cite it.
+
+        If we know which works were added, only documents whose text mentions one of those works are re-extracted.
+        Otherwise, all documents since the processing date are re-extracted.
         """
         from peachjam.models import CoreDocument
         from peachjam.tasks import extract_citations
 
         if self.processing_date:
-            later_documents = (
-                CoreDocument.objects.filter(date__gte=self.processing_date)
-                .only("pk")
-                .order_by("date")
-            )
-            log.info(
-                "Re-extracting citations for %s documents since date %s",
-                later_documents.count(),
-                self.processing_date,
+            later_documents = CoreDocument.objects.filter(
+                date__gte=self.processing_date
             )
+            works = list(self.works.all())
+
+            pks = None
+            if works:
+                candidates = self.get_citation_candidates(works)
+                pks = self.get_documents_mentioning(later_documents, candidates)
+                if pks is None:
+                    log.info(
+                        "%s works have more than %s citation candidates, re-extracting all documents",
+                        len(works),
+                        self.MAX_CANDIDATES,
+                    )
+                else:
+                    n_later = later_documents.count()
+                    log.info(
+                        "Re-extracting citations for %s documents since date %s that may cite %s works, "
+                        "skipped %s documents",
+                        len(pks),
+                        self.processing_date,
+                        len(works),
+                        n_later - len(pks),
+                    )
+
+            if pks is None:
+                pks = list(
+                    later_documents.order_by("date").values_list("pk", flat=True)
+                )
+                log.info(
+                    "Re-extracting citations for all %s documents since date %s",
+                    len(pks),
+                    self.processing_date,
+                )
 
-            for pk in later_documents.values_list("pk", flat=True):
+            for pk in pks:
                 extract_citations(pk, creator=CoreDocument(pk=pk))
 
+            self.works.remove(*works)
             self.reset_processing_date()
 
+    def get_citation_candidates(self, works):
+        """Get the strings that other documents may use to cite these works: the titles, citations (numbered
+        titles, media neutral citations), alternative names and case numbers of their documents, and "71 of 2008"
+        for legislation, which is common to the many ways of citing Act 71 of 2008.
+        """
+        from peachjam.models import AlternativeName, CaseNumber, CoreDocument
+
+        candidates = set()
+        for title, citation, doctype, number, date in CoreDocument.objects.filter(
+            work__in=works
+        ).values_list(
+            "title", "citation", "frbr_uri_doctype", "frbr_uri_number", "frbr_uri_date"
+        ):
+            candidates.update([title, citation])
+            if doctype == "act" and number[:1].isdigit() and date:
+                candidates.add(f"{number} of {date[:4]}")
+
+        candidates.update(
+            AlternativeName.objects.filter(document__work__in=works).values_list(
+                "title", flat=True
+            )
+        )
+
+        for case_number in CaseNumber.objects.filter(
+            document__work__in=works
+        ).select_related("matter_type"):
+            candidates.update(
+                [case_number.string_override, case_number.get_case_number_string()]
+            )
+
+        return sorted(
+            c.strip()
+            for c in candidates
+            if c and len(c.strip()) >= self.MIN_CANDIDATE_LENGTH
+        )
+
+    @classmethod
+    def candidate_pattern(cls, candidate):
+        """A regular expression that matches a candidate string ignoring differences in punctuation and whitespace,
+        and whether a number is preceded by "No.", so that "Act No. 71 of 2008" matches "Act 71 of 2008". It is
+        written for both Python and PostgreSQL, and is used case-insensitively."""
+        words = [
+            word
+            for word in re.split(r"\W+", candidate)
+            if word and word.lower() != "no"
+        ]
+        if len("".join(words)) < cls.MIN_CANDIDATE_LENGTH - 1:
+            # what's left would match too many documents
+            return ""
+        return r"\W+(?:no\W+)?".join(re.escape(word) for word in words)
+
+    def get_documents_mentioning(self, documents, candidates):
+        """Get the ids of documents, ordered by date, whose text mentions at least one of the candidate strings
+        (ignoring case and differences in punctuation and whitespace, see candidate_pattern). Documents without text
+        are always included, since we can't tell.
+
+        Returns None if there are more than MAX_CANDIDATES candidate strings to look for.
+        """
+        patterns = sorted({self.candidate_pattern(c) for c in candidates} - {""})
+        if len(patterns) > self.MAX_CANDIDATES:
+            return None
+
+        pks = set(
+            documents.filter(
+                Q(document_content__content_text=None) | Q(document_content=None)
+            ).values_list("pk", flat=True)
+        )
+        for i in range(0, len(patterns), self.CANDIDATES_PER_QUERY):
+            pattern = "|".join(patterns[i : i + self.CANDIDATES_PER_QUERY])
+            pks.update(
+                documents.filter(
+                    document_content__content_text__iregex=f"({pattern})"
+                ).values_list("pk", flat=True)
+            )
+
+        if not pks:
+            return []
+
+        return list(
+            documents.filter(pk__in=pks).order_by("date").values_list("pk", flat=True)
+        )
+
     def reset_processing_date(self):
         """Reset the processing date to None."""
         log.info("Resetting processing date.")
@@ -1,8 +1,6 @@
 import base64
 import logging
-import os
 import re
-import shutil
 import tempfile
 from collections import defaultdict
 from dataclasses import dataclass
@@ -22,7 +20,6 @@ from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from django_lifecycle import AFTER_SAVE, BEFORE_SAVE
 from docpipe.pipeline import PipelineContext
-from docpipe.soffice import soffice_convert
 from languages_plus.models import Language
 from lxml import etree, html
 from lxml.etree import ParserError
@@ -38,13 +35,15 @@ from peachjam.frbr_uri import (
     validate_frbr_uri_component,
     validate_frbr_uri_date,
 )
-from peachjam.helpers import pdfjs_to_text
+from peachjam.helpers import pdfjs_file_to_text
+from peachjam.languages import language_registry
 from peachjam.models.attachments import Image
 from peachjam.models.citations import CitationLink, ExtractedCitation
 from peachjam.models.enrichments import ProvisionCitation, ProvisionCitationCount
 from peachjam.models.lifecycle import AttributeHooksMixin, on_attribute_changed
 from peachjam.models.settings import pj_settings
 from peachjam.pipelines import DOC_MIMETYPES, word_pipeline
+from peachjam.soffice import soffice_convert
 from peachjam.xmlutils import parse_html_str
 
 log = logging.getLogger(__name__)
@@ -271,12 +270,20 @@ class Work(models.Model):
         return work_frbr_uris
 
     def cited_works(self):
-        """Returns a list of works cited by the current work."""
-        return ExtractedCitation.for_citing_works(self).values("target_work")
+        """Returns the works with documents that are cited by the current work."""
+        from peachjam.citation_graph import get_citation_graph
+
+        return Work.objects.filter(
+            pk__in=get_citation_graph().cites(self.pk), documents__isnull=False
+        ).distinct()
 
     def works_citing_current_work(self):
-        """Returns a list of works that cite the current work."""
-        return ExtractedCitation.for_target_works(self).values("citing_work")
+        """Returns the works with documents that cite the current work."""
+        from peachjam.citation_graph import get_citation_graph
+
+        return Work.objects.filter(
+            pk__in=get_citation_graph().cited_by(self.pk), documents__isnull=False
+        ).distinct()
 
     def save(self, *args, **kwargs):
         self.explode_frbr_uri()
@@ -318,10 +325,13 @@ class CoreDocumentQuerySet(PolymorphicQuerySet):
         """Return documents whose language match the preferred one,
         or return all docs if there are no documents in the preferred language.
         """
-        return self.filter(
-            models.Q(language_id__iso_639_3=language)
-            | ~models.Q(work__languages__contains=[language])
-        )
+        # filter on the language's primary key, rather than joining on the language table
+        language_id = language_registry.iso_639_1(language)
+        if language_id:
+            q = models.Q(language_id=language_id)
+        else:
+            q = models.Q(language_id__iso_639_3=language)
+        return self.filter(q | ~models.Q(work__languages__contains=[language]))
 
     def best_for_frbr_uri(self, frbr_uri, lang):
         """Get the best object for this FRBR URI, which could be an expression or a work URI.
@@ -696,6 +706,14 @@ class CoreDocument(AttributeHooksMixin, PolymorphicModel):
     def trigger_update_work_languages_from_language(self):
         self.work.update_languages()
 
+    @on_attribute_changed(AFTER_SAVE, ["published"], ["DocumentSocialImage.file"])
+    def trigger_render_social_image(self):
+        """Pre-render the social image in the background when the document is published."""
+        from peachjam.tasks import render_social_image
+
+        if self.published:
+            render_social_image(self.pk)
+
     def save(self, *args, **kwargs):
         # give ourselves and subclasses a chance to pre-populate derived fields before saving,
         # in case full_clean() has not yet been called
@@ -705,6 +723,10 @@ class CoreDocument(AttributeHooksMixin, PolymorphicModel):
         self.post_save()
         if is_new:
             self.work.update_languages()
+            # a document created as published (eg. in the admin) is being published, but bulk imports that don't
+            # track changes are skipped
+            if self._tracking_changes:
+                self.trigger_render_social_image()
 
     def extract_citations(self):
         """Run citation extraction on this document. If the document has content_html,
@@ -1157,24 +1179,17 @@ class DocumentContent(AttributeHooksMixin, models.Model):
         text = ""
         if hasattr(self.document, "source_file") and self.document.source_file.pk:
             # get the text from the source file, via PDF if necessary
-            with tempfile.NamedTemporaryFile() as tmp:
-                pdf = self.document.source_file.as_pdf()
-                if pdf:
-                    pdf.seek(0)
-                    shutil.copyfileobj(pdf, tmp)
-                    pdf.seek(0)
-                    tmp.flush()
-
-                    # ensure the file isn't empty, so that pdfjs_to_text doesn't fail
-                    size = os.fstat(tmp.fileno()).st_size
-                    assert size > 0, "Temporary PDF file is empty"
-
-                    text = pdfjs_to_text(tmp.name)
-                    # some PDFs have nulls, which breaks SQL insertion
-                    # replace rather than deleting to keep string length the same
-                    text = text.replace("\0", " ")
-                else:
-                    log.debug("Document has no PDF source file, text will be empty")
+            pdf = self.document.source_file.as_pdf()
+            if pdf:
+                # ensure the file isn't empty, so that pdfjs_to_text doesn't fail
+                assert pdf.size > 0, "PDF file is empty"
+
+                text = pdfjs_file_to_text(pdf)
+                # some PDFs have nulls, which breaks SQL insertion
+                # replace rather than deleting to keep string length the same
+                text = text.replace("\0", " ")
+            else:
+                log.debug("Document has no PDF source file, text will be empty")
         else:
             log.debug("Document has no source file, text will be empty")
 
@@ -1251,6 +1266,23 @@ class DocumentContent(AttributeHooksMixin, models.Model):
             if isinstance(document, Judgment):
                 document.ensure_anonymised_source_file()
 
+    @on_attribute_changed(AFTER_SAVE, ["content_html"], ["DocumentContentPDF.file"])
+    def trigger_render_content_pdf(self):
+        """Render a PDF of the content in the background for documents without a source file, so that it can be
+        downloaded instead. Anonymised judgments get an anonymised source file instead.
+        """
+        from peachjam.models import CoreDocument, DocumentContentPDF
+        from peachjam.tasks import render_document_content_pdf
+
+        if self.document_id:
+            document = CoreDocument.objects.get(pk=self.document_id)
+            if (
+                not hasattr(document, "source_file")
+                and not getattr(document, "anonymised", False)
+                and DocumentContentPDF.can_render_document(document)
+            ):
+                render_document_content_pdf(document.pk)
+
     @on_attribute_changed(
         AFTER_SAVE,
         ["content_text"],
@@ -1,3 +1,4 @@
+from django.contrib.contenttypes.models import ContentType
 from django.core.validators import RegexValidator
 from django.db import connection, models, transaction
 from django.utils.functional import cached_property
@@ -159,6 +160,61 @@ class ProvisionCitation(ProvisionEnrichment):
         self.enrichment_type = "provision_citation"
         super().save(*args, **kwargs)
 
+    @classmethod
+    def bulk_create_citations(cls, citations):
+        """Create many provision citations with two queries, rather than two per citation.
+
+        Django can't bulk create multi-table inherited models, so the parent ProvisionEnrichment rows are bulk
+        created first and then the child rows are inserted directly, using the new parent ids.
+        """
+        if not citations:
+            return citations
+
+        ctype = ContentType.objects.get_for_model(cls, for_concrete_model=False)
+        parents = []
+        for citation in citations:
+            # do what save() would have done
+            citation.enrichment_type = "provision_citation"
+            if not citation.provision_eid:
+                citation.whole_work = True
+            if citation.whole_work:
+                citation.provision_eid = None
+            citation.polymorphic_ctype = ctype
+            parents.append(
+                ProvisionEnrichment(
+                    work_id=citation.work_id,
+                    provision_eid=citation.provision_eid,
+                    whole_work=citation.whole_work,
+                    enrichment_type=citation.enrichment_type,
+                    text=citation.text,
+                    polymorphic_ctype=ctype,
+                )
+            )
+
+        with transaction.atomic():
+            ProvisionEnrichment.objects.bulk_create(parents)
+            for citation, parent in zip(citations, parents):
+                citation.pk = citation.provisionenrichment_ptr_id = parent.pk
+                citation._state.adding = False
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO peachjam_provisioncitation
+                        (provisionenrichment_ptr_id, prefix, suffix, exact, citing_document_id)
+                    SELECT * FROM unnest(%s::bigint[], %s::varchar[], %s::varchar[], %s::varchar[], %s::bigint[])
+                    """,
+                    [
+                        [c.pk for c in citations],
+                        [c.prefix for c in citations],
+                        [c.suffix for c in citations],
+                        [c.exact for c in citations],
+                        [c.citing_document_id for c in citations],
+                    ],
+                )
+
+        return citations
+
 
 class ProvisionCitationCount(models.Model):
     work = models.ForeignKey(
@@ -1,15 +1,30 @@
 import logging
+import time
+from datetime import datetime
 
 from background_task.models import Task
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from peachjam.plugins import plugins
-from peachjam.tasks import delete_document, run_ingestor, update_document
+from peachjam.tasks import (
+    delete_document,
+    delete_documents,
+    run_ingestor,
+    update_document,
+    update_documents,
+)
 
 log = logging.getLogger(__name__)
 
+# Adapters are re-used by tasks in the same process for a while, so that they keep their HTTP connections alive and
+# don't re-fetch what they have already fetched (such as lists of places). Running an ingestor always creates a
+# fresh adapter, so that changes to its settings are picked up.
+ADAPTER_CACHE_TIMEOUT = 60 * 10
+_adapters = {}
+
 
 class IngestorSetting(models.Model):
     name = models.CharField(_("name"), max_length=2048)
@@ -49,6 +64,12 @@ class Ingestor(models.Model):
     schedule = models.BigIntegerField(
         choices=INGESTOR_REPEAT_CHOICES, default=Task.HOURLY
     )
+    cursor = models.JSONField(
+        _("cursor"),
+        null=True,
+        blank=True,
+        help_text=_("Where to resume checking for updates, if it was interrupted."),
+    )
 
     class Meta:
         verbose_name = _("ingestor")
@@ -58,40 +79,140 @@ class Ingestor(models.Model):
         return self.name
 
     def check_for_updates(self):
+        """Check for updated and deleted documents, and queue tasks to update or delete them. Changes are queued as
+        they arrive from the adapter, and the cursor records how far through the changes we are, so that an
+        interrupted check can resume where it left off."""
         adapter = self.get_adapter()
+        cursor = self.cursor or {}
+        if cursor:
+            # the check was interrupted, so resume it
+            started_at = datetime.fromisoformat(cursor["started_at"])
+            log.info(f"Resuming check for ingestor updates for {self} at {cursor}")
+        else:
+            started_at = timezone.now()
         log.info(
             f"Checking for ingestor updates for {self}, last_refresh_at {self.last_refreshed_at}"
         )
-        now = timezone.now()
-        updated, deleted = adapter.check_for_updates(self.last_refreshed_at)
-        log.info(f"{len(updated)} documents to update")
-        for doc in updated:
-            update_document(self.id, doc, creator=self)
-        log.info(f"{len(deleted)} documents to delete")
-        for doc in deleted:
-            delete_document(self.id, doc, creator=self)
-
-        self.last_refreshed_at = now
+
+        n_updated = n_deleted = 0
+        for updated, deleted, position in adapter.get_changes(
+            self.last_refreshed_at, cursor.get("position")
+        ):
+            with transaction.atomic():
+                self.queue_changes(updated, deleted)
+                self.cursor = {
+                    "started_at": started_at.isoformat(),
+                    "position": position,
+                }
+                self.save(update_fields=["cursor"])
+            n_updated += len(updated)
+            n_deleted += len(deleted)
+
+        log.info(f"{n_updated} documents to update, {n_deleted} documents to delete")
+        self.last_refreshed_at = started_at
+        self.cursor = None
         self.save()
         log.info(f"Finished checking for ingestor updates for {self}")
 
+    def queue_changes(self, updated, deleted):
+        batch_size = settings.PEACHJAM["INGESTOR_BATCH_SIZE"]
+
+        if batch_size > 1:
+            updated = list(updated)
+            for i in range(0, len(updated), batch_size):
+                update_documents(self.id, updated[i : i + batch_size], creator=self)
+        else:
+            for doc in updated:
+                update_document(self.id, doc, creator=self)
+
+        if batch_size > 1:
+            deleted = list(deleted)
+            for i in range(0, len(deleted), batch_size):
+                delete_documents(self.id, deleted[i : i + batch_size], creator=self)
+        else:
+            for doc in deleted:
+                delete_document(self.id, doc, creator=self)
+
     def update_document(self, document_id):
-        adapter = self.get_adapter()
+        adapter = self.get_adapter(cached=True)
         adapter.update_document(document_id)
 
     def delete_document(self, expression_frbr_uri):
-        adapter = self.get_adapter()
+        adapter = self.get_adapter(cached=True)
         adapter.delete_document(expression_frbr_uri)
 
+    def update_documents(self, document_ids):
+        """Update a batch of documents, each in its own transaction. Documents that fail are queued to be updated
+        individually, so that they are retried."""
+        adapter = self.get_adapter(cached=True)
+        failed = []
+        start = time.monotonic()
+
+        with adapter.batch():
+            for document_id in document_ids:
+                try:
+                    with transaction.atomic():
+                        adapter.update_document(document_id)
+                except Exception as e:
+                    log.error(f"Error updating document {document_id}", exc_info=e)
+                    failed.append(document_id)
+                    # objects created while updating the document have been rolled back
+                    adapter.clear_lookups()
+
+        self.log_batch_rate("Updated", len(document_ids) - len(failed), start)
+        for document_id in failed:
+            update_document(self.id, document_id, creator=self)
+
+    def delete_documents(self, expression_frbr_uris):
+        """Delete a batch of documents, each in its own transaction. Documents that fail are queued to be deleted
+        individually, so that they are retried."""
+        adapter = self.get_adapter(cached=True)
+        failed = []
+        start = time.monotonic()
+
+        with adapter.batch():
+            for expression_frbr_uri in expression_frbr_uris:
+                try:
+                    with transaction.atomic():
+                        adapter.delete_document(expression_frbr_uri)
+                except Exception as e:
+                    log.error(
+                        f"Error deleting document {expression_frbr_uri}", exc_info=e
+                    )
+                    failed.append(expression_frbr_uri)
+                    adapter.clear_lookups()
+
+        self.log_batch_rate("Deleted", len(expression_frbr_uris) - len(failed), start)
+        for expression_frbr_uri in failed:
+            delete_document(self.id, expression_frbr_uri, creator=self)
+
+    def log_batch_rate(self, action, count, start):
+        elapsed = time.monotonic() - start
+        rate = count / elapsed if elapsed else 0
+        log.info(
+            f"{action} {count} documents in {elapsed:.1f}s ({rate:.1f} documents/sec)"
+        )
+
     def handle_webhook(self, request, data):
         adapter = self.get_adapter()
         adapter.handle_webhook(request, data)
 
-    def get_adapter(self):
+    def get_adapter(self, cached=False):
+        """Get an adapter for this ingestor. If cached is True, an adapter recently created in this process is
+        re-used, if there is one."""
         klass = plugins.registry["ingestor-adapter"][self.adapter]
+        if cached and self.pk in _adapters:
+            expires, adapter = _adapters[self.pk]
+            if expires > time.monotonic() and type(adapter) is klass:
+                adapter.ingestor = self
+                return adapter
+
         ingestor_settings = IngestorSetting.objects.filter(ingestor=self)
         settings = {s.name: s.value for s in ingestor_settings}
-        return klass(self, settings)
+        adapter = klass(self, settings)
+        if self.pk:
+            _adapters[self.pk] = (time.monotonic() + ADAPTER_CACHE_TIMEOUT, adapter)
+        return adapter
 
     def queue_task(self):
         if not self.pk:
@@ -24,6 +24,7 @@ from peachjam.decorators import CauseListDecorator, JudgmentDecorator
 from peachjam.models import (
     CoreDocument,
     DocumentContent,
+    DocumentContentPDF,
     Locality,
     SourceFile,
     on_attribute_changed,
@@ -826,14 +827,7 @@ class Judgment(CoreDocument):
 
         elif hasattr(self, "source_file") and self.source_file.anonymised_file_as_pdf:
             # we're not anonymised, but an anonymised source file exists - delete it
-            try:
-                self.source_file.anonymised_file_as_pdf.delete(False)
-            except Exception as e:
-                log.warning(
-                    f"Ignoring error while deleting {self.source_file.anonymised_file_as_pdf}",
-                    exc_info=e,
-                )
-            self.source_file.anonymised_file_as_pdf = None
+            self.source_file.delete_anonymised_file_as_pdf()
             self.source_file.save()
 
     def anonymised_source_file_fingerprint(self):
@@ -848,9 +842,9 @@ class Judgment(CoreDocument):
         return hashlib.sha256("\0".join(values).encode()).hexdigest()
 
     def create_anonymised_source_file_pdf(self):
-        """Create an anonymised source file from the HTML of this judgment. If there is already a source file,
-        store this new one as the anonymised pdf. Otherwise, create a new source file using this PDF and set
-        the anonymised flag."""
+        """Create an anonymised PDF from the HTML of this judgment. If there is already a source file, the rendered
+        PDF (a DocumentContentPDF) is served as its anonymised PDF. Otherwise, create a new source file using this
+        PDF and set the anonymised flag."""
         doc_content = self.get_or_create_document_content()
         if (
             self.anonymised
@@ -859,8 +853,8 @@ class Judgment(CoreDocument):
             and not doc_content.content_html_is_akn
         ):
             fingerprint = self.anonymised_source_file_fingerprint()
-            pdf = self.convert_html_to_pdf()
-            f = File(pdf, name=f"{slugify(self.case_name)}.pdf")
+            # the rendered content is cached, so changes to the case name or title don't re-render it
+            content_pdf = DocumentContentPDF.get_or_create_for_document(self)
 
             # Rendering can take some time. Re-check the inputs while holding the judgment row lock so that an
             # outdated queued task cannot overwrite a newer PDF, or restore one after anonymisation is removed.
@@ -877,17 +871,21 @@ class Judgment(CoreDocument):
                 except SourceFile.DoesNotExist:
                     # Create a source file using the anonymised PDF when there is no original source file.
                     # There is a small chance of a race condition here; the task will then be retried.
-                    SourceFile.objects.create(
-                        document=current,
-                        file=f,
-                        mimetype="application/pdf",
-                        file_is_anonymised=True,
-                    )
+                    with content_pdf.file.open("rb") as pdf:
+                        SourceFile.objects.create(
+                            document=current,
+                            file=File(pdf, name=f"{slugify(self.case_name)}.pdf"),
+                            mimetype="application/pdf",
+                            file_is_anonymised=True,
+                        )
+                    # the source file is now the only copy that is needed
+                    content_pdf.delete()
                 else:
-                    if source_file.file_is_anonymised:
-                        return
-                    source_file.anonymised_file_as_pdf = f
-                    source_file.save()
+                    # the rendered content PDF is served as the anonymised PDF, so a copy from before it was
+                    # introduced is no longer needed
+                    if source_file.anonymised_file_as_pdf:
+                        source_file.delete_anonymised_file_as_pdf()
+                        source_file.save()
 
     @on_attribute_changed(
         AFTER_SAVE,
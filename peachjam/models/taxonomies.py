@@ -1,8 +1,10 @@
 import logging
+import time
 
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import connection, models, transaction
 from django.urls import reverse
 from django.utils.text import slugify
@@ -14,6 +16,13 @@ from peachjam.models import CoreDocument, EntityProfile
 
 log = logging.getLogger(__name__)
 
+# the version of the taxonomy tree is shared between processes through the cache, and bumped when any taxonomy changes
+TREE_VERSION_KEY = "peachjam:taxonomy_tree_version"
+# trees cached in this process for the current version, keyed by root id (None for the whole tree)
+_trees = {"version": None, "trees": {}}
+# the maximum number of trees to cache in this process
+MAX_CACHED_TREES = 100
+
 
 class Taxonomy(MP_Node):
     name = models.CharField(_("name"), max_length=255)
@@ -139,6 +148,11 @@ class Taxonomy(MP_Node):
             for child in self.get_children():
                 child.save()
 
+    def move(self, target, pos=None):
+        super().move(target, pos)
+        # moving doesn't save the node
+        self.tree_changed()
+
     def get_allowed_children(self, user):
         if user.is_authenticated:
             allowed_taxonomies = set(
@@ -213,55 +227,118 @@ class Taxonomy(MP_Node):
 
         return cls.sort_item_tree(tree)
 
+    @classmethod
+    def tree_changed(cls):
+        """Bump the tree version now, and again once the transaction commits, so that a tree cached by another
+        process before the change was committed isn't kept."""
+        cls.bump_tree_version()
+        transaction.on_commit(cls.bump_tree_version)
+
+    @classmethod
+    def get_tree_version(cls):
+        """The current tree version. This is a timestamp rather than a counter, so that if the cache evicts it, the
+        new version is never one that a process has already cached trees for."""
+        return cache.get_or_set(TREE_VERSION_KEY, time.time_ns, None)
+
+    @classmethod
+    def bump_tree_version(cls):
+        """Invalidate the cached taxonomy trees, in this process and in others."""
+        _trees["trees"] = {}
+        cache.set(TREE_VERSION_KEY, time.time_ns(), None)
+
+    @classmethod
+    def get_cached_tree(cls, root=None):
+        """Get the sorted dump_bulk tree of all taxonomies (or of root and its descendants), without hidden nodes.
+
+        The tree is cached in this process until the tree version changes. The result is shared and must not be
+        changed. It is a dict with:
+
+        * tree: the sorted tree
+        * pk_list: the ids of all nodes in the tree
+        * restricted: the ids of restricted nodes in the tree
+        """
+        version = cls.get_tree_version()
+        if _trees["version"] != version:
+            _trees["version"] = version
+            _trees["trees"] = {}
+
+        key = root.pk if root else None
+        cached = _trees["trees"].get(key)
+        if cached is None:
+            pk_list = []
+            restricted = set()
+
+            def prune_hidden(nodes):
+                pruned = []
+                for node in nodes:
+                    data = node.get("data", {})
+                    if data.get("hidden", False):
+                        continue
+                    pk_list.append(node["id"])
+                    if data.get("restricted", False):
+                        restricted.add(node["id"])
+                    if "children" in node:
+                        children = prune_hidden(node["children"])
+                        if children:
+                            node["children"] = children
+                        else:
+                            node.pop("children")
+                    pruned.append(node)
+                return pruned
+
+            tree = root.dump_bulk(root) if root else cls.dump_bulk()
+            cached = {
+                "tree": cls.sort_bulk_tree(prune_hidden(tree)),
+                "pk_list": pk_list,
+                "restricted": restricted,
+            }
+            if len(_trees["trees"]) >= MAX_CACHED_TREES:
+                _trees["trees"] = {}
+            _trees["trees"][key] = cached
+
+        return cached
+
     @classmethod
     def get_allowed_taxonomies(cls, user=None, root=None):
-        if user and user.is_authenticated:
-            allowed_taxonomies = set(
-                get_objects_for_user(user, "peachjam.view_taxonomy").values_list(
-                    "id", flat=True
-                )
+        """Get the sorted tree of taxonomies (or of root and its descendants) that the user is allowed to see,
+        and a list of their ids. The result must not be changed."""
+        cached = cls.get_cached_tree(root)
+
+        # restricted nodes the user is not allowed to see
+        excluded = cached["restricted"]
+        if excluded and user and user.is_authenticated:
+            excluded = excluded - set(
+                get_objects_for_user(
+                    user,
+                    "peachjam.view_taxonomy",
+                    klass=cls.objects.filter(pk__in=excluded),
+                ).values_list("id", flat=True)
             )
-        else:
-            allowed_taxonomies = []
-
-        node_ids = []
 
-        def filter_nodes(node):
-            data = node.get("data", {})
-            is_hidden = data.get("hidden", False)
-            if is_hidden:
-                return None
-            is_restricted = data.get("restricted", False)
-            is_allowed = node.get("id") in allowed_taxonomies
-            if is_restricted and not is_allowed:
-                return None
+        if not excluded:
+            return {"tree": cached["tree"], "pk_list": cached["pk_list"]}
 
-            node_ids.append(node["id"])
+        node_ids = []
 
-            if "children" in node:
-                filtered_children = [
-                    child
-                    for child in (filter_nodes(child) for child in node["children"])
-                    if child is not None
-                ]
-                if filtered_children:
-                    node["children"] = filtered_children
-                else:
-                    node.pop("children", None)
-            return node
+        def filter_nodes(nodes):
+            filtered = []
+            for node in nodes:
+                if node["id"] in excluded:
+                    continue
+                node_ids.append(node["id"])
+                if "children" in node:
+                    # copy the node, so that the cached tree is not changed
+                    node = dict(node)
+                    children = filter_nodes(node["children"])
+                    if children:
+                        node["children"] = children
+                    else:
+                        node.pop("children")
+                filtered.append(node)
+            return filtered
 
-        # Filter the tree
-        if root:
-            taxonomies = root.dump_bulk(root)
-        else:
-            taxonomies = cls.dump_bulk()
-        filtered_taxonomies = [
-            filtered_node
-            for filtered_node in (filter_nodes(node) for node in taxonomies)
-            if filtered_node is not None
-        ]
         return {
-            "tree": cls.sort_bulk_tree(filtered_taxonomies),
+            "tree": filter_nodes(cached["tree"]),
             "pk_list": node_ids,
         }
 
@@ -319,6 +396,93 @@ class TaxonomyDocumentCount(models.Model):
     def __str__(self):
         return f"{self.taxonomy.name}: {self.count}"
 
+    @classmethod
+    def documents_added(cls, document_topics):
+        """Adjust counts after DocumentTopics have been created, given as (document_id, topic_id) pairs.
+
+        Each ancestor of the topic (including the topic itself) gains the document, unless the document was already
+        linked to something under that ancestor. The ancestors are found from the topic's materialised path, and all
+        the counts are adjusted in a single statement.
+        """
+        if not document_topics:
+            return
+
+        document_ids, topic_ids = zip(*document_topics)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH added (document_id, topic_id) AS (
+                    SELECT * FROM unnest(%s::bigint[], %s::bigint[])
+                ),
+                affected AS (
+                    SELECT DISTINCT added.document_id, ancestor.id AS taxonomy_id
+                    FROM added
+                    INNER JOIN peachjam_taxonomy topic ON topic.id = added.topic_id
+                    CROSS JOIN LATERAL generate_series(1, topic.depth) AS step (n)
+                    INNER JOIN peachjam_taxonomy ancestor
+                        ON ancestor.path = substr(topic.path, 1, step.n * %s)
+                    WHERE NOT EXISTS (
+                        -- the document was already linked to this ancestor or one of its descendants
+                        SELECT 1
+                        FROM peachjam_documenttopic dt
+                        INNER JOIN peachjam_taxonomy descendant ON descendant.id = dt.topic_id
+                        WHERE dt.document_id = added.document_id
+                            AND descendant.path LIKE ancestor.path || '%%'
+                            AND (dt.document_id, dt.topic_id) NOT IN (SELECT * FROM added)
+                    )
+                )
+                INSERT INTO peachjam_taxonomydocumentcount (taxonomy_id, count)
+                SELECT taxonomy_id, COUNT(*) FROM affected GROUP BY taxonomy_id
+                ON CONFLICT (taxonomy_id)
+                DO UPDATE SET count = peachjam_taxonomydocumentcount.count + EXCLUDED.count
+                """,
+                [list(document_ids), list(topic_ids), Taxonomy.steplen],
+            )
+
+    @classmethod
+    def documents_removed(cls, document_topics):
+        """Adjust counts after DocumentTopics have been deleted, given as (document_id, topic_id) pairs.
+
+        Each ancestor of the topic (including the topic itself) loses the document, unless the document is still
+        linked to something else under that ancestor. All the DocumentTopics deleted together must be given together,
+        otherwise a document linked twice under an ancestor is removed from its count twice.
+        """
+        if not document_topics:
+            return
+
+        document_ids, topic_ids = zip(*document_topics)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH removed (document_id, topic_id) AS (
+                    SELECT * FROM unnest(%s::bigint[], %s::bigint[])
+                ),
+                affected AS (
+                    SELECT DISTINCT removed.document_id, ancestor.id AS taxonomy_id
+                    FROM removed
+                    INNER JOIN peachjam_taxonomy topic ON topic.id = removed.topic_id
+                    CROSS JOIN LATERAL generate_series(1, topic.depth) AS step (n)
+                    INNER JOIN peachjam_taxonomy ancestor
+                        ON ancestor.path = substr(topic.path, 1, step.n * %s)
+                    WHERE NOT EXISTS (
+                        -- the document is still linked to this ancestor or one of its descendants
+                        SELECT 1
+                        FROM peachjam_documenttopic dt
+                        INNER JOIN peachjam_taxonomy descendant ON descendant.id = dt.topic_id
+                        WHERE dt.document_id = removed.document_id
+                            AND descendant.path LIKE ancestor.path || '%%'
+                    )
+                )
+                UPDATE peachjam_taxonomydocumentcount
+                SET count = GREATEST(peachjam_taxonomydocumentcount.count - affected_count.n, 0)
+                FROM (
+                    SELECT taxonomy_id, COUNT(*) AS n FROM affected GROUP BY taxonomy_id
+                ) affected_count
+                WHERE peachjam_taxonomydocumentcount.taxonomy_id = affected_count.taxonomy_id
+                """,
+                [list(document_ids), list(topic_ids), Taxonomy.steplen],
+            )
+
     @classmethod
     def refresh_for_taxonomy(cls, root):
         """Recompute document counts for all descendants of root.
@@ -326,13 +490,19 @@ class TaxonomyDocumentCount(models.Model):
         Each node's count includes documents linked directly to it plus documents
         linked to any of its descendants. Uses treebeard's materialised path
         (steplen=4) to walk ancestors efficiently in a single SQL query.
+
+        Counts are kept up to date as DocumentTopics change, so this is a reconciliation. Returns the number of
+        nodes whose counts had drifted from the recomputed counts.
         """
         if root is None:
-            return
+            return 0
 
         root_path = root.path
 
         with transaction.atomic():
+            counts = cls.objects.filter(taxonomy__path__startswith=root_path)
+            before = dict(counts.exclude(count=0).values_list("taxonomy_id", "count"))
+
             with connection.cursor() as cursor:
                 # Delete existing counts for this tree
                 cursor.execute(
@@ -367,8 +537,37 @@ class TaxonomyDocumentCount(models.Model):
                     [root_path + "%"],
                 )
 
+            after = dict(counts.values_list("taxonomy_id", "count"))
+
+        drift = len(
+            [
+                pk
+                for pk in before.keys() | after.keys()
+                if before.get(pk) != after.get(pk)
+            ]
+        )
+        if drift:
+            log.warning(
+                "Document counts for %s nodes in taxonomy tree rooted at '%s' (pk=%s) had drifted",
+                drift,
+                root.slug,
+                root.pk,
+            )
+
         log.info(
             "Refreshed document counts for taxonomy tree rooted at '%s' (pk=%s)",
             root.slug,
             root.pk,
         )
+        return drift
+
+    @classmethod
+    def refresh_for_all_taxonomies(cls):
+        """Reconcile document counts for each taxonomy tree. Returns the total number of drifted nodes."""
+        drift = 0
+        for root in list(Taxonomy.get_root_nodes()):
+            drift += cls.refresh_for_taxonomy(root)
+        log.info(
+            "Refreshed document counts for all taxonomies, %d nodes had drifted", drift
+        )
+        return drift
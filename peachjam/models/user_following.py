@@ -334,7 +334,9 @@ class UserFollowing(models.Model):
         return qs.none()
 
     def documents_for_followed_search(self):
-        return self.saved_search.find_new_hits()
+        return self.saved_search.find_new_hits(
+            created_after=self.last_alerted_at, date_after=self.cutoff_date
+        )
 
     def update_follow(self):
         if self.is_subscription_locked:
@@ -369,16 +371,15 @@ class UserFollowing(models.Model):
         self.save(update_fields=["last_alerted_at"])
         return True
 
-    def _update_search(self):
-        hits = self.documents_for_followed_search()
-
-        # avoid alerts for documents older than cutoff
-        hits = [h for h in hits if h.document.date > self.cutoff_date]
+    def _update_search(self, hits=None):
+        """Create a timeline event for new hits for the followed search. Hits can be provided by the caller
+        if they have been found already, such as by the SavedSearchEvaluator."""
+        if hits is None:
+            hits = self.documents_for_followed_search()
 
+        hits = self.filter_new_search_hits(hits)
         if self.last_alerted_at:
-            hits = [h for h in hits if h.document.created_at > self.last_alerted_at][
-                :10
-            ]
+            hits = hits[:10]
 
         if not hits:
             return False
@@ -388,6 +389,16 @@ class UserFollowing(models.Model):
         self.save(update_fields=["last_alerted_at"])
         return True
 
+    def filter_new_search_hits(self, hits):
+        """Only keep the search hits that are new for this follow."""
+        # avoid alerts for documents older than cutoff
+        hits = [h for h in hits if h.document.date > self.cutoff_date]
+
+        if self.last_alerted_at:
+            hits = [h for h in hits if h.document.created_at > self.last_alerted_at]
+
+        return hits
+
     def _update_new_citation(self, citation):
         assert self.saved_document
 
@@ -483,16 +494,32 @@ class UserFollowing(models.Model):
         TimelineEvent.add_new_relationship_event(self, relationship, event_work)
 
     @classmethod
-    def update_follows_for_user(cls, user):
+    def update_follows_for_user(cls, user, saved_searches=True):
+        """Update the user's follows. Saved search follows can be excluded if they are evaluated separately for
+        all users, with update_saved_search_follows."""
         follows = user.following.filter(subscription_locked_at__isnull=True).filter(
             models.Q(saved_search__isnull=True)
             | models.Q(saved_search__subscription_locked_at__isnull=True),
             models.Q(saved_document__isnull=True)
             | models.Q(saved_document__subscription_locked_at__isnull=True),
         )
+        if not saved_searches:
+            follows = follows.filter(saved_search__isnull=True)
         for follow in follows:
             follow.update_follow()
 
+    @classmethod
+    def update_saved_search_follows(cls):
+        """Update all unlocked saved search follows, executing each distinct search only once."""
+        from peachjam_search.alerts import SavedSearchEvaluator
+
+        follows = cls.objects.filter(
+            saved_search__isnull=False,
+            subscription_locked_at__isnull=True,
+            saved_search__subscription_locked_at__isnull=True,
+        ).select_related("saved_search")
+        SavedSearchEvaluator().update_follows(follows)
+
     @classmethod
     def update_new_citation_follows(cls, citation):
         follows = cls.objects.filter(
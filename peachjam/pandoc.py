@@ -0,0 +1,283 @@
+"""Markdown to HTML conversion using pandoc, with the rendered HTML cached by content hash.
+
+Rendered HTML is cached in a bounded in-process LRU cache, and in the shared Django cache, keyed on a hash of the
+markdown. Only markdown that isn't in either cache is converted.
+
+Starting pandoc is slow compared to the conversion itself, so conversions are sent in batches to a long-lived
+``pandoc server`` process (pandoc 3 and later) rather than running pandoc once per conversion. The server is a pure
+converter (it doesn't read or write files), and is only used from this process. If the server is disabled or can't be
+used, pandoc is run once per conversion instead.
+"""
+
+import atexit
+import hashlib
+import logging
+import socket
+import subprocess
+import tempfile
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+
+# pandoc options, as command line arguments and as server request parameters
+PANDOC_ARGS = ["--wrap=none", "--from=markdown", "--to=html"]
+PANDOC_PARAMS = {"wrap": "none", "from": "markdown", "to": "html"}
+# change this when the options change, so that cached HTML is not re-used
+CACHE_VERSION = 1
+# seconds to keep rendered HTML in the shared cache
+CACHE_TIMEOUT = 60 * 60 * 24
+# seconds to allow for a batch of conversions
+TIMEOUT = 60 * 5
+# maximum number of texts to send to the server in one request
+BATCH_SIZE = 50
+
+
+class PandocError(Exception):
+    pass
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache of strings, bounded by the total length of the cached values."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_size:
+            return
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.items[key] = value
+            self.size += len(value)
+            while self.size > self.max_size:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+
+class PandocServer:
+    """A long-lived pandoc server process that converts batches of markdown to HTML."""
+
+    # seconds to wait for the server to start accepting connections
+    start_timeout = 10
+    # seconds to wait before trying again after the server fails to start, doubling after each failure
+    retry_delay = 60
+    max_retry_delay = 60 * 60
+
+    def __init__(self):
+        self.process = None
+        self.port = None
+        self.lock = Lock()
+        # when the server can't be started (perhaps pandoc is older than version 3), we don't try again until this
+        # time, so that every conversion doesn't wait for it to fail
+        self.retry_at = None
+        self.failures = 0
+
+    @property
+    def available(self):
+        return self.retry_at is None or time.monotonic() >= self.retry_at
+
+    def is_healthy(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        # find a free port
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+
+        self.process = subprocess.Popen(
+            ["pandoc", "server", "--port", str(self.port), "--timeout", str(TIMEOUT)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.stop()
+                raise PandocError("pandoc server exited while starting")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                log.info(f"Started pandoc server on port {self.port}")
+                return
+            except OSError:
+                time.sleep(0.1)
+
+        self.stop()
+        raise PandocError(
+            f"pandoc server didn't start within {self.start_timeout} seconds"
+        )
+
+    def stop(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def ensure_started(self):
+        if not self.is_healthy():
+            with self.lock:
+                if not self.is_healthy():
+                    self.stop()
+                    try:
+                        self.start()
+                    except (PandocError, OSError):
+                        delay = min(
+                            self.retry_delay * 2**self.failures, self.max_retry_delay
+                        )
+                        self.failures += 1
+                        self.retry_at = time.monotonic() + delay
+                        log.warning(
+                            f"pandoc server failed to start, not trying again for {delay} seconds"
+                        )
+                        raise
+                    self.retry_at = None
+                    self.failures = 0
+
+    def convert_many(self, texts):
+        """Convert a list of markdown texts to HTML, returning a list of HTML strings."""
+        self.ensure_started()
+        try:
+            resp = requests.post(
+                f"http://127.0.0.1:{self.port}/batch",
+                json=[{**PANDOC_PARAMS, "text": text} for text in texts],
+                headers={"Accept": "application/json"},
+                timeout=TIMEOUT,
+            )
+            resp.raise_for_status()
+            results = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            raise PandocError(f"pandoc server request failed: {e}") from e
+
+        # each result is either an object with the output or an error, or just the output
+        outputs = []
+        for r in results:
+            if isinstance(r, dict):
+                if "output" not in r:
+                    raise PandocError(
+                        f"pandoc server conversion failed: {r.get('error', r)}"
+                    )
+                r = r["output"]
+            outputs.append(r)
+        return outputs
+
+
+_lru = None
+_server = None
+_lock = Lock()
+
+
+def get_lru_cache():
+    global _lru
+    if _lru is None:
+        with _lock:
+            if _lru is None:
+                _lru = LRUCache(settings.PEACHJAM["MARKDOWN_CACHE_SIZE"])
+    return _lru
+
+
+def get_pandoc_server():
+    """The process-wide pandoc server, or None if it is disabled or unavailable."""
+    global _server
+    if not settings.PEACHJAM["PANDOC_SERVER"]:
+        return None
+    if _server is None:
+        with _lock:
+            if _server is None:
+                _server = PandocServer()
+                atexit.register(_server.stop)
+    return _server if _server.available else None
+
+
+def cache_key(text):
+    return (
+        f"pandoc-md-{CACHE_VERSION}-{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    )
+
+
+def markdown_to_html(text):
+    """Convert markdown text to HTML using pandoc, using cached HTML if possible."""
+    return markdown_to_html_many([text])[0]
+
+
+def markdown_to_html_many(texts):
+    """Convert a list of markdown texts to HTML using pandoc, returning a list of HTML strings. HTML is
+    looked up in the local and shared caches, and the rest is converted in batches."""
+    keys = [cache_key(text) for text in texts]
+    lru = get_lru_cache()
+    found = {}
+    for key in keys:
+        html = lru.get(key)
+        if html is not None:
+            found[key] = html
+
+    missing = [key for key in dict.fromkeys(keys) if key not in found]
+    if missing:
+        shared = cache.get_many(missing)
+        for key, html in shared.items():
+            lru.set(key, html)
+        found.update(shared)
+
+    todo = {key: text for key, text in zip(keys, texts) if key not in found}
+    if todo:
+        converted = dict(zip(todo.keys(), convert_many(list(todo.values()))))
+        cache.set_many(converted, timeout=CACHE_TIMEOUT)
+        for key, html in converted.items():
+            lru.set(key, html)
+        found.update(converted)
+
+    return [found[key] for key in keys]
+
+
+def convert_many(texts):
+    """Convert a list of markdown texts to HTML without caching. Uses the pandoc server if it is enabled, and
+    otherwise (or if the server fails) runs pandoc once for each text."""
+    server = get_pandoc_server()
+    if server:
+        try:
+            results = []
+            for i in range(0, len(texts), BATCH_SIZE):
+                results.extend(server.convert_many(texts[i : i + BATCH_SIZE]))
+            return results
+        except (PandocError, OSError) as e:
+            log.warning(
+                "pandoc server failed, running pandoc directly instead", exc_info=e
+            )
+
+    return [convert_subprocess(text) for text in texts]
+
+
+def convert_subprocess(text):
+    """Convert markdown text to HTML by running pandoc on the commandline."""
+    with tempfile.NamedTemporaryFile(suffix=".md") as inf:
+        with tempfile.NamedTemporaryFile(suffix=".html") as outf:
+            inf.write(text.encode("utf-8"))
+            inf.flush()
+            cmd = ["pandoc"] + PANDOC_ARGS + ["--output", outf.name, inf.name]
+            subprocess.run(cmd, check=True)
+            return outf.read().decode("utf-8")
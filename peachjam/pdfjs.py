@@ -0,0 +1,49 @@
+"""A pool of long-lived pdfjs text extraction processes.
+
+Each worker runs the PDFJS_TO_TEXT script in --server mode, which streams back one JSON line per page, so that
+Node and pdf.js are started once per worker rather than once per PDF. See bin/pdfjs-to-text for the protocol.
+"""
+
+import base64
+from threading import Lock
+
+from django.conf import settings
+
+from peachjam.workers import WorkerError, WorkerPool
+
+
+class PdfjsError(WorkerError):
+    pass
+
+
+class PdfjsPool(WorkerPool):
+    error_class = PdfjsError
+
+    def __init__(self, size):
+        super().__init__(size, [settings.PEACHJAM["PDFJS_TO_TEXT"], "--server"])
+
+    def iter_pages(self, fname=None, data=None):
+        """Yield the text of each page of a PDF as it is extracted, given either its filename or its contents."""
+        request = (
+            {"file": fname}
+            if fname
+            else {"data": base64.b64encode(data).decode("ascii")}
+        )
+        for msg in self.iter_messages(request):
+            if "page" in msg:
+                yield msg["text"]
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_pdfjs_pool():
+    """The process-wide pool, or None if it is disabled."""
+    global _pool
+    size = settings.PEACHJAM["PDFJS_POOL_SIZE"]
+    if size and _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PdfjsPool(size)
+    return _pool
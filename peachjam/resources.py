@@ -22,7 +22,7 @@ from django.forms import ValidationError
 from django.urls import reverse
 from django.utils.text import slugify
 from docpipe.pdf import pdf_to_text
-from docpipe.soffice import SOfficeError, soffice_convert
+from docpipe.soffice import SOfficeError
 from import_export import fields, resources
 from import_export.formats.base_formats import CSV, XLSX
 from import_export.widgets import (
@@ -68,6 +68,7 @@ from peachjam.models import (
     citations_processor,
 )
 from peachjam.pipelines import DOC_MIMETYPES
+from peachjam.soffice import soffice_convert
 
 from .download import download_source_file
 
@@ -460,7 +461,7 @@ class BaseDocumentResource(resources.ModelResource):
     def after_save_instance(self, instance, row, **kwargs):
         if not kwargs.get("dry_run", ""):
             cp = citations_processor()
-            cp.queue_re_extract_citations(instance.date)
+            cp.queue_re_extract_citations(instance.date, instance)
 
     def attach_source_file(self, instance, source_url):
         if source_url:
@@ -206,6 +206,8 @@ PEACHJAM = {
     "SEARCH_JURISDICTION_FILTER": False,
     "SEARCH_SUGGESTIONS": os.environ.get("SEARCH_SUGGESTIONS", "false") == "true",
     "SEARCH_SEMANTIC": os.environ.get("SEARCH_SEMANTIC", "false") == "true",
+    # seconds to wait for a query embedding before falling back to a text-only search
+    "SEARCH_EMBEDDING_BUDGET": float(os.environ.get("SEARCH_EMBEDDING_BUDGET", "1.5")),
     # CoreDocument.doc_type values that are excluded from semantic search indexing
     "SEARCH_SEMANTIC_EXCLUDE_DOCTYPES": ["gazette", "causelist"],
     "SEARCH_FAKE_DOCUMENTS": False,
@@ -221,7 +223,28 @@ PEACHJAM = {
         "terms_of_use",
     ],
     "PDFJS_TO_TEXT": "bin/pdfjs-to-text" if DEBUG else "pdfjs-to-text",
+    # number of long-lived pdfjs-to-text workers per process, 0 to disable
+    "PDFJS_POOL_SIZE": int(os.environ.get("PDFJS_POOL_SIZE", "0" if DEBUG else "2")),
     "HTML_TO_PNG": "bin/html-to-png" if DEBUG else "html-to-png",
+    # number of warm html-to-png browsers per process, 0 to disable
+    "HTML_TO_PNG_POOL_SIZE": int(
+        os.environ.get("HTML_TO_PNG_POOL_SIZE", "0" if DEBUG else "1")
+    ),
+    # number of warm LibreOffice instances per process used for document conversions, 0 to disable
+    "SOFFICE_POOL_SIZE": int(
+        os.environ.get("SOFFICE_POOL_SIZE", "0" if DEBUG else "2")
+    ),
+    # convert markdown with a long-lived pandoc server (pandoc 3+), rather than running pandoc each time
+    "PANDOC_SERVER": os.environ.get("PANDOC_SERVER", "false" if DEBUG else "true")
+    == "true",
+    # maximum total size (in characters) of rendered markdown HTML cached in each process
+    "MARKDOWN_CACHE_SIZE": int(os.environ.get("MARKDOWN_CACHE_SIZE", "16000000")),
+    # directory for the citation graph snapshot, shared by all processes on a host
+    "CITATION_GRAPH_DIR": os.environ.get(
+        "CITATION_GRAPH_DIR", "/var/tmp/peachjam_citation_graph"
+    ),
+    # number of documents updated together in one ingestor task, 1 to update each document in its own task
+    "INGESTOR_BATCH_SIZE": int(os.environ.get("INGESTOR_BATCH_SIZE", "50")),
     # Customer.io
     "CUSTOMERIO_JS_KEY": os.environ.get("CUSTOMERIO_JS_KEY"),
     "CUSTOMERIO_PYTHON_KEY": os.environ.get("CUSTOMERIO_PYTHON_KEY"),
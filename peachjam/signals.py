@@ -1,4 +1,6 @@
 import logging
+import threading
+from weakref import WeakKeyDictionary
 
 import allauth.account.signals as allauth_signals
 from asgiref.sync import async_to_sync
@@ -11,18 +13,25 @@ from django.dispatch import receiver
 from django.dispatch.dispatcher import Signal
 from django_comments.models import Comment
 from django_comments.signals import comment_will_be_posted
+from languages_plus.models import Language
 
+from peachjam.citation_graph import citation_graph_store
 from peachjam.customerio import get_customerio, track_account_created_signup_event
+from peachjam.languages import language_registry
 from peachjam.models import (
     Annotation,
     CitationLink,
+    CitationSummary,
     CoreDocument,
     DocumentChatThread,
+    DocumentTopic,
     ExtractedCitation,
     Folder,
     JudgmentFlynote,
     Relationship,
     SavedDocument,
+    Taxonomy,
+    TaxonomyDocumentCount,
     UserFollowing,
     UserProfile,
     Work,
@@ -67,6 +76,15 @@ def doc_deleted_update_extracted_citations(sender, instance, **kwargs):
         update_extracted_citations_for_a_work(instance.work_id)
 
 
+@receiver(signals.post_save)
+@receiver(signals.post_delete)
+def doc_changed_update_citation_summaries(sender, instance, raw=False, **kwargs):
+    """Update the citation summaries that describe the work of a subclass of CoreDocument, since its latest
+    document may have changed."""
+    if isinstance(instance, CoreDocument) and not raw and instance.work_id:
+        CitationSummary.refresh_for_other_work(instance.work_id)
+
+
 @receiver(signals.post_save, sender=CitationLink)
 def citation_link_saved_update_extracted_citations(sender, instance, raw, **kwargs):
     """Update extracted citations when source citation links are changed."""
@@ -86,16 +104,87 @@ def citation_link_deleted_update_extracted_citations(sender, instance, **kwargs)
 
 @receiver(signals.post_save, sender=ExtractedCitation)
 def extracted_citation_saved(sender, instance, **kwargs):
-    """Update citation counts on works."""
+    """Update citation summaries, counts on works and the citation graph."""
+    CitationSummary.refresh_for_citation(
+        instance.citing_work_id, instance.target_work_id
+    )
     ExtractedCitation.update_counts_for_work(instance.citing_work)
     ExtractedCitation.update_counts_for_work(instance.target_work)
+    citation_graph_store.citations_changed(instance.citing_work_id)
 
 
 @receiver(signals.post_delete, sender=ExtractedCitation)
 def extracted_citation_deleted(sender, instance, **kwargs):
-    """Update citation counts on works."""
+    """Update citation summaries, counts on works and the citation graph."""
+    CitationSummary.refresh_for_citation(
+        instance.citing_work_id, instance.target_work_id
+    )
     ExtractedCitation.update_counts_for_work(instance.citing_work)
     ExtractedCitation.update_counts_for_work(instance.target_work)
+    citation_graph_store.citations_changed(instance.citing_work_id)
+
+
+@receiver(signals.post_save, sender=Language)
+@receiver(signals.post_delete, sender=Language)
+def language_changed(sender, **kwargs):
+    """Reload the language registry when languages change."""
+    language_registry.clear()
+
+
+@receiver(signals.post_save, sender=Taxonomy)
+@receiver(signals.post_delete, sender=Taxonomy)
+def taxonomy_changed(sender, **kwargs):
+    """Invalidate cached taxonomy trees when taxonomies change."""
+    Taxonomy.tree_changed()
+
+
+# DocumentTopics that are being deleted together, by the origin of the deletion, per thread
+_document_topic_deletions = threading.local()
+
+
+def get_document_topic_deletions(origin, create=False):
+    if not hasattr(_document_topic_deletions, "batches"):
+        _document_topic_deletions.batches = WeakKeyDictionary()
+    batches = _document_topic_deletions.batches
+    try:
+        if create:
+            return batches.setdefault(origin, {"pending": 0, "deleted": []})
+        return batches.get(origin)
+    except TypeError:
+        # there is no origin, or it can't be tracked
+        return None
+
+
+@receiver(signals.post_save, sender=DocumentTopic)
+def document_topic_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        TaxonomyDocumentCount.documents_added(
+            [(instance.document_id, instance.topic_id)]
+        )
+
+
+@receiver(signals.pre_delete, sender=DocumentTopic)
+def document_topic_deleting(sender, instance, origin=None, **kwargs):
+    deletions = get_document_topic_deletions(origin, create=True)
+    if deletions is not None:
+        deletions["pending"] += 1
+
+
+@receiver(signals.post_delete, sender=DocumentTopic)
+def document_topic_deleted(sender, instance, origin=None, **kwargs):
+    """Adjust taxonomy document counts once all the DocumentTopics deleted together have been deleted. Django sends
+    pre_delete for all of them before deleting any, so we know how many to wait for."""
+    pair = (instance.document_id, instance.topic_id)
+    deletions = get_document_topic_deletions(origin)
+    if deletions is None or deletions["pending"] < 1:
+        TaxonomyDocumentCount.documents_removed([pair])
+        return
+
+    deletions["deleted"].append(pair)
+    deletions["pending"] -= 1
+    if not deletions["pending"]:
+        _document_topic_deletions.batches.pop(origin, None)
+        TaxonomyDocumentCount.documents_removed(deletions["deleted"])
 
 
 @receiver(signals.post_save, sender=User)
@@ -0,0 +1,201 @@
+"""A pool of warm LibreOffice instances for converting documents, as a drop-in replacement for
+docpipe.soffice.soffice_convert.
+
+Each slot in the pool has its own LibreOffice user profile and a resident headless soffice process using that
+profile. A conversion borrows a slot and runs soffice --convert-to against the slot's profile, which hands the
+conversion over to the already-running instance rather than starting (and initialising a profile for) a new one.
+Because each slot has its own profile, conversions in different slots don't contend for the profile lock, and at
+most one conversion runs in a slot at a time.
+
+Slots are recycled (their soffice process is killed and restarted) when a conversion fails or times out, when the
+resident process has died, and after a fixed number of conversions, to bound memory growth.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+from pathlib import Path
+from threading import Lock
+
+from django.conf import settings
+from docpipe import soffice as docpipe_soffice
+from docpipe.soffice import SOfficeError
+
+log = logging.getLogger(__name__)
+
+# the command used to run soffice, which may be prefixed with resource limits (see apps.py)
+SOFFICE_CMD = ["soffice"]
+# seconds to allow for a conversion
+TIMEOUT = 60 * 10
+# seconds to wait for a free slot before giving up
+QUEUE_TIMEOUT = 60 * 10
+
+
+class SOfficeSlot:
+    """A LibreOffice user profile with a resident soffice process that conversions are handed to."""
+
+    # recycle the resident process after this many conversions
+    max_conversions = 200
+
+    def __init__(self, index, root_dir):
+        self.index = index
+        self.profile_dir = Path(root_dir) / f"profile-{index}"
+        self.process = None
+        self.conversions = 0
+
+    @property
+    def profile_url(self):
+        return self.profile_dir.as_uri()
+
+    def is_healthy(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.process = subprocess.Popen(
+            SOFFICE_CMD
+            + [
+                f"-env:UserInstallation={self.profile_url}",
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                f"--accept=pipe,name=peachjam-soffice-{os.getpid()}-{self.index};urp;",
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            # in its own process group, so that we can kill soffice and any children
+            start_new_session=True,
+        )
+        self.conversions = 0
+        log.info(f"Started soffice slot {self.index} (pid {self.process.pid})")
+
+    def stop(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            self.process.wait()
+            self.process = None
+
+    def recycle(self):
+        log.info(f"Recycling soffice slot {self.index}")
+        self.stop()
+        self.start()
+
+    def ensure_healthy(self):
+        if not self.is_healthy() or self.conversions >= self.max_conversions:
+            self.recycle()
+
+    def convert(self, infile, inext, outext):
+        """Convert infile, returning an open file handle to the converted file and the temporary directory that
+        contains it (and any other files, such as images), in the same way that docpipe's soffice_convert does.
+        """
+        self.ensure_healthy()
+
+        tmpdir = tempfile.TemporaryDirectory()
+        in_fname = os.path.join(tmpdir.name, f"input.{inext}")
+        with open(in_fname, "wb") as f:
+            shutil.copyfileobj(infile, f)
+
+        out_dir = os.path.join(tmpdir.name, "output")
+        cmd = SOFFICE_CMD + [
+            f"-env:UserInstallation={self.profile_url}",
+            "--headless",
+            "--convert-to",
+            outext,
+            "--outdir",
+            out_dir,
+            in_fname,
+        ]
+        self.conversions += 1
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=TIMEOUT)
+        except subprocess.TimeoutExpired as e:
+            self.recycle()
+            raise SOfficeError(f"soffice conversion timed out after {TIMEOUT}s") from e
+
+        out_fname = os.path.join(out_dir, f"input.{outext}")
+        if result.returncode != 0 or not os.path.exists(out_fname):
+            self.recycle()
+            raise SOfficeError(
+                f"soffice conversion failed with exit code {result.returncode}: "
+                f"{result.stderr.decode('utf-8', errors='replace')}"
+            )
+
+        return open(out_fname, "rb"), tmpdir
+
+
+class SOfficePool:
+    """A fixed-size pool of SOfficeSlots. Conversions queue for a free slot."""
+
+    def __init__(self, size):
+        self.root_dir = tempfile.mkdtemp(prefix="peachjam-soffice-")
+        self.slots = [SOfficeSlot(i, self.root_dir) for i in range(size)]
+        self.free = queue.Queue()
+        for slot in self.slots:
+            self.free.put(slot)
+
+    def convert(self, infile, inext, outext):
+        try:
+            slot = self.free.get(timeout=QUEUE_TIMEOUT)
+        except queue.Empty:
+            raise SOfficeError(
+                f"timed out waiting {QUEUE_TIMEOUT}s for a free soffice slot"
+            )
+
+        try:
+            return slot.convert(infile, inext, outext)
+        finally:
+            self.free.put(slot)
+
+    def shutdown(self):
+        for slot in self.slots:
+            slot.stop()
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_soffice_pool():
+    """The process-wide pool, or None if it is disabled."""
+    global _pool
+    size = settings.PEACHJAM["SOFFICE_POOL_SIZE"]
+    if size and _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SOfficePool(size)
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+def soffice_convert(infile, inext, outext):
+    """Convert infile from inext to outext using LibreOffice. Returns an open file handle to the converted file
+    and a temporary directory that contains it.
+
+    Uses the pool of warm soffice instances if it is enabled, and otherwise (or if the pooled conversion fails)
+    docpipe's cold-start conversion.
+    """
+    pool = get_soffice_pool()
+    if pool:
+        try:
+            return pool.convert(infile, inext, outext)
+        except SOfficeError as e:
+            log.warning(
+                "Pooled soffice conversion failed, falling back to a cold start",
+                exc_info=e,
+            )
+            infile.seek(0)
+
+    return docpipe_soffice.soffice_convert(infile, inext, outext)
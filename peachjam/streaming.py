@@ -0,0 +1,111 @@
+"""Streaming of stored files (such as source files) through Django, with support for HTTP range requests and
+conditional GETs."""
+
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags, quote_etag
+
+# how much of the file is read into memory at a time
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """Parse a Range header into an inclusive (start, end) byte range for a file of the given size.
+
+    Returns None if there is no range, or if it can't be parsed or asks for multiple ranges, in which case the full
+    file should be returned. Raises RangeNotSatisfiable if the range lies outside the file.
+    """
+    if not header:
+        return None
+
+    match = RANGE_RE.match(header)
+    if not match:
+        # malformed or multiple ranges, which we don't support
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # suffix range: the last N bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def iter_file(f, start, length, chunk_size=CHUNK_SIZE):
+    """Yield length bytes of the file, starting at start, chunk_size bytes at a time. The file is closed when
+    iteration finishes, or if the response is closed before then."""
+    try:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def streaming_file_response(
+    request, f, content_type, fname, disposition="attachment", etag=None
+):
+    """Build a response that streams the file f in chunks, rather than reading it all into memory.
+
+    Supports single-range requests (206 Partial Content), so that clients like pdf.js can fetch only the pages they
+    need, and conditional GETs (304 Not Modified) if an etag is given.
+    """
+    if etag:
+        etag = quote_etag(etag)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+    size = f.size
+    byte_range = None
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range or (etag and etag in parse_etags(if_range)):
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    f.open("rb")
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_file(f, start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        response = StreamingHttpResponse(
+            iter_file(f, 0, size), content_type=content_type
+        )
+        response["Content-Length"] = str(size)
+
+    response["Accept-Ranges"] = "bytes"
+    response["Content-Disposition"] = f"{disposition}; filename={fname}"
+    if etag:
+        response["ETag"] = etag
+    return response
@@ -130,6 +130,46 @@ def update_document(ingestor_id, document_id):
     log.info("Ingestor is disabled, ignoring.")
 
 
+@background(queue="peachjam", remove_existing_tasks=True)
+def update_documents(ingestor_id, document_ids):
+    """Update a batch of documents with an ingestor. Each document is updated in its own transaction."""
+    from peachjam.models import Ingestor
+
+    ingestor = Ingestor.objects.filter(pk=ingestor_id).first()
+    if not ingestor:
+        log.info(f"No ingestor with id {ingestor_id} exists, ignoring.")
+        return
+
+    if ingestor.enabled:
+        log.info(f"Updating {len(document_ids)} documents with ingestor {ingestor}")
+        ingestor.update_documents(document_ids)
+        log.info("Update documents done")
+        return
+
+    log.info("Ingestor is disabled, ignoring.")
+
+
+@background(queue="peachjam", schedule=(60 * 5), remove_existing_tasks=True)
+def delete_documents(ingestor_id, expression_frbr_uris):
+    """Delete a batch of documents with an ingestor. Each document is deleted in its own transaction."""
+    from peachjam.models import Ingestor
+
+    ingestor = Ingestor.objects.filter(pk=ingestor_id).first()
+    if not ingestor:
+        log.info(f"No ingestor with id {ingestor_id} exists, ignoring.")
+        return
+
+    if ingestor.enabled:
+        log.info(
+            f"Deleting {len(expression_frbr_uris)} documents with ingestor {ingestor}"
+        )
+        ingestor.delete_documents(expression_frbr_uris)
+        log.info("Delete documents done")
+        return
+
+    log.info("Ingestor is disabled, ignoring.")
+
+
 @background(queue="peachjam", schedule=(60 * 5), remove_existing_tasks=True)
 @transaction.atomic
 def delete_document(ingestor_id, expression_frbr_uri):
@@ -159,9 +199,8 @@ def delete_document(ingestor_id, expression_frbr_uri):
 
 
 @background(queue="peachjam", remove_existing_tasks=True)
-@transaction.atomic
 def run_ingestor(ingestor_id):
-    """Run an ingestor."""
+    """Run an ingestor. Changes are queued in a transaction per batch, so that an interrupted run can resume."""
     from peachjam.models import Ingestor
 
     log.info(f"Running ingestor {ingestor_id}...")
@@ -273,6 +312,38 @@ def create_anonymised_source_file_pdf(doc_id):
         logger.info("Done")
 
 
+@background(queue="peachjam", remove_existing_tasks=True)
+def render_document_content_pdf(document_id):
+    from peachjam.models import DocumentContentPDF
+
+    document = CoreDocument.objects.filter(pk=document_id).first()
+    if not document:
+        log.info(f"No document with id {document_id} exists, ignoring.")
+        return
+
+    with log_context(frbr_uri=document.expression_frbr_uri):
+        log.info(f"Rendering content PDF for document {document_id}")
+        DocumentContentPDF.get_or_create_for_document(document)
+        log.info("Done")
+
+
+@background(queue="peachjam", schedule=60, remove_existing_tasks=True)
+def render_social_image(document_id):
+    """Pre-render the social image for a newly published document, so that social media crawlers don't have to wait
+    for it to be rendered."""
+    from peachjam.models import DocumentSocialImage
+
+    document = CoreDocument.objects.filter(pk=document_id, published=True).first()
+    if not document:
+        log.info(f"No published document with id {document_id} exists, ignoring.")
+        return
+
+    with log_context(frbr_uri=document.expression_frbr_uri):
+        log.info(f"Rendering social image for document {document_id}")
+        DocumentSocialImage.render_for_document(document)
+        log.info("Done")
+
+
 @background(queue="peachjam", remove_existing_tasks=True)
 @transaction.atomic
 def rank_works():
@@ -301,12 +372,15 @@ def update_user_follows():
     log.info("Updating user follows")
     users = get_user_model().objects.filter(following__isnull=False).distinct()
     for user in users:
-        update_follows_for_user(user.pk)
+        update_follows_for_user(user.pk, saved_searches=False)
+
+    # saved searches are evaluated together, so that identical searches are only run once
+    update_saved_search_follows()
 
 
 @background(queue="peachjam", remove_existing_tasks=True)
 @transaction.atomic
-def update_follows_for_user(user_id):
+def update_follows_for_user(user_id, saved_searches=True):
     from django.contrib.auth import get_user_model
 
     from peachjam.models import UserFollowing
@@ -317,7 +391,16 @@ def update_follows_for_user(user_id):
         return
 
     log.info(f"Updating user follows for user {user_id}")
-    UserFollowing.update_follows_for_user(user)
+    UserFollowing.update_follows_for_user(user, saved_searches=saved_searches)
+
+
+@background(queue="peachjam", remove_existing_tasks=True)
+def update_saved_search_follows():
+    from peachjam.models import UserFollowing
+
+    log.info("Updating saved search follows")
+    UserFollowing.update_saved_search_follows()
+    log.info("Done")
 
 
 @background(queue="peachjam", remove_existing_tasks=True, schedule={"priority": -1})
@@ -471,6 +554,32 @@ def refresh_flynote_document_count(root_id):
     FlynoteDocumentCount.refresh_for_flynote(root)
 
 
+@background(queue="peachjam", remove_existing_tasks=True)
+def reconcile_taxonomy_document_counts():
+    """Taxonomy document counts are adjusted as documents are tagged, this rebuilds them in case they have drifted."""
+    from peachjam.models import TaxonomyDocumentCount
+
+    log.info("Reconciling taxonomy document counts")
+    TaxonomyDocumentCount.refresh_for_all_taxonomies()
+
+
+# an update that is already scheduled isn't postponed, so that a steady stream of changes doesn't delay it indefinitely
+@background(
+    queue="peachjam",
+    schedule={"run_at": 60, "action": TaskSchedule.CHECK_EXISTING},
+)
+def update_citation_graph(full=False):
+    """Apply citation changes to the citation graph snapshot, or rebuild it from scratch."""
+    from peachjam.citation_graph import citation_graph_store
+
+    if not citation_graph_store.enabled():
+        log.info("numpy is not installed, not updating the citation graph")
+        return
+
+    log.info("Updating citation graph")
+    citation_graph_store.update(full=full)
+
+
 @background(queue="peachjam", remove_existing_tasks=True)
 def update_users_new_relationship(relationship_id):
     # update users when a new relationship is created: amendment, repeal, commencement.
@@ -21,6 +21,8 @@ from peachjam.adapters import (
 from peachjam.models import (
     Court,
     GenericDocument,
+    Ingestor,
+    IngestorSetting,
     Judgment,
     Legislation,
     ProvisionTopicEnrichment,
@@ -586,6 +588,62 @@ class IndigoAdapterTest(TestCase):
         ):
             adapter.import_dataset()
 
+    def test_get_changes_finds_deleted_documents(self):
+        def doc(uri):
+            return {
+                "url": f"http://example.com{uri}",
+                "expression_frbr_uri": uri,
+                "updated_at": "2024-01-01T00:00:00Z",
+                "points_in_time": [],
+            }
+
+        pages = {
+            "http://example.com/akn/za/.json": {
+                "results": [doc("/akn/za/act/2009/1/eng@2009-01-01")],
+                "next": None,
+            },
+            "http://example.com/akn/za-cpt/.json": {
+                "results": [doc("/akn/za-cpt/act/2009/1/eng@2009-01-01")],
+                "next": None,
+            },
+        }
+        self.adapter.client_get = lambda url: SimpleNamespace(json=lambda: pages[url])
+        self.adapter.place_codes = ["za", "za-cpt"]
+
+        with patch.object(self.adapter, "find_deleted", return_value=["gone"]):
+            changes = list(self.adapter.get_changes(None))
+
+            self.assertEqual(3, len(changes))
+            self.assertEqual(
+                (
+                    {"http://example.com/akn/za/act/2009/1/eng@2009-01-01"},
+                    [],
+                    {"name": "za", "url": None},
+                ),
+                changes[0],
+            )
+            self.assertEqual(([], ["gone"]), changes[2][:2])
+            self.adapter.find_deleted.assert_called_once_with(
+                {
+                    "/akn/za/act/2009/1/eng@2009-01-01",
+                    "/akn/za-cpt/act/2009/1/eng@2009-01-01",
+                }
+            )
+
+            # when resuming, only the remaining lists are fetched, and deletions aren't checked
+            changes = list(self.adapter.get_changes(None, {"name": "za", "url": None}))
+            self.assertEqual(
+                [
+                    (
+                        {"http://example.com/akn/za-cpt/act/2009/1/eng@2009-01-01"},
+                        [],
+                        {"name": "za-cpt", "url": None},
+                    )
+                ],
+                changes,
+            )
+            self.adapter.find_deleted.assert_called_once()
+
     @patch("peachjam.adapters.indigo.SourceFile.track_changes", autospec=True)
     def test_download_source_file_creates_tracked_source_file(self, track_changes):
         document = GenericDocument.objects.create(
@@ -722,6 +780,37 @@ class JudgmentAdapterTest(TestCase):
             },
         )
 
+    def test_get_changes_is_paged_and_resumable(self):
+        pages = {
+            "http://example.com/judgments": {
+                "results": [{"expression_frbr_uri": "/akn/one"}],
+                "next": "http://example.com/judgments?page=2",
+            },
+            "http://example.com/judgments?page=2": {
+                "results": [{"expression_frbr_uri": "/akn/two"}],
+                "next": None,
+            },
+        }
+        self.adapter.client_get = lambda url, params=None: SimpleNamespace(
+            json=lambda: pages[url]
+        )
+
+        changes = self.adapter.get_changes(None)
+        self.assertEqual(
+            (
+                ["http://example.com/judgments/akn/one"],
+                [],
+                "http://example.com/judgments?page=2",
+            ),
+            next(changes),
+        )
+
+        # resume from the second page
+        self.assertEqual(
+            [(["http://example.com/judgments/akn/two"], [], None)],
+            list(self.adapter.get_changes(None, "http://example.com/judgments?page=2")),
+        )
+
     def remote_judgment_doc(self, **overrides):
         doc = {
             "title": "Remote judgment",
@@ -864,6 +953,54 @@ class JudgmentAdapterTest(TestCase):
             any(call.args == (judgment.pk,) for call in generate_summary.call_args_list)
         )
 
+    def test_update_documents_in_batch_looks_up_shared_objects_once(self):
+        docs = {}
+        for n in [1, 2]:
+            doc = self.remote_judgment_doc(
+                work_frbr_uri=f"/akn/za/judgment/eacj/2024/{n}",
+                expression_frbr_uri=f"/akn/za/judgment/eacj/2024/{n}/eng@2024-01-01",
+                serial_number=n,
+                mnc=f"[2024] EACJ {n}",
+                judges=["Judge A"],
+            )
+            docs[f"http://example.com/judgments{doc['expression_frbr_uri']}"] = doc
+
+        self.adapter.client_get = lambda url: SimpleNamespace(
+            json=lambda: docs[url]
+        )  # noqa: E731
+        self.adapter.get_content_html = (
+            lambda doc: "<p>Remote content</p>"
+        )  # noqa: E731
+        self.adapter.attach_source_file = lambda doc, created_doc: None  # noqa: E731
+
+        with patch.object(
+            Country.objects, "get", wraps=Country.objects.get
+        ) as get_country, patch.object(
+            Language.objects, "get", wraps=Language.objects.get
+        ) as get_language, patch.object(
+            Court.objects, "get_or_create", wraps=Court.objects.get_or_create
+        ) as get_court:
+            with self.adapter.batch():
+                for url in docs:
+                    self.adapter.update_document(url)
+
+        self.assertEqual(2, Judgment.objects.filter(court__code="EACJ").count())
+        self.assertEqual(
+            1,
+            len([c for c in get_country.call_args_list if "iso__iexact" in c.kwargs]),
+        )
+        self.assertEqual(
+            1,
+            len(
+                [
+                    c
+                    for c in get_language.call_args_list
+                    if "iso_639_1__iexact" in c.kwargs
+                ]
+            ),
+        )
+        get_court.assert_called_once()
+
 
 class HtmlServer:
     """Tiny HTTP server that serves UTF-8 HTML, optionally declaring a charset."""
@@ -915,3 +1052,174 @@ class RequestsAdapterEncodingTest(TestCase):
             r = adapter.client_get(server.url + "/foo")
 
         self.assertEqual(HtmlServer.BODY, r.text)
+
+
+class RequestsAdapterPrefetchTest(TestCase):
+    def test_prefetched_responses_are_used_once(self):
+        with HtmlServer("text/html") as server:
+            adapter = RequestsAdapter(None, {"api_url": server.url})
+            adapter.prefetch([server.url + "/foo", server.url + "/missing"])
+
+            with patch.object(
+                adapter, "client_request", side_effect=AssertionError
+            ) as client_request:
+                self.assertEqual(
+                    HtmlServer.BODY, adapter.client_get(server.url + "/foo").text
+                )
+                client_request.assert_not_called()
+
+                # the prefetched response is only used once
+                with self.assertRaises(AssertionError):
+                    adapter.client_get(server.url + "/foo")
+
+            adapter.clear_prefetched()
+            self.assertEqual({}, adapter.prefetched)
+
+    def test_indigo_prefetch_urls(self):
+        adapter = IndigoAdapter(
+            None, {"token": "XXX", "api_url": "http://example.com", "places": "za"}
+        )
+        url = "http://example.com/akn/za/act/2020/1/eng@2020-01-01"
+        document = {
+            "url": url,
+            "stub": False,
+            "publication_document": {
+                "url": "http://example.com/gazette.pdf",
+                "has_trusted_url": False,
+            },
+            "links": [{"href": f"{url}/media.json"}],
+        }
+
+        self.assertEqual(
+            [
+                f"{url}/toc.json",
+                f"{url}.html?resolver=none",
+                f"{url}.pdf",
+                "http://example.com/gazette.pdf",
+                f"{url}/timeline.json",
+                f"{url}/commencements.json",
+                f"{url}/provision-enrichments.json",
+                f"{url}/media.json",
+            ],
+            adapter.get_prefetch_urls(url, document, Legislation),
+        )
+
+        # trusted publication documents aren't downloaded, unless their size is needed
+        document["publication_document"]["has_trusted_url"] = True
+        self.assertIn(
+            "http://example.com/gazette.pdf",
+            adapter.get_prefetch_urls(url, document, GenericDocument),
+        )
+        document["publication_document"]["size"] = 1024
+        self.assertEqual(
+            [
+                f"{url}/toc.json",
+                f"{url}.html?resolver=none",
+                f"{url}.pdf",
+                f"{url}/media.json",
+            ],
+            adapter.get_prefetch_urls(url, document, GenericDocument),
+        )
+
+        # stubs only need their publication document
+        document["stub"] = True
+        self.assertEqual(
+            [f"{url}/toc.json", "http://example.com/gazette.pdf", f"{url}/media.json"],
+            adapter.get_prefetch_urls(url, document, GenericDocument),
+        )
+
+        # the taxonomy tree is only fetched if topics are imported
+        adapter = IndigoAdapter(
+            None,
+            {
+                "token": "XXX",
+                "api_url": "http://example.com",
+                "places": "za",
+                "taxonomy_topic_root": "subjects:topics",
+            },
+        )
+        self.assertIn(
+            "http://example.com/taxonomy-topics.json",
+            adapter.get_prefetch_urls(url, document, GenericDocument),
+        )
+
+
+class IngestorTest(TestCase):
+    fixtures = ["tests/countries"]
+
+    def test_cached_adapter_is_reused(self):
+        ingestor = Ingestor.objects.create(adapter="IndigoAdapter", name="Indigo")
+        for name, value in [("token", "XXX"), ("api_url", "http://example.com")]:
+            IngestorSetting.objects.create(ingestor=ingestor, name=name, value=value)
+
+        adapter = ingestor.get_adapter()
+        with self.assertNumQueries(0):
+            self.assertIs(adapter, ingestor.get_adapter(cached=True))
+
+        # a fresh adapter replaces the cached one
+        fresh = ingestor.get_adapter()
+        self.assertIsNot(adapter, fresh)
+        self.assertIs(fresh, ingestor.get_adapter(cached=True))
+
+    @patch("peachjam.models.ingestors.update_document")
+    def test_update_documents_in_batch(self, update_document):
+        ingestor = Ingestor.objects.create(adapter="IndigoAdapter", name="Indigo")
+        for name, value in [("token", "XXX"), ("api_url", "http://example.com")]:
+            IngestorSetting.objects.create(ingestor=ingestor, name=name, value=value)
+        adapter = ingestor.get_adapter()
+        looked_up = []
+
+        def lookup_country():
+            looked_up.append("ZA")
+            return Country.objects.get(pk="ZA")
+
+        def update(document_id):
+            adapter.lookup(Country, "za", lookup_country)
+            if document_id == "bad":
+                raise ValueError()
+
+        with patch.object(adapter, "update_document", side_effect=update):
+            ingestor.update_documents(["one", "two", "bad", "three"])
+
+        # looked up once, and again after the failure
+        self.assertEqual(["ZA", "ZA"], looked_up)
+        self.assertIsNone(adapter.lookups)
+        # the failed document is retried on its own
+        update_document.assert_called_once_with(ingestor.id, "bad", creator=ingestor)
+
+    @patch("peachjam.models.ingestors.update_document")
+    @patch("peachjam.models.ingestors.update_documents")
+    def test_check_for_updates_resumes(self, update_documents, update_document):
+        ingestor = Ingestor.objects.create(adapter="IndigoAdapter", name="Indigo")
+        for name, value in [("token", "XXX"), ("api_url", "http://example.com")]:
+            IngestorSetting.objects.create(ingestor=ingestor, name=name, value=value)
+        adapter = ingestor.get_adapter()
+        positions = []
+
+        def get_changes(last_refreshed, position=None):
+            positions.append(position)
+            if position is None:
+                yield ["one"], [], "page-2"
+                raise requests.ConnectionError()
+            yield ["two"], [], None
+
+        with patch.object(adapter, "get_changes", side_effect=get_changes):
+            with patch.object(ingestor, "get_adapter", return_value=adapter):
+                with self.assertRaises(requests.ConnectionError):
+                    ingestor.check_for_updates()
+
+                ingestor.refresh_from_db()
+                self.assertEqual("page-2", ingestor.cursor["position"])
+                self.assertIsNone(ingestor.last_refreshed_at)
+                started_at = ingestor.cursor["started_at"]
+
+                ingestor.check_for_updates()
+
+        self.assertEqual([None, "page-2"], positions)
+        ingestor.refresh_from_db()
+        self.assertIsNone(ingestor.cursor)
+        self.assertEqual(started_at, ingestor.last_refreshed_at.isoformat())
+        self.assertEqual(
+            [["one"], ["two"]],
+            [c.args[1] for c in update_documents.call_args_list],
+        )
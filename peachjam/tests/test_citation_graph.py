@@ -0,0 +1,120 @@
+import shutil
+import tempfile
+
+from background_task.models import Task
+from django.test import TestCase
+
+from peachjam.citation_graph import (
+    CitationGraphSnapshot,
+    CitationGraphStore,
+    DatabaseCitationGraph,
+    PendingCitationGraph,
+)
+from peachjam.models import CitationGraphChange, ExtractedCitation, Work
+from peachjam.tasks import update_citation_graph
+
+
+class CitationGraphTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = CitationGraphStore(self.root)
+        self.a, self.b, self.c, self.d, self.target = [
+            Work.objects.create(title=f"Work {i}", frbr_uri=f"/akn/za/act/2020/{i}")
+            for i in range(1, 6)
+        ]
+        self.cite(self.a, self.target)
+        self.cite(self.b, self.target)
+        self.cite(self.a, self.b)
+        self.cite(self.b, self.c)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def cite(self, citing, target):
+        with self.captureOnCommitCallbacks(execute=True):
+            ExtractedCitation.objects.create(citing_work=citing, target_work=target)
+
+    def assertSameAnswers(self, graph):
+        db = DatabaseCitationGraph()
+        for work in [self.a, self.b, self.c, self.d, self.target]:
+            self.assertEqual(db.cites(work.pk), graph.cites(work.pk))
+            self.assertEqual(db.cited_by(work.pk), graph.cited_by(work.pk))
+            self.assertEqual(db.in_degree(work.pk), graph.in_degree(work.pk))
+            self.assertEqual(
+                db.two_hop_neighbours(work.pk), graph.two_hop_neighbours(work.pk)
+            )
+            self.assertEqual(
+                db.two_hop_neighbours(work.pk, incoming=True),
+                graph.two_hop_neighbours(work.pk, incoming=True),
+            )
+            self.assertEqual(db.co_cited(work.pk), graph.co_cited(work.pk))
+        works = [self.b.pk, self.target.pk]
+        self.assertEqual(db.cited_by_many(works), graph.cited_by_many(works))
+
+    def test_queries(self):
+        snapshot = self.store.update()
+        self.assertIsInstance(snapshot, CitationGraphSnapshot)
+        self.assertSameAnswers(snapshot)
+
+        self.assertEqual([self.b.pk, self.target.pk], snapshot.cites(self.a.pk))
+        self.assertEqual([self.a.pk, self.b.pk], snapshot.cited_by(self.target.pk))
+        self.assertEqual([self.c.pk], snapshot.two_hop_neighbours(self.a.pk))
+        self.assertEqual([(self.b.pk, 1)], snapshot.co_cited(self.target.pk))
+        self.assertEqual([], snapshot.cites(self.d.pk))
+
+    def test_stale_snapshot_uses_database(self):
+        self.assertIsInstance(self.store.get_graph(), DatabaseCitationGraph)
+
+        self.store.update()
+        self.assertFalse(CitationGraphChange.objects.exists())
+        self.assertIsInstance(self.store.get_graph(), CitationGraphSnapshot)
+
+        self.cite(self.d, self.target)
+        self.cite(self.b, self.a)
+        graph = self.store.get_graph()
+        self.assertIsInstance(graph, PendingCitationGraph)
+        self.assertEqual({self.b.pk, self.d.pk}, graph.changed)
+        self.assertEqual(
+            [self.a.pk, self.b.pk, self.d.pk], graph.cited_by(self.target.pk)
+        )
+        self.assertSameAnswers(graph)
+
+    def test_incremental_update(self):
+        self.store.update()
+
+        self.cite(self.d, self.target)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExtractedCitation.objects.filter(citing_work=self.a).delete()
+        snapshot = self.store.update()
+
+        self.assertIsInstance(self.store.get_graph(), CitationGraphSnapshot)
+        self.assertEqual([self.b.pk, self.d.pk], snapshot.cited_by(self.target.pk))
+        self.assertEqual([], snapshot.cites(self.a.pk))
+        self.assertSameAnswers(snapshot)
+
+        # a full rebuild gives the same graph
+        self.assertEqual(
+            snapshot.edges()[1].tolist(),
+            self.store.update(full=True).edges()[1].tolist(),
+        )
+
+    def test_changes_recorded_once_per_work(self):
+        self.store.update()
+        Task.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for target in [self.b, self.c, self.target]:
+                ExtractedCitation.objects.create(citing_work=self.d, target_work=target)
+            ExtractedCitation.objects.filter(citing_work=self.a).first().delete()
+        self.assertEqual(
+            [self.a.pk, self.d.pk],
+            sorted(CitationGraphChange.objects.values_list("work_id", flat=True)),
+        )
+
+        # further changes don't reschedule the update
+        task = Task.objects.get_task(update_citation_graph.name).get()
+        self.cite(self.c, self.target)
+        self.assertEqual(
+            [task.run_at],
+            [t.run_at for t in Task.objects.get_task(update_citation_graph.name)],
+        )
@@ -1,22 +1,38 @@
+import json
 import os
+import re
+import threading
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from types import SimpleNamespace
 from unittest.mock import patch
 
+import lxml.html
+from cobalt import FrbrUri
 from countries_plus.models import Country
+from django.contrib.contenttypes.models import ContentType
 from django.core.files.base import File
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.text import slugify
 from docpipe.citations import ActNoOfYearMatcher
 from languages_plus.models import Language
 
 from peachjam.admin import DocumentAdmin
-from peachjam.analysis.citations import citation_analyser
+from peachjam.analysis.citations import CitatorMatcher, citation_analyser
 from peachjam.models import (
+    AlternativeName,
     CitationLink,
+    CitationProcessing,
+    CitationSummary,
     CoreDocument,
+    DocumentContent,
     DocumentNature,
+    ExtractedCitation,
     ProvisionCitation,
     ProvisionCitationCount,
+    ProvisionEnrichment,
     SourceFile,
     Work,
 )
@@ -357,3 +373,464 @@ class ProvisionCitationCountTests(TestCase):
             work=other_work, provision_eid="p-2"
         )
         self.assertEqual(5, other_count.count)
+
+
+class ProvisionCitationExtractionTestCase(TestCase):
+    fixtures = ["tests/countries", "tests/languages"]
+
+    def setUp(self):
+        # warm the content type cache, so that it doesn't count towards the queries
+        ContentType.objects.get_for_model(ProvisionCitation, for_concrete_model=False)
+        self.works = [
+            Work.objects.create(title=f"Work {i}", frbr_uri=f"/akn/za/act/2020/{i}")
+            for i in range(1, 7)
+        ]
+
+    def create_document(self, title, links):
+        doc = CoreDocument.objects.create(
+            jurisdiction=Country.objects.get(pk="ZA"),
+            date=datetime(2023, 1, 1),
+            language=Language.objects.get(pk="en"),
+            frbr_uri_doctype="doc",
+            frbr_uri_number=slugify(title),
+            title=title,
+        )
+        doc_content = doc.get_or_create_document_content()
+        doc_content.content_html_is_akn = True
+        doc_content.content_html = (
+            '<div class="akn-akomaNtoso">'
+            + "".join(
+                f'<p>before {i} <a data-href="{href}">link {i}</a> after {i}</p>'
+                for i, href in enumerate(links)
+            )
+            + "</div>"
+        )
+        doc_content.save()
+        return doc
+
+    def extract(self, doc):
+        with CaptureQueriesContext(connection) as ctx:
+            citation_analyser.create_from_html(doc)
+        return len(ctx)
+
+    def test_create_from_html_queries_do_not_grow_with_links(self):
+        few = self.create_document("few", ["/akn/za/act/2020/1"])
+        many = self.create_document(
+            "many",
+            [f"{w.frbr_uri}~sec_{i}" for i, w in enumerate(self.works)]
+            + ["/akn/za/act/2020/999", "/akn/invalid"],
+        )
+        self.assertEqual(self.extract(few), self.extract(many))
+
+        citations = ProvisionCitation.objects.filter(citing_document=many).order_by(
+            "pk"
+        )
+        self.assertEqual(
+            [
+                (w.pk, f"sec_{i}", f"before {i} ", f"link {i}", f" after {i}")
+                for i, w in enumerate(self.works)
+            ],
+            [
+                (c.work_id, c.provision_eid, c.prefix, c.exact, c.suffix)
+                for c in citations
+            ],
+        )
+
+        citation = ProvisionCitation.objects.get(citing_document=few)
+        self.assertTrue(citation.whole_work)
+        self.assertIsNone(citation.provision_eid)
+        self.assertEqual("provision_citation", citation.enrichment_type)
+        self.assertIsInstance(
+            ProvisionEnrichment.objects.get(pk=citation.pk), ProvisionCitation
+        )
+
+    def test_create_from_citation_links(self):
+        doc = self.create_document("links", [])
+        for i, work in enumerate(self.works[:3]):
+            CitationLink.objects.create(
+                document=doc,
+                text=f"link {i}",
+                url=f"{work.frbr_uri}~sec_{i}",
+                target_id="p-1",
+                target_selectors=[
+                    {
+                        "type": "TextQuoteSelector",
+                        "exact": f"link {i}",
+                        "prefix": "before ",
+                        "suffix": " after",
+                    }
+                ],
+            )
+
+        citation_analyser.create_from_citation_links(doc)
+        self.assertEqual(
+            [(w.pk, f"sec_{i}", f"link {i}") for i, w in enumerate(self.works[:3])],
+            list(
+                ProvisionCitation.objects.filter(citing_document=doc)
+                .order_by("pk")
+                .values_list("work_id", "provision_eid", "exact")
+            ),
+        )
+
+
+class CitationProcessingTestCase(TestCase):
+    fixtures = ["tests/countries", "tests/languages"]
+
+    def create_document(self, title, date, content_text):
+        doc = CoreDocument.objects.create(
+            jurisdiction=Country.objects.get(pk="ZA"),
+            date=date,
+            language=Language.objects.get(pk="en"),
+            frbr_uri_doctype="doc",
+            frbr_uri_number=slugify(title),
+            title=title,
+        )
+        if content_text is not None:
+            doc_content = doc.get_or_create_document_content(True)
+            DocumentContent.objects.filter(pk=doc_content.pk).update(
+                content_text=content_text
+            )
+        return doc
+
+    @patch("peachjam.tasks.extract_citations")
+    def test_re_extract_only_documents_mentioning_new_works(self, extract_citations):
+        old = self.create_document("Fixture Companies Act", datetime(2000, 1, 1), "")
+        AlternativeName.objects.create(document=old, title="The Old Companies Act")
+        citing = self.create_document(
+            "Citing",
+            datetime(2010, 1, 1),
+            "As set out in the fixture\ncompanies  act, the directors ...",
+        )
+        citing_alt = self.create_document(
+            "Citing alternative name",
+            datetime(2011, 1, 1),
+            "See THE OLD COMPANIES ACT.",
+        )
+        self.create_document("Unrelated", datetime(2012, 1, 1), "Nothing to see")
+        no_text = self.create_document("No text", datetime(2013, 1, 1), None)
+        self.create_document(
+            "Too old", datetime(1999, 1, 1), "The Fixture Companies Act"
+        )
+
+        cp = CitationProcessing.load()
+        cp.processing_date = old.date
+        cp.save()
+        cp.works.add(old.work)
+
+        cp.re_extract_citations()
+
+        self.assertEqual(
+            [citing.pk, citing_alt.pk, no_text.pk],
+            [c.args[0] for c in extract_citations.call_args_list],
+        )
+        cp.refresh_from_db()
+        self.assertIsNone(cp.processing_date)
+        self.assertFalse(cp.works.exists())
+
+    @patch("peachjam.tasks.extract_citations")
+    def test_re_extract_documents_citing_act_variants(self, extract_citations):
+        act = self.create_document("Companies Act, 2008", datetime(2008, 4, 9), "")
+        CoreDocument.objects.filter(pk=act.pk).update(
+            frbr_uri_doctype="act",
+            frbr_uri_number="71",
+            frbr_uri_date="2008",
+            citation="Act 71 of 2008",
+        )
+        numbered = self.create_document(
+            "Numbered", datetime(2010, 1, 1), "In terms of Act No. 71 of 2008, ..."
+        )
+        titled = self.create_document(
+            "Titled", datetime(2011, 1, 1), "The Companies Act 71 of 2008 provides"
+        )
+        punctuated = self.create_document(
+            "Punctuated", datetime(2012, 1, 1), "See the Companies Act 2008."
+        )
+        self.create_document("Unrelated", datetime(2013, 1, 1), "Act 17 of 2008")
+
+        cp = CitationProcessing.load()
+        cp.processing_date = act.date
+        cp.save()
+        cp.works.add(act.work)
+
+        cp.re_extract_citations()
+
+        self.assertEqual(
+            [numbered.pk, titled.pk, punctuated.pk],
+            [c.args[0] for c in extract_citations.call_args_list],
+        )
+
+    @patch("peachjam.tasks.extract_citations")
+    def test_re_extract_all_documents_without_works(self, extract_citations):
+        old = self.create_document("Fixture Companies Act", datetime(2000, 1, 1), "")
+        unrelated = self.create_document(
+            "Unrelated", datetime(2012, 1, 1), "Nothing to see"
+        )
+
+        cp = CitationProcessing.load()
+        cp.processing_date = old.date
+        cp.save()
+        cp.re_extract_citations()
+
+        self.assertEqual(
+            [old.pk, unrelated.pk],
+            [c.args[0] for c in extract_citations.call_args_list],
+        )
+
+    def test_documents_without_text_are_always_mentioning(self):
+        no_text = self.create_document("No text", datetime(2013, 1, 1), None)
+        self.create_document("Unrelated", datetime(2012, 1, 1), "Nothing to see")
+
+        cp = CitationProcessing.load()
+        # too short to search for
+        self.assertEqual(
+            [no_text.pk],
+            cp.get_documents_mentioning(CoreDocument.objects.all(), ["Act"]),
+        )
+
+    @patch.object(CitationProcessing, "MAX_CANDIDATES", 1)
+    @patch("peachjam.tasks.extract_citations")
+    def test_re_extract_all_documents_with_too_many_candidates(self, extract_citations):
+        old = self.create_document("Fixture Companies Act", datetime(2000, 1, 1), "")
+        AlternativeName.objects.create(document=old, title="The Old Companies Act")
+        unrelated = self.create_document(
+            "Unrelated", datetime(2012, 1, 1), "Nothing to see"
+        )
+
+        cp = CitationProcessing.load()
+        cp.processing_date = old.date
+        cp.save()
+        cp.works.add(old.work)
+        cp.re_extract_citations()
+
+        self.assertEqual(
+            [old.pk, unrelated.pk],
+            [c.args[0] for c in extract_citations.call_args_list],
+        )
+
+
+class CitationSummaryTestCase(TestCase):
+    fixtures = ["tests/countries", "tests/languages"]
+
+    def setUp(self):
+        self.act = DocumentNature.objects.get_or_create(
+            code="act", defaults={"name": "Act"}
+        )[0]
+        self.judgment = DocumentNature.objects.get_or_create(
+            code="judgment", defaults={"name": "Judgment"}
+        )[0]
+        self.target = self.create_document("Target", self.act)
+        self.low = self.create_document("Low", self.judgment, authority_score=0.5)
+        self.high = self.create_document("High", self.judgment, authority_score=0.9)
+        self.other = self.create_document("Other", self.act)
+        for doc in [self.low, self.high, self.other]:
+            ExtractedCitation.objects.create(
+                citing_work=doc.work, target_work=self.target.work
+            )
+
+    def create_document(self, title, nature, authority_score=0.0):
+        doc = CoreDocument.objects.create(
+            jurisdiction=Country.objects.get(pk="ZA"),
+            date=datetime(2020, 1, 1),
+            language=Language.objects.get(pk="en"),
+            nature=nature,
+            frbr_uri_doctype="doc",
+            frbr_uri_number=slugify(title),
+            title=title,
+        )
+        Work.objects.filter(pk=doc.work_id).update(authority_score=authority_score)
+        return doc
+
+    def summaries(self, work, direction):
+        return set(
+            CitationSummary.objects.filter(work=work, direction=direction).values_list(
+                "other_work_id", flat=True
+            )
+        )
+
+    def test_summaries_follow_citations(self):
+        self.assertEqual(
+            {self.low.work_id, self.high.work_id, self.other.work_id},
+            self.summaries(self.target.work, CitationSummary.Direction.INCOMING),
+        )
+        self.assertEqual(
+            {self.target.work_id},
+            self.summaries(self.low.work, CitationSummary.Direction.OUTGOING),
+        )
+        self.target.work.refresh_from_db()
+        self.assertEqual(3, self.target.work.n_citing_works)
+
+        ExtractedCitation.objects.filter(citing_work=self.low.work).delete()
+        self.assertEqual(
+            {self.high.work_id, self.other.work_id},
+            self.summaries(self.target.work, CitationSummary.Direction.INCOMING),
+        )
+        self.assertEqual(
+            set(), self.summaries(self.low.work, CitationSummary.Direction.OUTGOING)
+        )
+        self.target.work.refresh_from_db()
+        self.assertEqual(2, self.target.work.n_citing_works)
+
+    def test_summaries_follow_documents(self):
+        self.other.title = "Renamed"
+        self.other.save()
+        summary = CitationSummary.objects.get(
+            work=self.target.work, other_work=self.other.work
+        )
+        self.assertEqual("Renamed", summary.sort_title)
+
+        self.other.delete()
+        self.assertEqual(
+            {self.low.work_id, self.high.work_id},
+            self.summaries(self.target.work, CitationSummary.Direction.INCOMING),
+        )
+
+    def test_grouped_and_paged(self):
+        CitationSummary.refresh_authority_scores()
+
+        groups = CitationSummary.fetch_grouped_citation_docs(
+            self.target.work, CitationSummary.Direction.INCOMING, "en", n_per_group=1
+        )
+        self.assertEqual(
+            [
+                (self.act.pk, 1, [self.other.pk]),
+                (self.judgment.pk, 2, [self.high.pk]),
+            ],
+            sorted((n, count, [d.pk for d in docs]) for n, count, docs in groups),
+        )
+
+        docs, truncated = CitationSummary.fetch_citation_docs_page(
+            self.target.work,
+            CitationSummary.Direction.INCOMING,
+            self.judgment,
+            "en",
+            n=1,
+        )
+        self.assertEqual([self.high.pk], [d.pk for d in docs])
+        self.assertTrue(truncated)
+
+        docs, truncated = CitationSummary.fetch_citation_docs_page(
+            self.target.work,
+            CitationSummary.Direction.INCOMING,
+            self.judgment,
+            "en",
+            after=self.high.work_id,
+            n=1,
+        )
+        self.assertEqual([self.low.pk], [d.pk for d in docs])
+        self.assertFalse(truncated)
+
+
+class StubCitator:
+    """Local HTTP server that behaves like Citator, marking up "Act N of YYYY" citations."""
+
+    pattern = re.compile(r"Act (\d+) of (\d{4})")
+
+    def __init__(self):
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests.append(body)
+                resp = json.dumps(server.respond(body)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(resp)))
+                self.end_headers()
+                self.wfile.write(resp)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    def respond(self, body):
+        if body["format"] == "html":
+            return {
+                "body": self.pattern.sub(
+                    r'<a href="/akn/za/act/\2/\1">\g<0></a>', body["body"]
+                )
+            }
+
+        citations = []
+        for i, page in enumerate(body["body"].split("\x0c")):
+            for match in self.pattern.finditer(page):
+                citations.append(
+                    {
+                        "text": match.group(),
+                        "start": match.start(),
+                        "end": match.end(),
+                        "href": f"/akn/za/act/{match.group(2)}/{match.group(1)}",
+                        "target_id": i,
+                        "prefix": "",
+                        "suffix": "",
+                    }
+                )
+        return {"citations": citations}
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+class CitatorMatcherTestCase(TestCase):
+    frbr_uri = FrbrUri.parse("/akn/za/judgment/zasca/2020/1/eng@2020-01-01")
+
+    def setUp(self):
+        self.citator = StubCitator().__enter__()
+        self.addCleanup(self.citator.__exit__)
+        for name, value in [
+            ("citator_url", self.citator.url),
+            ("chunk_size", 200),
+            ("overlap", 50),
+            ("_session", None),
+        ]:
+            patcher = patch.object(CitatorMatcher, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_text_is_chunked(self):
+        pages = [
+            "Short page citing Act 1 of 2000.",
+            " ".join(["Filler text, then Act 2 of 2001."] * 40),
+            "Another page citing Act 3 of 2002.",
+        ]
+        matcher = CitatorMatcher()
+        matcher.extract_text_matches(self.frbr_uri, "\x0c".join(pages))
+
+        self.assertGreater(len(self.citator.requests), 3)
+        expected = [
+            (page_num, match.start(), match.end())
+            for page_num, page in enumerate(pages)
+            for match in StubCitator.pattern.finditer(page)
+        ]
+        self.assertEqual(
+            expected, [(c.target_id, c.start, c.end) for c in matcher.citations]
+        )
+
+    def test_html_is_chunked(self):
+        sections = "".join(
+            f"<section><p>Section {i} cites Act {i} of 2000.</p></section>"
+            for i in range(1, 21)
+        )
+        html = lxml.html.fromstring(f"<div><div>{sections}</div></div>")
+
+        html = CitatorMatcher().markup_html_matches(self.frbr_uri, html)
+
+        self.assertGreater(len(self.citator.requests), 1)
+        self.assertTrue(
+            all(len(r["body"]) <= 300 for r in self.citator.requests),
+        )
+        self.assertEqual(
+            [f"/akn/za/act/2000/{i}" for i in range(1, 21)],
+            html.xpath("//a/@href"),
+        )
+        self.assertEqual(20, len(html.xpath("//section")))
@@ -1,4 +1,5 @@
 from datetime import date
+from unittest.mock import patch
 
 from cobalt.uri import FrbrUri
 from django.test import TestCase
@@ -7,12 +8,14 @@ from peachjam.models import (
     Book,
     CoreDocument,
     Country,
+    DocumentSocialImage,
     Gazette,
     GenericDocument,
     JournalArticle,
     Language,
     get_country_and_locality,
 )
+from peachjam.tasks import render_social_image
 
 
 class CoreDocumentTestCase(TestCase):
@@ -187,3 +190,49 @@ ZAGPPHC 1063</a>.</p>
         doc.save()
         result = doc.get_cited_work_frbr_uris()
         self.assertEqual({}, result)
+
+    @patch("peachjam.tasks.render_social_image")
+    def test_publishing_renders_social_image(self, render):
+        doc = CoreDocument.objects.get(
+            expression_frbr_uri="/akn/aa-au/doc/activity-report/2017/nn/eng@2017-07-03"
+        )
+        doc.track_changes()
+        doc.published = False
+        doc.save()
+        render.assert_not_called()
+
+        doc.published = True
+        doc.save()
+        render.assert_called_once_with(doc.pk)
+
+        # other changes don't render it again
+        doc.title = "New title"
+        doc.save()
+        render.assert_called_once()
+
+    @patch.object(DocumentSocialImage, "make_image", return_value=b"png")
+    def test_render_social_image(self, make_image):
+        doc = CoreDocument.objects.get(
+            expression_frbr_uri="/akn/aa-au/doc/activity-report/2017/nn/eng@2017-07-03"
+        )
+        render_social_image.now(doc.pk)
+        self.assertEqual(
+            [doc.pk],
+            list(DocumentSocialImage.objects.values_list("document_id", flat=True)),
+        )
+
+        # unpublished documents are skipped
+        DocumentSocialImage.objects.all().delete()
+        CoreDocument.objects.filter(pk=doc.pk).update(published=False)
+        render_social_image.now(doc.pk)
+        self.assertFalse(DocumentSocialImage.objects.exists())
+
+    def test_social_image_logo_is_cached(self):
+        DocumentSocialImage.logo_b64.cache_clear()
+        with patch("peachjam.models.attachments.find_static") as find_static:
+            find_static.return_value = None
+            DocumentSocialImage.logo_b64()
+            calls = find_static.call_count
+            DocumentSocialImage.logo_b64()
+            self.assertEqual(calls, find_static.call_count)
+        DocumentSocialImage.logo_b64.cache_clear()
@@ -2,7 +2,8 @@ import os.path
 
 from django.test import TestCase
 
-from peachjam.helpers import chunks, pdfjs_to_text
+from peachjam.helpers import chunks, pdfjs_to_text, pdfjs_to_text_subprocess
+from peachjam.pdfjs import PdfjsError, PdfjsPool
 
 
 class HelpersTestCase(TestCase):
@@ -38,3 +39,31 @@ Detention in Africa to include issues relating to policing and human rights;""",
         self.assertEqual(chunks([1, 2], 5), [[1], [2]])
         self.assertEqual(chunks([1, 2], 2), [[1], [2]])
         self.assertEqual(chunks([], 3), [])
+
+    def test_pdfjs_pool(self):
+        fname = os.path.join(
+            os.path.dirname(__file__), "../fixtures/tests/citations.pdf"
+        )
+        expected = pdfjs_to_text_subprocess(fname).split("\x0c")
+        pool = PdfjsPool(1)
+        self.addCleanup(pool.shutdown)
+
+        # pages are streamed back one at a time, and the worker is reused
+        self.assertEqual(expected, list(pool.iter_pages(fname=fname)))
+        worker = pool.workers[0]
+        process = worker.process
+        with open(fname, "rb") as f:
+            self.assertEqual(expected, list(pool.iter_pages(data=f.read())))
+        self.assertIs(process, worker.process)
+
+        # abandoning a request part-way through means the worker is restarted
+        pages = pool.iter_pages(fname=fname)
+        next(pages)
+        pages.close()
+        self.assertIsNone(worker.process)
+        self.assertEqual(expected, list(pool.iter_pages(fname=fname)))
+
+        # errors are reported, and the worker can be reused
+        with self.assertRaises(PdfjsError):
+            list(pool.iter_pages(data=b"not a pdf"))
+        self.assertEqual(expected, list(pool.iter_pages(fname=fname)))
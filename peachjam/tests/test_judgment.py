@@ -17,6 +17,7 @@ from peachjam.models import (
     Court,
     CourtClass,
     CourtRegistry,
+    DocumentContentPDF,
     Judgment,
     Locality,
     SourceFile,
@@ -144,6 +145,68 @@ class JudgmentTestCase(TestCase):
 
         self.assertFalse(SourceFile.objects.filter(document=judgment).exists())
 
+    def test_anonymised_source_file_pdf_reuses_rendered_content(self):
+        judgment = self.make_judgment()
+        Judgment.objects.filter(pk=judgment.pk).update(anonymised=True)
+        judgment.anonymised = True
+        source_file = SourceFile.objects.create(
+            document=judgment,
+            file=ContentFile(b"source", name="source.docx"),
+            mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            anonymised_file_as_pdf=ContentFile(b"old", name="anonymised.pdf"),
+        )
+
+        with patch.object(
+            judgment, "convert_html_to_pdf", return_value=io.BytesIO(b"pdf")
+        ) as convert:
+            judgment.create_anonymised_source_file_pdf()
+            self.assertEqual(1, convert.call_count)
+            # the rendered content is used instead of a copy
+            source_file.refresh_from_db()
+            self.assertFalse(source_file.anonymised_file_as_pdf)
+            content_pdf = DocumentContentPDF.get_current_for_document(judgment)
+            self.assertEqual(b"pdf", content_pdf.file.read())
+
+            # only the case name has changed, so the content isn't rendered again
+            judgment.case_name = "Anonymised case"
+            Judgment.objects.filter(pk=judgment.pk).update(case_name=judgment.case_name)
+            judgment.create_anonymised_source_file_pdf()
+            self.assertEqual(1, convert.call_count)
+
+        doc_content = judgment.get_or_create_document_content()
+        doc_content.content_html = "<p>Updated text.</p>"
+        doc_content.__class__.objects.filter(pk=doc_content.pk).update(
+            content_html=doc_content.content_html
+        )
+        self.assertIsNone(DocumentContentPDF.get_current_for_document(judgment))
+        with patch.object(
+            judgment, "convert_html_to_pdf", return_value=io.BytesIO(b"new pdf")
+        ) as convert:
+            judgment.create_anonymised_source_file_pdf()
+            self.assertEqual(1, convert.call_count)
+
+        content_pdf = DocumentContentPDF.get_current_for_document(judgment)
+        self.assertEqual(b"new pdf", content_pdf.file.read())
+        self.assertEqual(
+            1, DocumentContentPDF.objects.filter(document=judgment).count()
+        )
+
+    def test_anonymised_source_file_pdf_without_source_file(self):
+        judgment = self.make_judgment()
+        Judgment.objects.filter(pk=judgment.pk).update(anonymised=True)
+        judgment.anonymised = True
+
+        with patch.object(
+            judgment, "convert_html_to_pdf", return_value=io.BytesIO(b"pdf")
+        ):
+            judgment.create_anonymised_source_file_pdf()
+
+        # the PDF is stored once, as the source file
+        source_file = SourceFile.objects.get(document=judgment)
+        self.assertTrue(source_file.file_is_anonymised)
+        self.assertEqual(b"pdf", source_file.file.read())
+        self.assertFalse(DocumentContentPDF.objects.filter(document=judgment).exists())
+
     def test_flynote_lines_splits_and_trims_multiline_flynotes(self):
         judgment = Judgment(flynote=" Line one \n\nLine two\n  Line three  ")
         self.assertEqual(["Line one", "Line two", "Line three"], judgment.flynote_lines)
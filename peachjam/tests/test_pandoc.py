@@ -0,0 +1,112 @@
+import shutil
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+import peachjam.pandoc
+from peachjam.helpers import markdownify_pandoc, markdownify_pandoc_many
+from peachjam.pandoc import LRUCache, PandocError, PandocServer, convert_subprocess
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class MarkdownCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch.object(peachjam.pandoc, "_lru", LRUCache(1000))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_convert_many(self, texts):
+        return [f"<p>{text}</p>" for text in texts]
+
+    def test_converted_html_is_cached(self):
+        with patch(
+            "peachjam.pandoc.convert_many", side_effect=self.fake_convert_many
+        ) as convert_many:
+            self.assertEqual("<p>one</p>", markdownify_pandoc("one"))
+            self.assertEqual("<p>one</p>", markdownify_pandoc("one"))
+            convert_many.assert_called_once_with(["one"])
+
+            # only the missing texts are converted, in one batch, and duplicates once
+            self.assertEqual(
+                ["<p>one</p>", "<p>two</p>", "<p>three</p>", "<p>two</p>"],
+                markdownify_pandoc_many(["one", "two", "three", "two"]),
+            )
+            convert_many.assert_called_with(["two", "three"])
+
+            # the shared cache is used when the local cache misses
+            peachjam.pandoc._lru.clear()
+            self.assertEqual(
+                ["<p>one</p>", "<p>three</p>"],
+                markdownify_pandoc_many(["one", "three"]),
+            )
+            self.assertEqual(2, convert_many.call_count)
+
+    def test_lru_cache_is_bounded(self):
+        lru = LRUCache(10)
+        lru.set("a", "12345")
+        lru.set("b", "12345")
+        lru.get("a")
+        lru.set("c", "12345")
+        # b was the least recently used
+        self.assertEqual("12345", lru.get("a"))
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(10, lru.size)
+        # values that are too big are not cached
+        lru.set("d", "12345678901")
+        self.assertIsNone(lru.get("d"))
+
+
+class PandocServerErrorsTestCase(SimpleTestCase):
+    def test_conversion_error(self):
+        server = PandocServer()
+        with patch.object(server, "ensure_started"), patch(
+            "peachjam.pandoc.requests.post"
+        ) as post:
+            post.return_value.json.return_value = [
+                {"output": "<p>one</p>"},
+                {"error": "Unknown option"},
+            ]
+            with self.assertRaises(PandocError):
+                server.convert_many(["one", "two"])
+
+    def test_start_is_retried_after_failure(self):
+        server = PandocServer()
+        with patch.object(server, "start", side_effect=OSError) as start, patch(
+            "peachjam.pandoc.time.monotonic", return_value=1000
+        ) as monotonic:
+            with self.assertRaises(OSError):
+                server.ensure_started()
+            self.assertFalse(server.available)
+
+            # the delay grows after each failure
+            monotonic.return_value = 1000 + server.retry_delay
+            self.assertTrue(server.available)
+            with self.assertRaises(OSError):
+                server.ensure_started()
+            monotonic.return_value += server.retry_delay
+            self.assertFalse(server.available)
+            monotonic.return_value += server.retry_delay
+            self.assertTrue(server.available)
+            self.assertEqual(2, start.call_count)
+
+
+@skipUnless(shutil.which("pandoc"), "pandoc is required")
+class PandocServerTestCase(SimpleTestCase):
+    def test_convert_many(self):
+        texts = ["# Heading", "a. one\nb. two", "Text[^1]\n\n[^1]: A note."]
+        server = PandocServer()
+        self.addCleanup(server.stop)
+        try:
+            server.ensure_started()
+        except peachjam.pandoc.PandocError:
+            self.skipTest("pandoc server is not supported by this version of pandoc")
+
+        self.assertEqual(
+            [convert_subprocess(text).strip() for text in texts],
+            [html.strip() for html in server.convert_many(texts)],
+        )
@@ -1,8 +1,11 @@
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from languages_plus.models import Language
 
+from peachjam.languages import language_registry
 from peachjam.models import Legislation, UserProfile
 from peachjam.signals import set_user_language
 
@@ -11,10 +14,47 @@ class TestPreferredLanguage(TestCase):
     fixtures = ["tests/countries", "documents/sample_documents", "tests/languages"]
     maxDiff = None
 
+    def setUp(self):
+        # the registry outlives the rollback of each test's changes, so start and end each test with it cleared
+        language_registry.clear()
+        self.addCleanup(language_registry.clear)
+
     def test_preferred_language(self):
         response = self.client.get(reverse("legislation_list"))
         self.assertEqual(4, response.context.get("documents").count())
 
+    def test_listing_does_not_query_languages(self):
+        # the first request loads the language registry
+        self.client.get(reverse("legislation_list"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("legislation_list"))
+        self.assertEqual(4, response.context.get("documents").count())
+        self.assertEqual(
+            [],
+            [
+                q["sql"]
+                for q in ctx.captured_queries
+                if "languages_plus_language" in q["sql"]
+            ],
+        )
+
+    def test_language_registry(self):
+        self.assertEqual("eng", language_registry.iso_639_3("EN"))
+        self.assertEqual("en", language_registry.iso_639_1("eng"))
+        self.assertIsNone(language_registry.get("xxx"))
+
+        # changes are picked up
+        Language.objects.create(
+            iso_639_1="sw",
+            iso_639_2T="swa",
+            iso_639_2B="swa",
+            iso_639_3="swa",
+            name_en="Swahili",
+            name_native="Kiswahili",
+        )
+        self.assertEqual("sw", language_registry.iso_639_1("swa"))
+
     def test_update_work_languages(self):
         doc = Legislation.objects.get(
             expression_frbr_uri="/akn/aa-au/act/1969/civil-aviation-commission/eng@1969-01-17"
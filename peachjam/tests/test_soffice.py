@@ -0,0 +1,92 @@
+import io
+import os
+import sys
+import tempfile
+import textwrap
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from docpipe.soffice import SOfficeError
+
+import peachjam.soffice
+from peachjam.soffice import SOfficePool
+
+# a stand-in for soffice: without --convert-to it stays resident, otherwise it "converts" by upper-casing the input
+FAKE_SOFFICE = textwrap.dedent("""
+    import os, sys, time
+    args = sys.argv[1:]
+    if "--convert-to" not in args:
+        time.sleep(600)
+        sys.exit(0)
+    outext = args[args.index("--convert-to") + 1]
+    outdir = args[args.index("--outdir") + 1]
+    infile = args[-1]
+    data = open(infile, "rb").read()
+    if data == b"fail":
+        sys.exit(1)
+    if data == b"hang":
+        time.sleep(600)
+    os.makedirs(outdir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(infile))[0]
+    with open(os.path.join(outdir, base + "." + outext), "wb") as f:
+        f.write(data.upper())
+    """)
+
+
+class SOfficePoolTestCase(SimpleTestCase):
+    def setUp(self):
+        fd, self.script = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as f:
+            f.write(FAKE_SOFFICE)
+        patcher = patch.object(
+            peachjam.soffice, "SOFFICE_CMD", [sys.executable, self.script]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = SOfficePool(2)
+        self.addCleanup(self.pool.shutdown)
+        self.addCleanup(os.unlink, self.script)
+
+    def test_convert(self):
+        for _ in range(3):
+            outf, tmpdir = self.pool.convert(io.BytesIO(b"hello"), "docx", "pdf")
+            self.assertEqual(b"HELLO", outf.read())
+            outf.close()
+            tmpdir.cleanup()
+
+        # resident processes are reused
+        slot = self.pool.slots[0]
+        self.assertTrue(slot.is_healthy())
+        self.assertEqual(slot.conversions, 2)
+
+    def test_failures_recycle_slot(self):
+        slot = self.pool.slots[0]
+        slot.start()
+        pid = slot.process.pid
+
+        with self.assertRaises(SOfficeError):
+            slot.convert(io.BytesIO(b"fail"), "docx", "pdf")
+        self.assertTrue(slot.is_healthy())
+        self.assertNotEqual(pid, slot.process.pid)
+
+    def test_timeout_recycles_slot(self):
+        slot = self.pool.slots[0]
+        slot.start()
+        pid = slot.process.pid
+
+        with patch.object(peachjam.soffice, "TIMEOUT", 1):
+            with self.assertRaises(SOfficeError):
+                slot.convert(io.BytesIO(b"hang"), "docx", "pdf")
+        self.assertNotEqual(pid, slot.process.pid)
+
+    def test_dead_process_is_restarted(self):
+        slot = self.pool.slots[0]
+        slot.start()
+        slot.process.kill()
+        slot.process.wait()
+
+        outf, tmpdir = slot.convert(io.BytesIO(b"hello"), "docx", "pdf")
+        self.assertEqual(b"HELLO", outf.read())
+        outf.close()
+        tmpdir.cleanup()
+        self.assertTrue(slot.is_healthy())
@@ -1,15 +1,21 @@
 import datetime
+import hashlib
+import os
 import re
+import tracemalloc
 import unittest.util
-from unittest.mock import ANY, Mock, call
+from io import StringIO
+from unittest.mock import ANY, Mock, call, patch
 
 from countries_plus.models import Country
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from languages_plus.models import Language
 
 from peachjam.models import CoreDocument, SourceFile
+from peachjam.models.attachments import HASH_CHUNK_SIZE
 from peachjam.storage import DynamicS3Boto3Storage
 
 # don't truncate diff strings
@@ -196,3 +202,47 @@ class DynamicFileSystemStorageTestCase(TestCase):
         self.assertEqual("file:foo/bar.txt", sf.file.get_raw_value())
         sf.refresh_from_db()
         self.assertEqual("file:foo/bar.txt", sf.file.get_raw_value())
+
+    def test_sha256_is_streamed_and_not_recalculated(self):
+        data = b"%PDF-1.4\n" + os.urandom(1024) * 16 * 1024
+        sf = SourceFile(document=self.doc)
+        sf.filename = "large.pdf"
+        sf.mimetype = "application/pdf"
+        sf.file = ContentFile(data, "large.pdf")
+        sf.save()
+        self.assertEqual(hashlib.sha256(data).hexdigest(), sf.sha256)
+
+        # hashing a large file from storage uses a bounded amount of memory
+        sf.refresh_from_db()
+        tracemalloc.start()
+        try:
+            self.assertEqual(sf.sha256, SourceFile.hash_file(sf.file))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 4 * HASH_CHUNK_SIZE)
+
+        # saving without changing the file doesn't read it back from storage
+        sf.refresh_from_db()
+        with patch.object(SourceFile, "hash_file") as hash_file:
+            sf.start_page = 2
+            sf.save()
+            hash_file.assert_not_called()
+
+        # a new file is hashed
+        sf.file = ContentFile(b"new data", "new.txt")
+        sf.save()
+        self.assertEqual(hashlib.sha256(b"new data").hexdigest(), sf.sha256)
+
+    def test_backfill_source_file_sha256(self):
+        sf = SourceFile(document=self.doc)
+        sf.filename = "test.txt"
+        sf.mimetype = "text/plain"
+        sf.file = ContentFile(b"test data", "test.txt")
+        sf.save()
+        SourceFile.objects.filter(pk=sf.pk).update(sha256=None)
+
+        call_command("backfill_source_file_sha256", stdout=StringIO())
+
+        sf.refresh_from_db()
+        self.assertEqual(hashlib.sha256(b"test data").hexdigest(), sf.sha256)
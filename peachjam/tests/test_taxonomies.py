@@ -1,12 +1,21 @@
+from datetime import date
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls.base import reverse
 from django_webtest import WebTest
 from guardian.shortcuts import assign_perm
 
-from peachjam.models import Taxonomy
+from peachjam.models import (
+    CoreDocument,
+    DocumentTopic,
+    Taxonomy,
+    TaxonomyDocumentCount,
+)
+from peachjam.models.taxonomies import TREE_VERSION_KEY, _trees
 
 User = get_user_model()
 
@@ -67,6 +76,70 @@ class TaxonomyTestCase(WebTest):
             ["Administrative law", "Land Rights", "Zoning"],
         )
 
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_allowed_taxonomies_are_cached(self):
+        def names(tree):
+            return [
+                (node["data"]["name"], names(node.get("children", []))) for node in tree
+            ]
+
+        Taxonomy.get_allowed_taxonomies()
+        with self.assertNumQueries(0):
+            tree = Taxonomy.get_allowed_taxonomies()["tree"]
+        self.assertEqual([("Collections", [("Land Rights", [])])], names(tree))
+
+        # changes invalidate the cached tree
+        zoning = self.root.add_child(name="Zoning")
+        self.assertEqual(
+            [("Collections", [("Land Rights", []), ("Zoning", [])])],
+            names(Taxonomy.get_allowed_taxonomies()["tree"]),
+        )
+        zoning.move(Taxonomy.objects.get(name="Land Rights"), "last-child")
+        self.assertEqual(
+            [("Collections", [("Land Rights", [("Zoning", [])])])],
+            names(Taxonomy.get_allowed_taxonomies()["tree"]),
+        )
+        Taxonomy.objects.get(name="Zoning").delete()
+        self.assertEqual(
+            [("Collections", [("Land Rights", [])])],
+            names(Taxonomy.get_allowed_taxonomies()["tree"]),
+        )
+
+        # losing the version from the shared cache invalidates the cached tree, rather than reviving an old one
+        cached = Taxonomy.get_cached_tree()
+        cache.delete(TREE_VERSION_KEY)
+        self.assertIsNot(cached, Taxonomy.get_cached_tree())
+
+        # trees for individual roots are bounded
+        with patch("peachjam.models.taxonomies.MAX_CACHED_TREES", 2):
+            for node in Taxonomy.objects.all():
+                Taxonomy.get_allowed_taxonomies(root=node)
+            self.assertLessEqual(len(_trees["trees"]), 2)
+
+    def test_allowed_taxonomies_are_filtered_per_user(self):
+        officer = User.objects.get(username="officer@example.com")
+        user = User.objects.get(username="user@example.com")
+
+        allowed = Taxonomy.get_allowed_taxonomies(officer)
+        self.assertEqual(
+            ["Collections", "Land Rights", "Environment", "Climate Change"],
+            [Taxonomy.objects.get(pk=pk).name for pk in allowed["pk_list"]],
+        )
+
+        allowed = Taxonomy.get_allowed_taxonomies(user)
+        self.assertEqual(
+            ["Collections", "Land Rights"],
+            [Taxonomy.objects.get(pk=pk).name for pk in allowed["pk_list"]],
+        )
+        self.assertNotIn("children", allowed["tree"][0]["children"][0])
+
+        # filtering for one user doesn't change the tree for another
+        allowed = Taxonomy.get_allowed_taxonomies(officer)
+        self.assertEqual(4, len(allowed["pk_list"]))
+        self.assertIn("children", allowed["tree"][0]["children"][0])
+
     def test_taxonomy_tree_for_items_is_ordered_by_name(self):
         zoning = self.root.add_child(name="Zoning")
         admin = self.root.add_child(name="Administrative law")
@@ -151,3 +224,91 @@ class TaxonomyTestCase(WebTest):
         )
 
         self.assertEqual(response.status_code, 404)
+
+
+class TaxonomyDocumentCountTestCase(TestCase):
+    fixtures = ["tests/countries", "tests/languages"]
+
+    def setUp(self):
+        self.root = Taxonomy.add_root(name="Collections")
+        self.land = self.root.add_child(name="Land Rights")
+        self.environment = self.land.add_child(name="Environment")
+        self.zoning = self.root.add_child(name="Zoning")
+        self.docs = [
+            CoreDocument.objects.create(
+                title=f"Doc {i}",
+                jurisdiction_id="ZA",
+                language_id="en",
+                date=date(2020, 1, 1),
+                frbr_uri_doctype="doc",
+                frbr_uri_number=f"doc-{i}",
+            )
+            for i in range(3)
+        ]
+
+    def counts(self):
+        counts = dict(
+            TaxonomyDocumentCount.objects.values_list("taxonomy__name", "count")
+        )
+        return {
+            topic.name: counts.get(topic.name, 0)
+            for topic in [self.root, self.land, self.environment, self.zoning]
+        }
+
+    def test_counts_are_adjusted_as_topics_change(self):
+        DocumentTopic.objects.create(document=self.docs[0], topic=self.environment)
+        DocumentTopic.objects.create(document=self.docs[0], topic=self.land)
+        DocumentTopic.objects.create(document=self.docs[0], topic=self.zoning)
+        DocumentTopic.objects.create(document=self.docs[1], topic=self.land)
+        self.assertEqual(
+            {"Collections": 2, "Land Rights": 2, "Environment": 1, "Zoning": 1},
+            self.counts(),
+        )
+
+        # deleted together, the document is only removed once from each ancestor
+        DocumentTopic.objects.filter(document=self.docs[0]).delete()
+        self.assertEqual(
+            {"Collections": 1, "Land Rights": 1, "Environment": 0, "Zoning": 0},
+            self.counts(),
+        )
+
+        # deleting one of two topics under an ancestor leaves the document counted
+        DocumentTopic.objects.create(document=self.docs[1], topic=self.environment)
+        DocumentTopic.objects.get(document=self.docs[1], topic=self.land).delete()
+        self.assertEqual(
+            {"Collections": 1, "Land Rights": 1, "Environment": 1, "Zoning": 0},
+            self.counts(),
+        )
+
+        # deleting a document deletes its topics
+        self.docs[1].delete()
+        self.assertEqual(
+            {"Collections": 0, "Land Rights": 0, "Environment": 0, "Zoning": 0},
+            self.counts(),
+        )
+        self.assertEqual(0, TaxonomyDocumentCount.refresh_for_taxonomy(self.root))
+
+    def test_bulk_created_topics(self):
+        topics = [self.environment, self.land, self.zoning]
+        DocumentTopic.objects.bulk_create(
+            [DocumentTopic(document=self.docs[2], topic=topic) for topic in topics]
+        )
+        TaxonomyDocumentCount.documents_added(
+            [(self.docs[2].pk, topic.pk) for topic in topics]
+        )
+        self.assertEqual(
+            {"Collections": 1, "Land Rights": 1, "Environment": 1, "Zoning": 1},
+            self.counts(),
+        )
+
+    def test_refresh_reports_drift(self):
+        DocumentTopic.objects.create(document=self.docs[0], topic=self.environment)
+        self.assertEqual(0, TaxonomyDocumentCount.refresh_for_all_taxonomies())
+
+        TaxonomyDocumentCount.objects.filter(taxonomy=self.land).update(count=5)
+        TaxonomyDocumentCount.objects.filter(taxonomy=self.environment).delete()
+        self.assertEqual(2, TaxonomyDocumentCount.refresh_for_taxonomy(self.root))
+        self.assertEqual(
+            {"Collections": 1, "Land Rights": 1, "Environment": 1, "Zoning": 0},
+            self.counts(),
+        )
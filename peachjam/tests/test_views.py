@@ -1,4 +1,5 @@
 import datetime
+import io
 import os
 from unittest.mock import patch
 
@@ -21,6 +22,7 @@ from peachjam.models import (
     CaseHistory,
     CoreDocument,
     Court,
+    DocumentContentPDF,
     Folder,
     GenericDocument,
     Judgment,
@@ -765,7 +767,75 @@ class PeachjamViewsTest(TestCase):
         )
         resp = self.client.get(f"{doc.get_absolute_url()}/source.pdf")
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(resp.content, pdf_content)
+        self.assertEqual(resp.getvalue(), pdf_content)
+
+    def test_document_source_file_ranges_and_etags(self):
+        frbr_uri = "/akn/aa-au/judgment/ecowascj/2016/52/eng@2016-11-09"
+        doc = CoreDocument.objects.get(expression_frbr_uri=frbr_uri)
+        pdf_content = self.pdf_fixture_content()
+        sf = SourceFile.objects.create(
+            document=doc,
+            file=ContentFile(pdf_content, name="test.pdf"),
+            mimetype="application/pdf",
+        )
+        url = f"{doc.get_absolute_url()}/source.pdf"
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["ETag"], f'"{sf.sha256}"')
+        self.assertEqual(resp["Accept-Ranges"], "bytes")
+        self.assertEqual(resp["Content-Length"], str(len(pdf_content)))
+
+        # conditional get
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{sf.sha256}"')
+        self.assertEqual(resp.status_code, 304)
+
+        # range requests
+        resp = self.client.get(url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], f"bytes 10-19/{len(pdf_content)}")
+        self.assertEqual(resp.getvalue(), pdf_content[10:20])
+
+        resp = self.client.get(url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp.getvalue(), pdf_content[-5:])
+
+        resp = self.client.get(url, HTTP_RANGE=f"bytes={len(pdf_content)}-")
+        self.assertEqual(resp.status_code, 416)
+
+        # a stale If-Range gets the full file
+        resp = self.client.get(url, HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.getvalue(), pdf_content)
+
+    def test_document_source_file_streams_large_files(self):
+        import tracemalloc
+
+        frbr_uri = "/akn/aa-au/judgment/ecowascj/2016/52/eng@2016-11-09"
+        doc = CoreDocument.objects.get(expression_frbr_uri=frbr_uri)
+        size = 32 * 1024 * 1024
+        SourceFile.objects.create(
+            document=doc,
+            file=ContentFile(b"x" * size, name="large.txt"),
+            mimetype="text/plain",
+        )
+
+        tracemalloc.start()
+        try:
+            resp = self.client.get(f"{doc.get_absolute_url()}/source")
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.streaming)
+            received = 0
+            for chunk in resp.streaming_content:
+                received += len(chunk)
+            resp.close()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(received, size)
+        # memory use is bounded by the chunk size, not the file size
+        self.assertLess(peak, 8 * 1024 * 1024)
 
     def test_pdf_document_content_includes_source_file_start_page(self):
         doc = GenericDocument.objects.create(
@@ -1035,7 +1105,69 @@ class PeachjamViewsTest(TestCase):
         )
         resp = self.client.get(f"{doc.get_absolute_url()}/source.pdf")
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(resp.content, b"anon")
+        self.assertEqual(resp.getvalue(), b"anon")
+
+    @patch("peachjam.tasks.render_document_content_pdf")
+    def test_document_content_pdf(self, render_pdf):
+        doc = CoreDocument.objects.get(
+            expression_frbr_uri="/akn/aa-au/doc/activity-report/2017/nn/eng@2017-07-03"
+        )
+        SourceFile.objects.filter(document=doc).delete()
+        doc = CoreDocument.objects.get(pk=doc.pk)
+
+        # the PDF is rendered in the background when the content changes
+        doc_content = doc.get_or_create_document_content(track_changes=True)
+        doc_content.content_html = "<p>Some text.</p>"
+        doc_content.content_html_is_akn = False
+        doc_content.save()
+        render_pdf.assert_called_once_with(doc.pk)
+
+        # requests don't render it
+        resp = self.client.get(f"{doc.get_absolute_url()}/source.pdf")
+        self.assertEqual(resp.status_code, 404)
+        render_pdf.assert_called_once()
+
+        with patch.object(
+            CoreDocument, "convert_html_to_pdf", return_value=io.BytesIO(b"pdf")
+        ):
+            DocumentContentPDF.get_or_create_for_document(doc)
+        resp = self.client.get(f"{doc.get_absolute_url()}/source.pdf")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.getvalue(), b"pdf")
+
+        # a PDF of outdated content isn't used
+        doc_content.content_html = "<p>Changed text.</p>"
+        doc_content.save()
+        self.assertEqual(2, render_pdf.call_count)
+        resp = self.client.get(f"{doc.get_absolute_url()}/source.pdf")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_anonymised_judgment_content_pdf(self):
+        frbr_uri = "/akn/aa-au/judgment/ecowascj/2016/52/eng@2016-11-09"
+        doc = CoreDocument.objects.get(expression_frbr_uri=frbr_uri)
+        doc.anonymised = True
+        doc.save()
+        SourceFile.objects.create(
+            document=doc,
+            file=ContentFile(b"test", name="test.txt"),
+            mimetype="text/plain",
+        )
+        doc_content = doc.get_or_create_document_content()
+        doc_content.content_html = "<p>Anonymised text.</p>"
+        doc_content.content_html_is_akn = False
+        doc_content.save()
+
+        with patch.object(
+            CoreDocument, "convert_html_to_pdf", return_value=io.BytesIO(b"anon")
+        ):
+            DocumentContentPDF.get_or_create_for_document(doc)
+        resp = self.client.get(f"{doc.get_absolute_url()}/source")
+        self.assertRedirects(
+            resp, f"{doc.get_absolute_url()}/source.pdf", fetch_redirect_response=False
+        )
+        resp = self.client.get(f"{doc.get_absolute_url()}/source.pdf")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.getvalue(), b"anon")
 
     def test_anonymised_source_files_do_not_redirect_to_storage_or_remote_urls(self):
         frbr_uri = "/akn/aa-au/judgment/ecowascj/2016/52/eng@2016-11-09"
@@ -1080,7 +1212,7 @@ class PeachjamViewsTest(TestCase):
             response = self.client.get(f"{doc.get_absolute_url()}/source.pdf")
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content, b"anonymised")
+        self.assertEqual(response.getvalue(), b"anonymised")
         self.assertNotIn("original-parties", response.get("Location", ""))
         self.assertIn(
             source_file.filename_for_download(".pdf"), response["Content-Disposition"]
@@ -0,0 +1,26 @@
+import sys
+
+from django.test import SimpleTestCase
+
+from peachjam.workers import WorkerError, WorkerPool
+
+# a worker that logs a warning to stdout before responding to each request
+STUB_WORKER = """
+import json, sys
+for line in sys.stdin:
+    print("Warning: something odd", flush=True)
+    print(json.dumps({"done": True}), flush=True)
+"""
+
+
+class WorkerPoolTestCase(SimpleTestCase):
+    def test_invalid_message(self):
+        pool = WorkerPool(1, [sys.executable, "-c", STUB_WORKER])
+        self.addCleanup(pool.shutdown)
+        worker = pool.workers[0]
+
+        with self.assertRaisesRegex(WorkerError, "invalid message"):
+            pool.request({"file": "test.pdf"})
+        # the rest of the output is discarded by restarting the worker
+        self.assertIsNone(worker.process)
+        self.assertIs(worker, pool.free.get_nowait())
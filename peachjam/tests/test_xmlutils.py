@@ -3,6 +3,7 @@ from unittest import TestCase
 from peachjam.xmlutils import (
     get_following_text,
     get_preceding_text,
+    get_surrounding_texts,
     parse_html_str,
     qualify_local_refs,
 )
@@ -15,6 +16,10 @@ class WrapTextTestCase(TestCase):
         self.assertEqual(
             expected, get_preceding_text(tree.xpath("//a")[0], ["p"], max_chars)
         )
+        self.assertEqual(
+            expected,
+            get_surrounding_texts(tree, tree.xpath("//a"), ["p"], max_chars)[0][0],
+        )
 
     def test_preceding_text(self):
         self.check_pre("<a>baz</a>", "")
@@ -51,6 +56,10 @@ class WrapTextTestCase(TestCase):
         self.assertEqual(
             expected, get_following_text(tree.xpath("//a")[0], ["p"], max_chars)
         )
+        self.assertEqual(
+            expected,
+            get_surrounding_texts(tree, tree.xpath("//a"), ["p"], max_chars)[0][1],
+        )
 
     def test_following_text(self):
         self.check_fol("<a>baz</a>", "")
@@ -81,6 +90,15 @@ class WrapTextTestCase(TestCase):
             "<div><section><p><a>baz</a>foo bar</p>xxx</section></div>", "foo", 3
         )
 
+    def test_surrounding_texts_for_many_nodes(self):
+        tree = parse_html_str(
+            "<div><p>one <a>A</a> two <a>B</a> three</p><p>four <a>C</a></p></div>"
+        )
+        self.assertEqual(
+            [("one ", " two"), ("two ", " thr"), ("our ", "")],
+            get_surrounding_texts(tree, tree.xpath("//a"), ["p"], 4),
+        )
+
 
 class QualifyLocalRefsTestCase(TestCase):
     def test_rewrites_fragment_local_links(self):
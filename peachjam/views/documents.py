@@ -1,11 +1,9 @@
-import itertools
 import re
 from urllib.parse import quote
 
 from cobalt import FrbrUri
 from django.conf import settings
 from django.contrib.auth.mixins import PermissionRequiredMixin
-from django.db.models import Count
 from django.http import Http404, HttpResponse, JsonResponse
 from django.http.response import FileResponse, HttpResponseForbidden
 from django.shortcuts import get_list_or_404, get_object_or_404, redirect, reverse
@@ -21,7 +19,9 @@ from peachjam.forms import DocumentSummaryForm
 from peachjam.helpers import add_slash, add_slash_to_frbr_uri
 from peachjam.helpers import get_language as get_language_from_request
 from peachjam.models import (
+    CitationSummary,
     CoreDocument,
+    DocumentContentPDF,
     DocumentNature,
     DocumentSocialImage,
     ExtractedCitation,
@@ -30,6 +30,7 @@ from peachjam.models import (
 from peachjam.registry import registry
 from peachjam.resolver import resolver
 from peachjam.storage import clean_filename
+from peachjam.streaming import streaming_file_response
 from peachjam.views import BaseDocumentDetailView
 from peachjam_subs.mixins import SubscriptionRequiredMixin
 
@@ -131,7 +132,8 @@ class DocumentSourceView(DocumentDetailView):
                 source_file.file
                 and source_file.mimetype == "application/pdf"
                 or anonymised
-                and source_file.anonymised_file_as_pdf
+                and not source_file.file_is_anonymised
+                and self.get_anonymised_pdf(source_file)
             ):
                 return redirect(
                     reverse(
@@ -156,19 +158,26 @@ class DocumentSourceView(DocumentDetailView):
                     return redirect(source_file.file.url)
 
                 return self.make_response(
-                    source_file.file.open(),
+                    source_file.file,
                     source_file.mimetype,
                     source_file.filename_for_download(),
+                    etag=source_file.etag_for(source_file.file),
                 )
 
         raise Http404
 
-    def make_response(self, f, content_type, fname):
-        file_bytes = f.read()
-        response = HttpResponse(file_bytes, content_type=content_type)
-        response["Content-Disposition"] = f"attachment; filename={fname}"
-        response["Content-Length"] = str(len(file_bytes))
-        return response
+    def make_response(self, f, content_type, fname, etag=None):
+        return streaming_file_response(
+            self.request, f, content_type, fname, "attachment", etag=etag
+        )
+
+    def get_anonymised_pdf(self, source_file):
+        """The PDF rendered from an anonymised judgment's content, or None if it isn't ready yet. It is only used
+        if it was rendered from the current content."""
+        if source_file.anonymised_file_as_pdf:
+            return source_file.anonymised_file_as_pdf
+        content_pdf = DocumentContentPDF.get_current_for_document(self.object)
+        return content_pdf.file if content_pdf else None
 
 
 class DocumentSourcePDFView(DocumentSourceView):
@@ -185,7 +194,7 @@ class DocumentSourcePDFView(DocumentSourceView):
             # special case for anonymised judgments: use the anonymised file if available
             if anonymised and not source_file.file_is_anonymised:
                 # this may be None
-                pdf = source_file.anonymised_file_as_pdf
+                pdf = self.get_anonymised_pdf(source_file)
 
             if pdf:
                 # Anonymised files must be served through Peachjam. A storage redirect can reveal the original
@@ -205,8 +214,23 @@ class DocumentSourcePDFView(DocumentSourceView):
                         pdf,
                         "application/pdf",
                         source_file.filename_for_download(".pdf"),
+                        etag=source_file.etag_for(pdf),
                     )
 
+        else:
+            # there is no source file, so use a PDF of the content if it has been rendered from the current content
+            # (see DocumentContent.trigger_render_content_pdf)
+            content_pdf = DocumentContentPDF.get_current_for_document(self.object)
+            if content_pdf:
+                if getattr(content_pdf.file.storage, "custom_domain", None):
+                    return redirect(content_pdf.file.url)
+                return self.make_response(
+                    content_pdf.file,
+                    "application/pdf",
+                    content_pdf.filename_for_download(),
+                    etag=content_pdf.fingerprint,
+                )
+
         raise Http404()
 
 
@@ -225,7 +249,7 @@ class DocumentPublicationView(DocumentSourceView):
                 return redirect(publication_file.url)
 
             return self.make_response(
-                publication_file.file.open(),
+                publication_file.file,
                 publication_file.mimetype,
                 publication_file.filename,
             )
@@ -276,37 +300,25 @@ class DocumentAttachmentView(DocumentDetailView):
 class DocumentCitationsTabView(DocumentDetailView):
     template_name = "peachjam/document/_citations.html"
 
-    def fetch_citation_docs(self, works, direction):
-        """Fetch documents for the given works, grouped by nature and ordered by the most incoming citations."""
-        # count the number of unique works, grouping by nature
-
-        counts = {
-            r["nature"]: r["n"]
-            for r in CoreDocument.objects.filter(work__in=works)
-            .values("nature")
-            .annotate(n=Count("work_frbr_uri", distinct=True))
-        }
-
-        # get the top 10 documents for each nature, ordering by the number of incoming citations
-        docs, truncated = ExtractedCitation.fetch_grouped_citation_docs(
-            works, get_language()
+    def fetch_citation_docs(self, direction):
+        """Fetch documents for the works cited by (outgoing) or citing (incoming) this work, grouped by nature and
+        ordered by authority."""
+        work = self.object.work
+        groups = CitationSummary.fetch_grouped_citation_docs(
+            work, direction, get_language()
         )
+        docs = [d for _, _, group in groups for d in group]
+        work_ids = [d.work_id for d in docs]
 
-        table_direction = None
-        if direction == "cited_works":
-            table_direction = "outgoing"
+        if direction == CitationSummary.Direction.OUTGOING:
             citations = ExtractedCitation.objects.filter(
-                citing_work=self.object.work, target_work__documents__in=docs
+                citing_work=work, target_work_id__in=work_ids
             ).prefetch_related("treatments")
-
             treatments = {c.target_work_id: c.treatments for c in citations}
-
-        elif direction == "citing_works":
-            table_direction = "incoming"
+        else:
             citations = ExtractedCitation.objects.filter(
-                citing_work__documents__in=docs, target_work=self.object.work
+                citing_work_id__in=work_ids, target_work=work
             ).prefetch_related("treatments")
-
             treatments = {c.citing_work_id: c.treatments for c in citations}
 
         for d in docs:
@@ -315,13 +327,14 @@ class DocumentCitationsTabView(DocumentDetailView):
 
         result = [
             {
-                "nature": nature,
-                "n_docs": counts.get(nature.pk, 0),
-                "docs": list(group),
-                "table_id": f"citations-table-{table_direction}-{nature.pk}",
+                "nature": group[0].nature,
+                "n_docs": n_docs,
+                "docs": group,
+                "after": group[-1].work_id,
+                "table_id": f"citations-table-{direction}-{nature_id}",
             }
-            # the docs are already sorted by nature
-            for nature, group in itertools.groupby(docs, lambda d: d.nature)
+            for nature_id, n_docs, group in groups
+            if group
         ]
 
         # sort by size of group, descending
@@ -332,19 +345,16 @@ class DocumentCitationsTabView(DocumentDetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        doc = self.object
-
         # This only runs when HTMX hits this specific endpoint
         # Citations
         context["cited_documents"] = self.fetch_citation_docs(
-            doc.work.cited_works(), "cited_works"
+            CitationSummary.Direction.OUTGOING
         )
         context["documents_citing_current_doc"] = self.fetch_citation_docs(
-            doc.work.works_citing_current_work(),
-            "citing_works",  # Assuming 'citing_works' was the truncated method
+            CitationSummary.Direction.INCOMING
         )
 
-        context["document"] = doc
+        context["document"] = self.object
 
         return context
 
@@ -356,6 +366,8 @@ class DocumentCitationsView(DocumentDetailView):
         context = super().get_context_data(**kwargs)
 
         direction = self.request.GET.get("direction", "incoming")
+        if direction != CitationSummary.Direction.INCOMING:
+            direction = CitationSummary.Direction.OUTGOING
 
         try:
             nature = int(self.request.GET.get("nature"))
@@ -364,28 +376,24 @@ class DocumentCitationsView(DocumentDetailView):
             raise Http404
 
         try:
-            offset = max(0, int(self.request.GET.get("offset", 0)))
+            # the id of the last work on the previous page
+            after = self.request.GET.get("after")
+            after = int(after) if after else None
         except ValueError:
             raise Http404
 
         doc = self.get_object()
-        works = (
-            doc.work.works_citing_current_work()
-            if direction == "incoming"
-            else doc.work.cited_works()
-        )
-
         (
             context["docs"],
             context["truncated"],
-        ) = ExtractedCitation.fetch_grouped_citation_docs(
-            works,
+        ) = CitationSummary.fetch_citation_docs_page(
+            doc.work,
+            direction,
+            nature,
             get_language_from_request(self.request),
-            nature=nature,
-            offset=offset,
+            after=after,
         )
-        context["start"] = offset
-        context["offset"] = offset + len(context["docs"])
+        context["after"] = context["docs"][-1].work_id if context["docs"] else None
         context["nature"] = nature
         context["direction"] = direction
         context["doc_table_id"] = f"citations-table-{direction}-{nature.pk}"
@@ -415,13 +423,10 @@ class DocumentSocialImageView(DocumentDetailView):
 
     def get(self, request, *args, **kwargs):
         document = self.get_object()
-        debug = settings.DEBUG and "debug" in request.GET
-        html_str = DocumentSocialImage.html_for_document(document, debug)
-
-        if debug:
-            return HttpResponse(html_str)
+        if settings.DEBUG and "debug" in request.GET:
+            return HttpResponse(DocumentSocialImage.html_for_document(document, True))
 
-        image = DocumentSocialImage.get_or_create_for_document(document, html_str)
+        image = DocumentSocialImage.render_for_document(document)
         if getattr(image.file.storage, "custom_domain", None):
             # use the storage's custom domain to serve the file
             return redirect(image.file.url)
@@ -18,16 +18,17 @@ from django.utils.translation import gettext_lazy
 from django.views.generic import ListView, TemplateView
 
 from peachjam.analysis.judges import judge_identity_service
+from peachjam.citation_graph import get_citation_graph
 from peachjam.forms import JudgeIdentityWorkflowForm
 from peachjam.models import (
     Bench,
-    ExtractedCitation,
     Flynote,
     Judge,
     JudgeAlias,
     JudgePerson,
     Judgment,
     JudgmentFlynote,
+    Work,
 )
 from peachjam.views.judgment import FilteredJudgmentView
 
@@ -416,44 +417,47 @@ class JudgePersonDetailView(JudgePublicPageMixin, FilteredJudgmentView):
 
     def get_citation_relationships(self, bench_entries):
         """Return citation relationships for the judge's linked judgments."""
-        work_ids = bench_entries.values_list("judgment__work_id", flat=True).distinct()
-        if not work_ids.exists():
+        judgments = set(
+            bench_entries.values_list(
+                "judgment_id", "judgment__work_id", "judgment__date", "judgment__title"
+            )
+        )
+        work_ids = {work_id for _, work_id, _, _ in judgments}
+        if not work_ids:
             return {
                 "incoming_count": 0,
                 "most_cited_judgments": [],
             }
 
-        incoming_citations = ExtractedCitation.objects.filter(
-            target_work_id__in=work_ids,
-            citing_work__documents__published=True,
-            citing_work__documents__doc_type="judgment",
-        ).exclude(citing_work_id__in=work_ids)
-        incoming_work_ids = incoming_citations.values_list(
-            "citing_work_id", flat=True
-        ).distinct()
-
-        most_cited_judgments = list(
-            Judgment.objects.for_document_table()
-            .filter(bench__judge_person=self.judge_person)
-            .filter(published=True)
-            .annotate(
-                incoming_citation_count=Count(
-                    "work__incoming_citations__citing_work",
-                    filter=(
-                        ~Q(work__incoming_citations__citing_work_id__in=work_ids)
-                        & Q(
-                            work__incoming_citations__citing_work__documents__published=True,
-                            work__incoming_citations__citing_work__documents__doc_type="judgment",
-                        )
-                    ),
-                    distinct=True,
-                )
-            )
-            .filter(incoming_citation_count__gt=0)
-            .order_by("-incoming_citation_count", "-date", "title")[:5]
+        # only count citations from published judgments that aren't the judge's own
+        citing = get_citation_graph().cited_by_many(work_ids)
+        citing_judgment_works = set(
+            Work.objects.filter(
+                pk__in=set().union(*citing.values()) - work_ids,
+                documents__published=True,
+                documents__doc_type="judgment",
+            ).values_list("pk", flat=True)
         )
+        counts = {
+            work_id: len(citing_judgment_works.intersection(citing_work_ids))
+            for work_id, citing_work_ids in citing.items()
+        }
+
+        # most cited first, then the most recent, then by title
+        top = sorted((j for j in judgments if counts[j[1]]), key=lambda j: j[3] or "")
+        top.sort(key=lambda j: j[2], reverse=True)
+        top.sort(key=lambda j: counts[j[1]], reverse=True)
+        top = top[:5]
+
+        docs = Judgment.objects.for_document_table().in_bulk([j[0] for j in top])
+        most_cited_judgments = []
+        for judgment_id, work_id, _, _ in top:
+            doc = docs[judgment_id]
+            doc.incoming_citation_count = counts[work_id]
+            most_cited_judgments.append(doc)
+
         return {
-            "incoming_count": incoming_work_ids.count(),
+            "incoming_count": len(citing_judgment_works),
             "most_cited_judgments": most_cited_judgments,
         }
 
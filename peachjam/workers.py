@@ -0,0 +1,140 @@
+"""Pools of long-lived helper processes (such as the Node scripts in bin/) that speak a JSON lines protocol.
+
+A worker process handles one request at a time: it reads a request as a line of JSON on stdin and writes one or
+more lines of JSON to stdout in response. The last line of a response has "done": true, or an "error" key.
+"""
+
+import json
+import logging
+import queue
+import subprocess
+from threading import Timer
+
+log = logging.getLogger(__name__)
+
+
+class WorkerError(Exception):
+    pass
+
+
+class JsonLinesWorker:
+    """A long-lived process that handles JSON line requests."""
+
+    # restart the process after this many requests, to bound memory growth
+    max_requests = 500
+
+    def __init__(self, cmd, timeout, error_class=WorkerError):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.error_class = error_class
+        self.process = None
+        self.requests = 0
+        # is the worker part-way through responding to a request?
+        self.busy = False
+
+    def is_healthy(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self.requests = 0
+
+    def stop(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process = None
+        self.busy = False
+
+    def iter_messages(self, request):
+        """Send a request and yield each response message as it arrives, ending with the "done" message."""
+        if not self.is_healthy() or self.requests >= self.max_requests:
+            self.stop()
+            self.start()
+        self.requests += 1
+        self.busy = True
+
+        # kill the process if it takes too long, which ends the output
+        timer = Timer(self.timeout, self.process.kill)
+        timer.start()
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+
+            while True:
+                line = self.process.stdout.readline()
+                if not line:
+                    raise self.error_class(f"{self.cmd[0]} ended unexpectedly")
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    msg = None
+                if not isinstance(msg, dict):
+                    # the rest of the output can't be trusted, so the worker is left busy and will be restarted
+                    raise self.error_class(
+                        f"{self.cmd[0]} wrote an invalid message: {line[:200]!r}"
+                    )
+                if "error" in msg:
+                    self.busy = False
+                    raise self.error_class(msg["error"])
+                if msg.get("done"):
+                    self.busy = False
+                yield msg
+                if not self.busy:
+                    return
+        finally:
+            timer.cancel()
+
+
+class WorkerPool:
+    """A fixed-size pool of JsonLinesWorkers. Requests queue for a free worker."""
+
+    error_class = WorkerError
+    # seconds to allow for a request
+    timeout = 60 * 10
+    # seconds to wait for a free worker before giving up
+    queue_timeout = 60 * 10
+
+    def __init__(self, size, cmd):
+        self.workers = [
+            JsonLinesWorker(cmd, self.timeout, self.error_class) for _ in range(size)
+        ]
+        self.free = queue.Queue()
+        for worker in self.workers:
+            self.free.put(worker)
+
+    def iter_messages(self, request):
+        """Yield the response messages for a request, using the next free worker."""
+        try:
+            worker = self.free.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise self.error_class(
+                f"timed out waiting {self.queue_timeout}s for a free worker"
+            )
+
+        try:
+            yield from worker.iter_messages(request)
+        finally:
+            if worker.busy:
+                # the worker may still be writing output for this request, so it can't be reused
+                worker.stop()
+            self.free.put(worker)
+
+    def request(self, request):
+        """Make a request and return its final message."""
+        msg = None
+        for msg in self.iter_messages(request):
+            pass
+        return msg
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.stop()
@@ -1,7 +1,7 @@
-from typing import List
+from typing import List, Tuple
 
 import lxml.html
-from lxml.etree import ParserError
+from lxml.etree import ParserError, iterwalk
 
 html_parser = lxml.html.HTMLParser(encoding="utf-8")
 
@@ -137,3 +137,58 @@ def get_following_text(
         text = text[:max_chars]
 
     return text
+
+
+def get_surrounding_texts(
+    root: lxml.html.HtmlElement,
+    nodes: List[lxml.html.HtmlElement],
+    not_above: List[str],
+    max_chars: int = None,
+) -> List[Tuple[str, str]]:
+    """Get the (preceding, following) text for each of the given nodes, in a single traversal of the tree.
+
+    This is equivalent to calling get_preceding_text and get_following_text for each node, but is much cheaper when
+    there are many nodes, because the tree is only walked once. The text of the tree is built up while recording the
+    offsets of each node and of the nearest enclosing element named in not_above, and the context is then sliced out
+    of the full text.
+    """
+    wanted = {node: i for i, node in enumerate(nodes)}
+    starts = [0] * len(nodes)
+    ends = [0] * len(nodes)
+    bounds = [None] * len(nodes)
+    # stack of [start offset, end offset] of the enclosing not_above elements, the outermost being the whole tree
+    blocks = [[0, None]]
+    parts = []
+    offset = 0
+
+    for event, el in iterwalk(root, events=("start", "end")):
+        is_element = isinstance(el.tag, str)
+        if event == "start":
+            if el in wanted:
+                i = wanted[el]
+                starts[i] = offset
+                bounds[i] = blocks[-1]
+            if is_element and el.tag in not_above:
+                blocks.append([offset, None])
+            if is_element and el.text:
+                parts.append(el.text)
+                offset += len(el.text)
+        else:
+            if el in wanted:
+                ends[wanted[el]] = offset
+            if is_element and el.tag in not_above:
+                blocks.pop()[1] = offset
+            if el is not root and el.tail:
+                parts.append(el.tail)
+                offset += len(el.tail)
+
+    blocks[0][1] = offset
+    text = "".join(parts)
+
+    result = []
+    for start, end, (block_start, block_end) in zip(starts, ends, bounds):
+        if max_chars is not None:
+            block_start = max(block_start, start - max_chars)
+            block_end = min(block_end, end + max_chars)
+        result.append((text[block_start:start], text[end:block_end]))
+    return result
@@ -12,6 +12,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from peachjam.models import Gazette, Judgment, Ratification
+from peachjam.streaming import streaming_file_response
 from peachjam_api.serializers import (
     BatchValidateFrbrUrisRequestSerializer,
     BatchValidateFrbrUrisResponseSerializer,
@@ -109,7 +110,10 @@ class BaseDocumentViewSet(viewsets.ReadOnlyModelViewSet):
             raise Http404()
 
         return self.make_response(
-            source_file.file, source_file.mimetype, source_file.filename_for_download()
+            source_file.file,
+            source_file.mimetype,
+            source_file.filename_for_download(),
+            etag=source_file.etag_for(source_file.file),
         )
 
     @extend_schema(responses={(200, "application/octet-stream"): OpenApiTypes.BINARY})
@@ -125,15 +129,16 @@ class BaseDocumentViewSet(viewsets.ReadOnlyModelViewSet):
             raise Http404()
 
         return self.make_response(
-            source_file.file, source_file.mimetype, source_file.filename_for_download()
+            source_file.file,
+            source_file.mimetype,
+            source_file.filename_for_download(),
+            etag=source_file.etag_for(source_file.file),
         )
 
-    def make_response(self, f, content_type, fname):
-        file_bytes = f.read()
-        response = HttpResponse(file_bytes, content_type=content_type)
-        response["Content-Disposition"] = f"inline; filename={fname}"
-        response["Content-Length"] = str(len(file_bytes))
-        return response
+    def make_response(self, f, content_type, fname, etag=None):
+        return streaming_file_response(
+            self.request, f, content_type, fname, "inline", etag=etag
+        )
 
 
 class GazettesViewSet(BaseDocumentViewSet):
@@ -0,0 +1,93 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+
+from peachjam_search.engine import SearchEngine
+from peachjam_search.models import SavedSearch
+
+log = logging.getLogger(__name__)
+
+
+class SavedSearchEvaluator:
+    """Finds new hits for saved search follows.
+
+    Follows of identical saved searches are grouped so that each distinct search is executed only once per run,
+    restricted in Elasticsearch to documents created since the oldest watermark (last_alerted_at) in the group.
+    Each follow then only keeps the hits created after its own watermark. If the group's page of hits was full, older
+    hits may have pushed a follow's new hits off the page, so a follow with a newer watermark that doesn't keep
+    enough hits runs its own search instead.
+
+    Searches are built and hits are hydrated in the calling thread, only the Elasticsearch requests are run
+    concurrently.
+    """
+
+    max_workers = 4
+    # more than the 10 hits that are alerted on, because a group's hits are shared between follows with
+    # different watermarks
+    page_size = 50
+    # the number of hits that a follow is alerted on
+    alert_size = 10
+
+    def update_follows(self, follows):
+        groups = {}
+        for follow in follows:
+            key = (follow.saved_search.get_search_key(), follow.cutoff_date)
+            groups.setdefault(key, []).append(follow)
+
+        log.info(
+            f"Evaluating {len(groups)} distinct saved searches for {sum(len(g) for g in groups.values())} follows"
+        )
+        engines = [self.make_engine(group) for group in groups.values()]
+        responses = self.execute(engines)
+
+        for group, engine, es_response in zip(groups.values(), engines, responses):
+            if es_response is None:
+                continue
+            hits = SavedSearch.hydrate_hits(engine, es_response)
+            full_page = len(es_response.hits) >= self.page_size
+            watermark = self.get_watermark(group)
+            for follow in group:
+                follow_hits = hits
+                if (
+                    full_page
+                    and follow.last_alerted_at != watermark
+                    and len(follow.filter_new_search_hits(hits)) < self.alert_size
+                ):
+                    log.info(
+                        f"Shared hits for saved search {follow.saved_search.pk} may be incomplete for follow "
+                        f"{follow.pk}, searching again"
+                    )
+                    follow_hits = None
+                with transaction.atomic():
+                    follow._update_search(follow_hits)
+
+    def get_watermark(self, group):
+        # the oldest watermark in the group, so that all follows see all their new documents
+        watermarks = [f.last_alerted_at for f in group]
+        return None if None in watermarks else min(watermarks)
+
+    def make_engine(self, group):
+        query = group[0].saved_search.build_search_query(
+            created_after=self.get_watermark(group),
+            date_after=group[0].cutoff_date,
+            page_size=self.page_size,
+        )
+        engine = SearchEngine(query)
+        engine.build_search()
+        return engine
+
+    def execute(self, engines):
+        """Execute the engines' searches concurrently, returning a response (or None on failure) for each."""
+
+        def run(engine):
+            try:
+                return engine.execute_search()
+            except Exception as e:
+                log.error(
+                    f"Error executing saved search {engine.search_query}", exc_info=e
+                )
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(run, engines))
@@ -1,7 +1,9 @@
 import logging
 import re
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from enum import Enum
+from threading import Lock
 from typing import Optional
 
 log = logging.getLogger(__name__)
@@ -152,3 +154,82 @@ class QueryClassifier:
             if confidence >= self.CONFIDENCE_THRESHOLD:
                 qclass.label = QueryLabel(label)
                 qclass.confidence = confidence
+
+
+class CachingQueryClassifier(QueryClassifier):
+    """A query classifier that remembers classifications of cleaned queries in a bounded LRU cache.
+
+    Popular queries are classified once per process, and cache misses are classified together in batches so that
+    the ML model is called once per batch rather than once per query.
+    """
+
+    CACHE_SIZE = 10000
+    BATCH_SIZE = 1000
+
+    def __init__(self, ml_classifier=None, cache_size=None, batch_size=None):
+        super().__init__(ml_classifier=ml_classifier)
+        self.cache_size = cache_size or self.CACHE_SIZE
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.cache = OrderedDict()
+        self.cache_lock = Lock()
+
+    def warm_up(self):
+        """Load the ML model now, rather than when the first query is classified."""
+        if self.ml_classifier is None:
+            try:
+                from .ml_classifier import get_ml_classifier
+
+                self.ml_classifier = get_ml_classifier()
+            except (ImportError, FileNotFoundError) as e:
+                log.warning(
+                    "ML classifier not available, skipping warm-up.", exc_info=e
+                )
+
+    def classify_queries(self, queries: list[str]) -> list[QueryClass]:
+        """Classify queries, using cached classifications where possible and batching the rest."""
+        qclasses = [self.clean_query(query) for query in queries]
+
+        misses = {}
+        with self.cache_lock:
+            for i, qclass in enumerate(qclasses):
+                cached = self.cache.get(qclass.query_clean)
+                if cached is None:
+                    misses.setdefault(qclass.query_clean, []).append(i)
+                else:
+                    self.cache.move_to_end(qclass.query_clean)
+                    qclasses[i] = replace(cached, query=qclass.query)
+
+        # classify each distinct miss only once
+        keys = list(misses.keys())
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start : start + self.batch_size]
+            classified = super().classify_queries(batch)
+
+            with self.cache_lock:
+                for key, qclass in zip(batch, classified):
+                    self.cache[key] = qclass
+                    self.cache.move_to_end(key)
+                    for i in misses[key]:
+                        qclasses[i] = replace(qclass, query=qclasses[i].query)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        return qclasses
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
+
+
+_query_classifier = None
+_query_classifier_lock = Lock()
+
+
+def get_query_classifier() -> CachingQueryClassifier:
+    """Get the process-wide caching query classifier."""
+    global _query_classifier
+    if _query_classifier is None:
+        with _query_classifier_lock:
+            if _query_classifier is None:
+                _query_classifier = CachingQueryClassifier()
+    return _query_classifier
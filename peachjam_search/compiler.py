@@ -2,7 +2,7 @@
 
 import logging
 from copy import deepcopy
-from typing import Any
+from typing import Any, Iterator
 
 from django.conf import settings
 from elasticsearch_dsl import Search, TermsFacet
@@ -137,6 +137,8 @@ class ElasticsearchSearchCompiler:
 
     search_query: SearchQuery | None = None
     plan: SearchPlan | None = None
+    # query embeddings that were fetched before compilation, keyed by query
+    prefetched_embeddings: dict[str, list[float]] | None = None
 
     def __init__(self) -> None:
         self.client = connections.get_connection(self.document._get_using())
@@ -207,6 +209,13 @@ class ElasticsearchSearchCompiler:
     def create_search(self) -> "RetrieverSearch":
         return RetrieverSearch(using=self.client, index=self.index)
 
+    def build_response_search(self, search_query: SearchQuery) -> "RetrieverSearch":
+        """A search with what is needed to wrap a cached response in the same way as the response of an executed
+        search (the aggregations), without compiling the query, which may need an embedding.
+        """
+        self.search_query = search_query
+        return self.add_aggs(self.create_search())
+
     def add_source(self, search: "RetrieverSearch") -> "RetrieverSearch":
         return search.source(self.search_query.source)
 
@@ -704,9 +713,7 @@ class ElasticsearchSearchCompiler:
                             "k": semantic_retrieval.k,
                             "num_candidates": semantic_retrieval.num_candidates,
                             "similarity": semantic_retrieval.similarity,
-                            "query_vector": self.get_query_embedding(
-                                self.search_query.query
-                            ),
+                            "query_vector": self.embed_query(self.search_query.query),
                         }
                     },
                 }
@@ -725,6 +732,12 @@ class ElasticsearchSearchCompiler:
 
         return knn
 
+    def embed_query(self, query: str | None) -> list[float]:
+        """Use the prefetched embedding for the query, if there is one."""
+        if self.prefetched_embeddings and query in self.prefetched_embeddings:
+            return self.prefetched_embeddings[query]
+        return self.get_query_embedding(query)
+
     def get_query_embedding(self, query: str | None) -> list[float]:
         from peachjam_ml.embeddings import get_query_embedding
 
@@ -769,6 +782,44 @@ class ElasticsearchSearchCompiler:
                 raise Exception(f"ES query failed: {response._shards.failures}")
         return response
 
+    def scan(
+        self, search: "RetrieverSearch", page_size: int = 1000, keep_alive: str = "2m"
+    ) -> Iterator[Any]:
+        """Yield every hit of a compiled search, one page at a time.
+
+        This uses a point in time and search_after, so that deep result sets can be walked without the
+        max_result_window limit, and with a consistent view of the index. Retriever (RRF) searches can't be paged
+        this way and must be executed directly.
+        """
+        pit_id = self.client.open_point_in_time(
+            index=self.index, keep_alive=keep_alive
+        )["id"]
+        # the PIT determines the indexes to search; PIT searches implicitly sort on _shard_doc as a tie-breaker
+        search = search.index().extra(track_total_hits=False)[:page_size]
+        search_after = None
+
+        try:
+            while True:
+                page = search.extra(pit={"id": pit_id, "keep_alive": keep_alive})
+                if search_after:
+                    page = page.extra(search_after=search_after)
+
+                response = page.execute()
+                if response._shards.failed:
+                    log.error(f"ES query failed: {response._shards.failures}")
+                    if settings.ELASTICSEARCH_FAIL_ON_SHARD_FAILURE:
+                        raise Exception(f"ES query failed: {response._shards.failures}")
+
+                hits = list(response.hits)
+                yield from hits
+
+                if len(hits) < page_size:
+                    break
+                pit_id = getattr(response, "pit_id", None) or pit_id
+                search_after = list(hits[-1].meta.sort)
+        finally:
+            self.client.close_point_in_time(id=pit_id)
+
     def get_debug_inputs(self) -> dict[str, Any]:
         return {
             "query": self.search_query.query,
@@ -8,6 +8,7 @@ from django_elasticsearch_dsl.registries import registry
 from elasticsearch_dsl import MetaField, RankFeature, token_filter
 from elasticsearch_dsl.analysis import CustomAnalyzer
 
+from peachjam.languages import language_registry
 from peachjam.models import (
     Attorney,
     Author,
@@ -54,7 +55,7 @@ class SearchableDocument(Document):
     citation = fields.TextField()
     mnc = fields.TextField()
     content = fields.TextField()
-    language = fields.KeywordField(attr="language.name_native")
+    language = fields.KeywordField()
     jurisdiction = fields.KeywordField(attr="jurisdiction.name")
     locality = fields.KeywordField(attr="locality.name")
     locality_en = fields.KeywordField()
@@ -82,7 +83,7 @@ class SearchableDocument(Document):
     # TODO: this should be a date-like field
     # frbr_uri_date = fields.KeywordField(attr="work.frbr_uri_date")
     # frbr_uri_number = fields.KeywordField(attr="work.frbr_uri_number")
-    frbr_uri_language = fields.KeywordField(attr="language.iso_639_3")
+    frbr_uri_language = fields.KeywordField()
 
     # legislation
     principal = fields.BooleanField()
@@ -282,6 +283,63 @@ class SearchableDocument(Document):
             ]
             return CoreDocument.objects.filter(taxonomies__topic__in=topics).distinct()
 
+    def get_instance_language(self, instance):
+        # use the language registry rather than querying for each document
+        return language_registry.get(instance.language_id) or instance.language
+
+    def prepare_language(self, instance):
+        return self.get_instance_language(instance).name_native
+
+    def prepare_frbr_uri_language(self, instance):
+        return self.get_instance_language(instance).iso_639_3
+
+    def get_fields_from_related(self, related_instance):
+        """The names of the fields that are derived from the related instance, so that only those fields need to be
+        updated for the documents from get_instances_from_related when it changes. Returns None if the documents
+        must be fully re-indexed.
+        """
+        fields = None
+        if isinstance(related_instance, Court):
+            fields = ["court"]
+        elif isinstance(related_instance, CourtRegistry):
+            fields = ["registry"]
+        elif isinstance(related_instance, CourtDivision):
+            fields = ["division"]
+        elif isinstance(related_instance, CaseAction):
+            fields = ["case_action"]
+        elif isinstance(related_instance, Outcome):
+            fields = ["outcome"] + [
+                f"outcome_{lang}" for lang in TRANSLATED_FIELD_LANGS
+            ]
+        elif isinstance(related_instance, Judge):
+            fields = ["judges", "judges_text"]
+        elif isinstance(related_instance, Attorney):
+            fields = ["attorneys"]
+        elif isinstance(related_instance, Author):
+            fields = ["authors"]
+        elif isinstance(related_instance, DocumentNature):
+            fields = ["nature"]
+        elif isinstance(related_instance, Locality):
+            fields = ["locality"]
+        elif isinstance(related_instance, Taxonomy):
+            fields = ["taxonomies"]
+
+        if fields:
+            # include translated variants
+            translated = {field for field, attr in self.translated_fields}
+            fields += [
+                f"{field}_{lang}"
+                for field in fields
+                if field in translated
+                for lang in TRANSLATED_FIELD_LANGS
+            ]
+        return fields
+
+    def prepare_fields(self, instance, names):
+        """Prepare only the named fields for an instance, for a partial update."""
+        preparers = {name: fn for name, field, fn in self._prepared_fields}
+        return {name: preparers[name](instance) for name in names}
+
     def prepare_frbr_uri_locality(self, instance):
         return instance.work.frbr_uri_locality or ""
 
@@ -338,8 +396,13 @@ class SearchableDocument(Document):
             return text
 
     def prepare_ranking(self, instance):
-        if instance.work.pagerank > 0:
-            return instance.work.pagerank
+        return self.ranking_for_pagerank(instance.work.pagerank)
+
+    @staticmethod
+    def ranking_for_pagerank(pagerank):
+        # rank features must be positive
+        if pagerank > 0:
+            return pagerank
         return 0.00000001
 
     def prepare_court(self, instance):
@@ -518,7 +581,7 @@ class SearchableDocument(Document):
         info[
             "_index"
         ] = MultiLanguageIndexManager.get_instance().get_index_for_language(
-            object_instance.language.iso_639_2T
+            object_instance.language_id
         )
         return info
 
@@ -716,6 +779,8 @@ class MultiLanguageIndexManager:
         ]
 
     def get_index_for_language(self, lang):
+        """The index for documents in a language, given its ISO 639-1, 639-2T or 639-3 code."""
+        lang = language_registry.iso_639_3(lang) or lang
         if lang in self.ANALYZERS:
             return f"{self.main_index._name}_{lang}"
         return self.main_index._name
@@ -1,10 +1,17 @@
 import logging
-from typing import Any, Iterable, List, Literal, Optional, Self
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from threading import Lock
+from typing import Any, Callable, Iterable, Iterator, List, Literal, Optional, Self
 
 from django.conf import settings
+from elasticsearch_dsl.response import Response
 from pydantic import BaseModel
 
 from peachjam_search.compiler import ElasticsearchSearchCompiler, RetrieverSearch
+from peachjam_search.result_cache import SearchResultCache
 from peachjam_search.search_pipeline import (
     FilterClause,
     QueryAnalyser,
@@ -18,6 +25,39 @@ from peachjam_search.search_pipeline import (
 log = logging.getLogger(__name__)
 
 
+_executor = None
+_request_executor = None
+_executor_lock = Lock()
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """A process-wide thread pool for running the independent, I/O-bound stages of a search concurrently."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=16, thread_name_prefix="search"
+                )
+    return _executor
+
+
+def get_search_request_executor() -> ThreadPoolExecutor:
+    """A process-wide thread pool for Elasticsearch search requests.
+
+    This is separate from get_search_executor(), because a request may wait for an identical search in another
+    thread or process (see SearchResultCache), and waiting requests must not hold up query embeddings.
+    """
+    global _request_executor
+    if _request_executor is None:
+        with _executor_lock:
+            if _request_executor is None:
+                _request_executor = ThreadPoolExecutor(
+                    max_workers=32, thread_name_prefix="search-request"
+                )
+    return _request_executor
+
+
 class SearchEngine:
     """One-shot document-search orchestration.
 
@@ -31,6 +71,7 @@ class SearchEngine:
         analyser: QueryAnalyser | None = None,
         planner: SearchPlanner | None = None,
         compiler: ElasticsearchSearchCompiler | None = None,
+        result_cache: SearchResultCache | None = None,
     ) -> None:
         # ``None`` is retained only for utility callers such as suggestions.
         # Document searches should always be constructed with a SearchQuery.
@@ -48,9 +89,18 @@ class SearchEngine:
         self.analyser = analyser or QueryAnalyser()
         self.planner = planner or SearchPlanner()
         self.compiler = compiler or ElasticsearchSearchCompiler()
+        # optional cache of Elasticsearch responses, used by execute()
+        self.result_cache = result_cache
         self.analysis: QueryAnalysis | None = None
         self.plan: SearchPlan | None = None
         self.compiled_search: RetrieverSearch | None = None
+        # per-stage timings, in milliseconds
+        self.timings: dict[str, Any] = {}
+        # a query embedding being fetched in the background, and when to stop waiting for it
+        self.embedding_future = None
+        self.embedding_deadline: float | None = None
+        # was a semantic search downgraded to text because the embedding wasn't available in time?
+        self.lexical_fallback = False
 
     def set_search_query(self, search_query: SearchQuery) -> Self:
         """Replace the caller input and discard derived pipeline state."""
@@ -63,9 +113,121 @@ class SearchEngine:
     def execute(self) -> Any:
         """The main entry-point for running the search in search_query. This analysis the search, builds a search
         plan, compiles it to an Elasticsearch query, and executes it."""
+        if self.result_cache and not self.search_query.explain:
+            return self.execute_cached()
         self.build_search()
         return self.execute_search()
 
+    def execute_concurrently(self, side_task: Callable[[], Any]) -> tuple[Any, Any]:
+        """Execute the search while overlapping its independent stages, and side_task, which runs in the calling
+        thread while the Elasticsearch request is in flight. Returns (es_response, side_task result).
+
+        For semantic and hybrid searches, the query embedding is fetched while the query is analysed and planned. If
+        the embedding isn't ready within the SEARCH_EMBEDDING_BUDGET, the search falls back to a text-only search.
+
+        If the results are cached, the cached response is used without fetching an embedding, and side_task simply
+        runs in the calling thread.
+        """
+        if self.result_cache and not self.search_query.explain:
+            data = self.result_cache.get(self.search_query)
+            if data is not None:
+                self.analyse()
+                self.build_plan()
+                return self.cached_response(data), side_task()
+
+        self.prefetch_embedding(get_search_executor())
+        self.analyse()
+        self.build_plan()
+
+        es_future = get_search_request_executor().submit(self.execute)
+        side_result = side_task()
+        return es_future.result(), side_result
+
+    def prefetch_embedding(self, executor: ThreadPoolExecutor) -> None:
+        if (
+            self.search_query.mode == "text"
+            or not self.search_query.query
+            or self.search_query.is_advanced
+        ):
+            return
+
+        def fetch(query):
+            with self.timed("embedding"):
+                return self.compiler.get_query_embedding(query)
+
+        self.embedding_deadline = (
+            time.monotonic() + settings.PEACHJAM["SEARCH_EMBEDDING_BUDGET"]
+        )
+        self.embedding_future = executor.submit(fetch, self.search_query.query)
+
+    def resolve_embedding(self) -> None:
+        """Wait for a prefetched embedding, within the budget, and hand it to the compiler. Falls back to a text
+        search if it isn't available in time."""
+        future, self.embedding_future = self.embedding_future, None
+        if future is None or self.plan.semantic_retrieval is None:
+            return
+
+        try:
+            with self.timed("embedding_wait"):
+                embedding = future.result(
+                    timeout=max(0.0, self.embedding_deadline - time.monotonic())
+                )
+        except Exception as e:
+            log.warning(
+                "Query embedding not available in time, falling back to text search",
+                exc_info=e,
+            )
+            self.fall_back_to_lexical()
+            return
+
+        self.compiler.prefetched_embeddings = {self.search_query.query: embedding}
+
+    def fall_back_to_lexical(self) -> None:
+        analysis = self.analysis
+        self.set_search_query(replace(self.search_query, mode="text"))
+        # the analysis doesn't depend on the mode
+        self.analysis = analysis
+        self.lexical_fallback = True
+        self.timings["lexical_fallback"] = True
+        self.build_plan()
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0) + round(
+                (time.monotonic() - start) * 1000, 2
+            )
+
+    def execute_cached(self) -> Any:
+        """Execute the search using the result cache. The query is still analysed and planned, because callers use
+        the analysis and plan, but it is only compiled (which may require an embedding) on a cache miss.
+        """
+        self.analyse()
+        self.build_plan()
+
+        def execute():
+            self.compile()
+            return self.execute_search()
+
+        data = self.result_cache.get_or_execute(
+            self.search_query,
+            execute,
+            # don't cache degraded results
+            cacheable=lambda: not self.lexical_fallback,
+        )
+        return self.cached_response(data)
+
+    def cached_response(self, data: dict) -> Response:
+        """Wrap cached response data in the same way as the response of an executed search."""
+        return Response(
+            self.compiled_search
+            or self.compiler.build_response_search(self.search_query),
+            data,
+        )
+
     def build_search(self) -> "RetrieverSearch":
         """Analyse, plan and compile the search query into an Elasticsearch query."""
         self.analyse()
@@ -74,28 +236,45 @@ class SearchEngine:
 
     def analyse(self) -> QueryAnalysis:
         if self.analysis is None:
-            self.analysis = self.analyser.analyse(self.search_query)
+            with self.timed("analyse"):
+                self.analysis = self.analyser.analyse(self.search_query)
         return self.analysis
 
     def build_plan(self) -> SearchPlan:
         if self.plan is None:
-            self.plan = self.planner.build(self.search_query, self.analyse())
+            analysis = self.analyse()
+            with self.timed("plan"):
+                self.plan = self.planner.build(self.search_query, analysis)
         return self.plan
 
     def compile(self) -> "RetrieverSearch":
         if self.plan is None:
             self.build_plan()
-        self.compiled_search = self.compiler.compile(self.search_query, self.plan)
+        self.resolve_embedding()
+        with self.timed("compile"):
+            self.compiled_search = self.compiler.compile(self.search_query, self.plan)
         return self.compiled_search
 
     def execute_search(self) -> Any:
-        response = self.compiled_search.execute()
+        with self.timed("execute"):
+            response = self.compiled_search.execute()
         if response._shards.failed:
             log.error(f"ES query failed: {response._shards.failures}")
             if settings.ELASTICSEARCH_FAIL_ON_SHARD_FAILURE:
                 raise Exception(f"ES query failed: {response._shards.failures}")
         return response
 
+    def scan(self) -> Iterator[Any]:
+        """Yield every hit for the search query, fetching page_size hits at a time.
+
+        Retriever (RRF) searches can't be paged past their rank window, so only their first page is returned.
+        """
+        search = self.build_search()
+        if search.retriever:
+            yield from self.execute_search().hits
+        else:
+            yield from self.compiler.scan(search, page_size=self.search_query.page_size)
+
     def suggest(self, query: str) -> Any:
         return self.compiler.suggest(query)
 
@@ -0,0 +1,182 @@
+"""Applies queued updates (see PendingSearchUpdate) to documents in the search index.
+
+Documents that need to be fully re-indexed are re-indexed together in bulk. For the others, only the fields that have
+changed are sent to Elasticsearch, as partial document updates in sized bulk requests. Some fields are calculated in
+bulk from the database; the rest are prepared from each document, without preparing the expensive fields such as the
+document's content.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from elasticsearch import helpers
+
+from peachjam.models import CoreDocument, DocumentTopic, ExternalDocument, Taxonomy
+from peachjam_search.documents import MultiLanguageIndexManager, SearchableDocument
+from peachjam_search.models import PendingSearchUpdate
+
+log = logging.getLogger(__name__)
+
+
+class IndexUpdater:
+    # number of pending updates to apply in a batch
+    batch_size = 5000
+    # number of documents per Elasticsearch bulk request
+    chunk_size = 500
+    request_timeout = 60 * 5
+    # fields that are calculated in bulk from the database
+    bulk_fields = {"ranking", "labels", "taxonomies"}
+
+    def apply_pending(self):
+        """Apply all pending updates, in batches. Returns the number of documents updated."""
+        total = 0
+        while True:
+            with transaction.atomic():
+                # claim a batch of updates; if updating the index fails, they are rolled back and retried later
+                pending = list(
+                    PendingSearchUpdate.objects.select_for_update(skip_locked=True)
+                    .order_by("pk")
+                    .values_list("pk", "document_id", "field")[: self.batch_size]
+                )
+                if not pending:
+                    break
+                PendingSearchUpdate.objects.filter(
+                    pk__in=[pk for pk, _, _ in pending]
+                ).delete()
+
+                fields = defaultdict(set)
+                for _, document_id, field in pending:
+                    fields[document_id].add(field)
+                total += self.update_documents(fields)
+        return total
+
+    def update_documents(self, fields):
+        """Update the search index for each document, given a dict from document id to the set of fields to update.
+        Returns the number of documents updated."""
+        full = {
+            doc_id
+            for doc_id, names in fields.items()
+            if PendingSearchUpdate.FULL in names
+        }
+        count = self.reindex_documents(full) if full else 0
+
+        partial = {
+            doc_id: names for doc_id, names in fields.items() if doc_id not in full
+        }
+        if partial:
+            count += self.partially_update_documents(partial)
+        return count
+
+    def reindex_documents(self, doc_ids):
+        """Fully re-index documents."""
+        success, errors = SearchableDocument().update(
+            CoreDocument.objects.filter(pk__in=doc_ids).iterator(
+                chunk_size=self.chunk_size
+            ),
+            chunk_size=self.chunk_size,
+            request_timeout=self.request_timeout,
+            # don't let one bad document stop the others from being re-indexed
+            raise_on_error=False,
+        )
+        for error in errors:
+            log.warning(f"Error re-indexing document: {error}")
+        log.info(f"Re-indexed {success} documents, with {len(errors)} errors")
+        return success
+
+    def partially_update_documents(self, fields):
+        """Update only the given fields of documents, given a dict from document id to the set of fields."""
+        docs = list(
+            CoreDocument.objects.filter(pk__in=fields.keys(), published=True)
+            .not_instance_of(ExternalDocument)
+            .values("id", "language_id", "work__pagerank")
+        )
+        if not docs:
+            return 0
+
+        # calculate new values in bulk, only for the fields that are needed
+        doc_ids = [d["id"] for d in docs]
+        needed = set().union(*fields.values())
+        labels = self.get_labels(doc_ids) if "labels" in needed else {}
+        taxonomies = self.get_taxonomies(doc_ids) if "taxonomies" in needed else {}
+
+        # other fields are prepared from the documents themselves
+        sd = SearchableDocument()
+        prepared = {
+            doc_id: names - self.bulk_fields
+            for doc_id, names in fields.items()
+            if names - self.bulk_fields
+        }
+        instances = (
+            {d.pk: d for d in CoreDocument.objects.filter(pk__in=prepared.keys())}
+            if prepared
+            else {}
+        )
+
+        index_manager = MultiLanguageIndexManager.get_instance()
+
+        def actions():
+            for doc in docs:
+                doc_id = doc["id"]
+                values = {}
+                for field in fields[doc_id]:
+                    if field == "ranking":
+                        values[field] = SearchableDocument.ranking_for_pagerank(
+                            doc["work__pagerank"]
+                        )
+                    elif field == "labels":
+                        values[field] = labels.get(doc_id, [])
+                    elif field == "taxonomies":
+                        values[field] = taxonomies.get(doc_id, [])
+                if doc_id in prepared and doc_id in instances:
+                    values.update(
+                        sd.prepare_fields(instances[doc_id], prepared[doc_id])
+                    )
+                yield {
+                    "_op_type": "update",
+                    "_index": index_manager.get_index_for_language(doc["language_id"]),
+                    "_id": doc_id,
+                    "doc": values,
+                }
+
+        success, errors = helpers.bulk(
+            SearchableDocument._index._get_connection(),
+            actions(),
+            chunk_size=self.chunk_size,
+            request_timeout=self.request_timeout,
+            # documents that aren't in the index yet will be indexed in full when they are
+            raise_on_error=False,
+        )
+        log.info(
+            f"Applied partial search updates to {success} documents, with {len(errors)} errors"
+        )
+        return success
+
+    def get_labels(self, doc_ids):
+        labels = defaultdict(list)
+        for doc_id, code in CoreDocument.labels.through.objects.filter(
+            coredocument_id__in=doc_ids
+        ).values_list("coredocument_id", "label__code"):
+            labels[doc_id].append(code)
+        return labels
+
+    def get_taxonomies(self, doc_ids):
+        """The slugs of each document's topics and all their ancestors. See SearchableDocument.prepare_taxonomies."""
+        doc_paths = defaultdict(set)
+        for doc_id, path in DocumentTopic.objects.filter(
+            document_id__in=doc_ids
+        ).values_list("document_id", "topic__path"):
+            # the paths of the ancestors of a node are prefixes of its path
+            doc_paths[doc_id].update(
+                path[:i]
+                for i in range(Taxonomy.steplen, len(path) + 1, Taxonomy.steplen)
+            )
+
+        all_paths = set().union(*doc_paths.values()) if doc_paths else set()
+        slugs = dict(
+            Taxonomy.objects.filter(path__in=all_paths).values_list("path", "slug")
+        )
+        return {
+            doc_id: sorted({slugs[p] for p in paths if p in slugs})
+            for doc_id, paths in doc_paths.items()
+        }
@@ -1,6 +1,9 @@
+import time
+
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 
-from peachjam_search.classifier import QueryClassifier
+from peachjam_search.classifier import CachingQueryClassifier
 from peachjam_search.models import SearchTrace
 
 
@@ -17,34 +20,68 @@ class Command(BaseCommand):
             default=1000,
             help="Maximum number of SearchTrace objects to process (default: 1000).",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of SearchTrace objects to classify and update at a time (default: 1000).",
+        )
 
     def handle(self, *args, **options):
         limit = options["limit"]
         if limit is not None and limit <= 0:
             self.stdout.write("Limit is zero or negative, nothing to do.")
             return
+        batch_size = max(options["batch_size"], 1)
 
-        qs = (
-            SearchTrace.objects.filter(query_clean__isnull=True)
-            .order_by("-created_at")
-            .only("pk", "search")
-        )
-        if limit is not None:
-            qs = qs[:limit]
-
-        classifier = QueryClassifier()
+        classifier = CachingQueryClassifier(batch_size=batch_size)
+        classifier.warm_up()
         processed = 0
+        last = None
+        start = time.monotonic()
+
+        # walk the traces newest first, continuing each batch from the last trace of the previous one
+        while limit is None or processed < limit:
+            qs = SearchTrace.objects.filter(query_clean__isnull=True).order_by(
+                "-created_at", "-pk"
+            )
+            if last is not None:
+                qs = qs.filter(
+                    Q(created_at__lt=last.created_at)
+                    | Q(created_at=last.created_at, pk__lt=last.pk)
+                )
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            traces = list(qs.only("pk", "search", "created_at")[:size])
+            if not traces:
+                break
+
+            qclasses = classifier.classify_queries([t.search or "" for t in traces])
+            for trace, qclass in zip(traces, qclasses):
+                trace.query_clean = qclass.query_clean
+                trace.query_clean_n_words = qclass.n_words
+                trace.query_clean_n_chars = qclass.n_chars
+                trace.query_classification = (
+                    qclass.label.value if qclass.label else None
+                )
+                trace.query_classification_confidence = qclass.confidence
+
+            SearchTrace.objects.bulk_update(
+                traces,
+                [
+                    "query_clean",
+                    "query_clean_n_words",
+                    "query_clean_n_chars",
+                    "query_classification",
+                    "query_classification_confidence",
+                ],
+            )
+            processed += len(traces)
+            last = traces[-1]
 
-        for trace in qs:
-            qclass = classifier.classify(trace.search or "")
-            SearchTrace.objects.filter(pk=trace.pk).update(
-                query_clean=qclass.query_clean,
-                query_clean_n_words=qclass.n_words,
-                query_clean_n_chars=qclass.n_chars,
-                query_classification=(qclass.label.value if qclass.label else None),
-                query_classification_confidence=qclass.confidence,
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f"Processed {processed} search trace(s) ({processed / elapsed:.0f}/s)"
             )
-            processed += 1
 
         self.stdout.write(
             self.style.SUCCESS(f"Backfilled {processed} search trace(s).")
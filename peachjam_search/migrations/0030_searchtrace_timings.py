@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("peachjam_search", "0029_searchtrace_kind"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="searchtrace",
+            name="timings",
+            field=models.JSONField(null=True),
+        ),
+    ]
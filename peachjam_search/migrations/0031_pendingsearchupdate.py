@@ -0,0 +1,33 @@
+# Generated by Django 4.2.29 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("peachjam_search", "0030_searchtrace_timings"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingSearchUpdate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("document_id", models.BigIntegerField()),
+                ("field", models.CharField(max_length=50)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "unique_together": {("document_id", "field")},
+            },
+        ),
+    ]
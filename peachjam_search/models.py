@@ -57,6 +57,8 @@ class SearchTrace(models.Model):
     query_classification_confidence = models.FloatField(null=True)
     query_analysis = models.JSONField(null=True)
     search_profile = models.CharField(max_length=100, null=True)
+    # per-stage timings of the search, in milliseconds
+    timings = models.JSONField(null=True)
 
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
@@ -266,10 +268,16 @@ class SavedSearch(models.Model):
         for field, criteria in fields.items():
             params[f"search__{field}"] = self.generate_advanced_search_query(criteria)
 
-    def find_new_hits(self):
-        from peachjam_search.engine import SearchEngine
+    def get_search_key(self):
+        """A key that is the same for all saved searches that run the same search, so that identical searches
+        (such as those of different users) can be executed once."""
+        return (self.q or "", self.a or "", self.get_sorted_filters_string())
+
+    def build_search_query(self, created_after=None, date_after=None, page_size=20):
+        """Build the search query for this saved search, optionally restricted to documents created after
+        created_after and dated after date_after."""
         from peachjam_search.forms import SearchForm
-        from peachjam_search.serializers import SearchHit
+        from peachjam_search.search_pipeline import FilterClause
 
         params = QueryDict("", mutable=True)
         for key, values in self.get_filters_dict().items():
@@ -286,9 +294,41 @@ class SavedSearch(models.Model):
 
         form = SearchForm(params)
         form.is_valid()
-        query = replace(form.build_search_query(), page_size=20)
-        engine = SearchEngine(query)
-        es_response = engine.execute()
+        query = form.build_search_query()
+
+        hard_filters = []
+        if created_after:
+            hard_filters.append(
+                FilterClause(
+                    field="created_at",
+                    operator="range",
+                    value={"gt": created_after.isoformat()},
+                )
+            )
+        if date_after:
+            hard_filters.append(
+                FilterClause(
+                    field="date",
+                    operator="range",
+                    value={"gt": date_after.isoformat()},
+                )
+            )
+
+        return replace(
+            query,
+            page_size=page_size,
+            hard_filters=query.hard_filters + tuple(hard_filters),
+        )
+
+    def find_new_hits(self, created_after=None, date_after=None):
+        from peachjam_search.engine import SearchEngine
+
+        engine = SearchEngine(self.build_search_query(created_after, date_after))
+        return self.hydrate_hits(engine, engine.execute())
+
+    @classmethod
+    def hydrate_hits(cls, engine, es_response):
+        from peachjam_search.serializers import SearchHit
 
         # unpack the hits
         hits = SearchHit.from_es_hits(engine, es_response.hits)
@@ -319,3 +359,53 @@ class SearchFeedback(models.Model):
 
     def __str__(self):
         return f"{self.created_at}"
+
+
+class PendingSearchUpdate(models.Model):
+    """A queued update of a document in the search index.
+
+    Rather than re-indexing documents as soon as they (or related models) change, updates are queued here and applied
+    in bulk by a background task. Duplicate updates for the same document and field are collapsed.
+
+    Many fields of the search index (such as a document's ranking, labels and court name) are derived from other
+    models and are cheap to calculate. When they change, only those fields need to be updated, rather than
+    re-indexing the whole document. Otherwise, the field is FULL, and the whole document is re-indexed.
+    """
+
+    # the whole document must be re-indexed
+    FULL = "*"
+
+    document_id = models.BigIntegerField()
+    field = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("document_id", "field")
+
+    @classmethod
+    def queue(cls, document_ids, fields):
+        """Queue updates of the given fields (or FULL) of the given documents, and schedule a task to apply them."""
+        updates = [
+            cls(document_id=document_id, field=field)
+            for document_id in set(document_ids)
+            for field in fields
+        ]
+        if updates:
+            cls.objects.bulk_create(updates, ignore_conflicts=True, batch_size=1000)
+            cls.schedule_apply()
+
+    @classmethod
+    def schedule_apply(cls):
+        """Schedule the task that applies pending updates, unless it is already waiting to run.
+
+        The task runs a while after the first update is queued, so that it can apply many updates together. It isn't
+        pushed back by later updates, which would delay it indefinitely while documents are changing continuously.
+        """
+        from background_task.models import Task
+
+        from peachjam_search.tasks import apply_pending_search_updates
+
+        if not Task.objects.filter(
+            task_name=apply_pending_search_updates.name, locked_by=None
+        ).exists():
+            apply_pending_search_updates(schedule=60)
@@ -0,0 +1,188 @@
+"""Caching of Elasticsearch responses for document searches.
+
+Responses are cached against a canonical serialisation of the SearchQuery and the current index generation, which
+is bumped whenever documents are re-indexed or removed. Only the raw Elasticsearch response is cached; documents are
+always hydrated (and permissions applied) per request, and explain requests are never cached.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from dataclasses import replace
+from threading import Event, Lock
+from typing import Any, Callable
+
+from django.core.cache import cache as default_cache
+
+from peachjam_search.search_pipeline import SearchQuery, serialise
+
+log = logging.getLogger(__name__)
+
+
+class InFlight:
+    """A search being executed by one thread, which other threads can wait on."""
+
+    def __init__(self):
+        self.event = Event()
+        self.data = None
+
+
+class SearchResultCache:
+    """Cache Elasticsearch responses for search queries, coalescing concurrent identical searches into a single
+    Elasticsearch request.
+
+    Requests for a page of results with facets also store the facets, so that a following facets-only request for the
+    same query is answered from the cache.
+    """
+
+    key_prefix = "peachjam_search:results"
+    generation_key = "peachjam_search:index_generation"
+    # cache results for a short time, so that changes not tracked by the generation (such as settings) are picked up
+    timeout = 60 * 5
+    # how long to wait for another process or thread that is running the same search
+    lock_timeout = 30
+    wait_interval = 0.05
+
+    inflight = {}
+    inflight_lock = Lock()
+
+    def __init__(self, cache=None):
+        self.cache = cache or default_cache
+
+    @classmethod
+    def get_generation(cls, cache=None) -> int:
+        """The current index generation.
+
+        This is a timestamp rather than a counter. The cache may evict the key, and a new generation is then never
+        one that was used before, so results cached before an earlier bump can't be served again.
+        """
+        cache = cache or default_cache
+        return cache.get_or_set(cls.generation_key, time.time_ns, None)
+
+    @classmethod
+    def bump_generation(cls, cache=None) -> None:
+        """Invalidate all cached results, because the index has changed."""
+        cache = cache or default_cache
+        cache.set(cls.generation_key, time.time_ns(), None)
+
+    def make_key(self, search_query: SearchQuery) -> str:
+        canonical = json.dumps(
+            serialise(search_query), sort_keys=True, separators=(",", ":"), default=str
+        )
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:{self.get_generation(self.cache)}:{digest}"
+
+    def facets_query(self, search_query: SearchQuery) -> SearchQuery:
+        """The facets-only equivalent of a query. Facets don't depend on paging, ordering or what is returned for
+        each hit."""
+        return replace(
+            search_query,
+            page=1,
+            page_size=0,
+            ordering="-score",
+            source=[],
+            highlight={},
+        )
+
+    def is_facets_only(self, search_query: SearchQuery) -> bool:
+        return search_query.page_size == 0 and bool(search_query.facets)
+
+    def get(self, search_query: SearchQuery) -> dict | None:
+        """The cached response data for a query, or None if it isn't cached."""
+        if self.is_facets_only(search_query):
+            search_query = self.facets_query(search_query)
+        return self.cache.get(self.make_key(search_query))
+
+    def get_or_execute(
+        self,
+        search_query: SearchQuery,
+        execute: Callable[[], Any],
+        cacheable: Callable[[], bool] | None = None,
+    ) -> dict:
+        """Return the cached response data for a query, or call execute() to get the response and cache it.
+        If given, cacheable() is called after execute() to decide whether the response may be cached.
+        """
+        if self.is_facets_only(search_query):
+            search_query = self.facets_query(search_query)
+        key = self.make_key(search_query)
+
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        # coalesce concurrent identical searches in this process
+        with self.inflight_lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = InFlight()
+
+        if not leader:
+            flight.event.wait(self.lock_timeout)
+            if flight.data is not None:
+                return flight.data
+            return self.execute(search_query, key, execute, cacheable)
+
+        try:
+            flight.data = self.execute_once(search_query, key, execute, cacheable)
+            return flight.data
+        finally:
+            with self.inflight_lock:
+                self.inflight.pop(key, None)
+            flight.event.set()
+
+    def execute_once(
+        self,
+        search_query: SearchQuery,
+        key: str,
+        execute: Callable[[], Any],
+        cacheable: Callable[[], bool] | None = None,
+    ) -> dict:
+        """Execute the search, unless another process is already doing so, in which case wait for its result."""
+        lock_key = f"{key}:lock"
+        if not self.cache.add(lock_key, 1, self.lock_timeout):
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                data = self.cache.get(key)
+                if data is not None:
+                    return data
+            log.warning(f"Timed out waiting for search results for {key}")
+
+        try:
+            return self.execute(search_query, key, execute, cacheable)
+        finally:
+            self.cache.delete(lock_key)
+
+    def execute(
+        self,
+        search_query: SearchQuery,
+        key: str,
+        execute: Callable[[], Any],
+        cacheable: Callable[[], bool] | None = None,
+    ) -> dict:
+        data = execute().to_dict()
+        if cacheable and not cacheable():
+            return data
+
+        self.cache.set(key, data, self.timeout)
+
+        if search_query.facets and not self.is_facets_only(search_query):
+            # store the facets for a later facets-only request
+            self.cache.set(
+                self.make_key(self.facets_query(search_query)),
+                self.facets_data(data),
+                self.timeout,
+            )
+
+        return data
+
+    def facets_data(self, data: dict) -> dict:
+        facets = {k: v for k, v in data.items() if k != "hits"}
+        facets["hits"] = {
+            "total": data.get("hits", {}).get("total"),
+            "max_score": None,
+            "hits": [],
+        }
+        return facets
@@ -16,7 +16,7 @@ from typing import Any, ClassVar, Literal
 from django.conf import settings
 
 from peachjam.models import pj_settings
-from peachjam_search.classifier import QueryClassifier
+from peachjam_search.classifier import get_query_classifier
 from peachjam_search.profiles import (
     SearchProfile,
     SearchProfileSet,
@@ -29,7 +29,7 @@ class FilterClause:
     """An exact Elasticsearch filter that must apply to every retriever."""
 
     field: str
-    operator: Literal["term", "terms"]
+    operator: Literal["term", "terms", "range"]
     value: Any
 
 
@@ -275,7 +275,7 @@ class QueryAnalyser:
             [], dict[str, frozenset[str]]
         ] = get_profile_compatible_natures,
     ) -> None:
-        self.classifier = classifier or QueryClassifier()
+        self.classifier = classifier or get_query_classifier()
         self.compatible_natures = compatible_natures
 
     def analyse(self, search_query: SearchQuery) -> QueryAnalysis:
@@ -1,7 +1,15 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django_elasticsearch_dsl.apps import DEDConfig
 
-from peachjam.models import CoreDocument, SavedSearch, UserFollowing
+from peachjam.models import (
+    CoreDocument,
+    DocumentTopic,
+    Label,
+    SavedSearch,
+    UserFollowing,
+)
+from peachjam_search.models import PendingSearchUpdate
 
 
 @receiver(post_save)
@@ -25,3 +33,20 @@ def create_user_following(sender, instance, created, **kwargs):
             user=instance.user,
             saved_search=instance,
         )
+
+
+@receiver(post_save, sender=DocumentTopic)
+@receiver(post_delete, sender=DocumentTopic)
+def document_topic_changed(sender, instance, **kwargs):
+    """Update the taxonomies of the document in the search index, without re-indexing the whole document."""
+    if DEDConfig.autosync_enabled() and not kwargs.get("raw"):
+        PendingSearchUpdate.queue([instance.document_id], ["taxonomies"])
+
+
+@receiver(post_save, sender=Label)
+def label_saved(sender, instance, created, **kwargs):
+    """Update the labels of the label's documents in the search index, in case its code changed."""
+    if DEDConfig.autosync_enabled() and not kwargs["raw"] and not created:
+        PendingSearchUpdate.queue(
+            instance.coredocument_set.values_list("pk", flat=True), ["labels"]
+        )
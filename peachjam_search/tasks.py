@@ -4,14 +4,13 @@ from background_task import background
 from django.apps import apps
 from django.db import transaction
 from django_elasticsearch_dsl.apps import DEDConfig
-from django_elasticsearch_dsl.signals import (
-    BaseSignalProcessor,
-    RealTimeSignalProcessor,
-)
+from django_elasticsearch_dsl.signals import RealTimeSignalProcessor
 
 from peachjam.models import CoreDocument
 from peachjam_search.documents import SearchableDocument
-from peachjam_search.models import SearchTrace
+from peachjam_search.index_updates import IndexUpdater
+from peachjam_search.models import PendingSearchUpdate, SearchTrace
+from peachjam_search.result_cache import SearchResultCache
 
 log = logging.getLogger(__name__)
 
@@ -28,25 +27,73 @@ class BackgroundTaskSearchProcessor(RealTimeSignalProcessor):
 
     def handle_pre_delete(self, sender, instance, **kwargs):
         # an instance of a model potentially related to a CoreDocument (but not a CoreDocument itself) is being deleted
-        # if it's related, queue up a re-index of the CoreDocument
-        self.update_if_core_document(sender, instance, **kwargs)
+        # if it's related, queue up updates of the related documents now, while the relationship still exists
+        if (
+            DEDConfig.autosync_enabled()
+            and not isinstance(instance, CoreDocument)
+            and self.is_related(instance)
+        ):
+            queue_search_updates(instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        super().handle_delete(sender, instance, **kwargs)
+        if isinstance(instance, CoreDocument):
+            SearchResultCache.bump_generation()
+
+    def handle_m2m_changed(self, sender, instance, action, **kwargs):
+        if sender is CoreDocument.labels.through:
+            # only the labels field needs updating
+            if DEDConfig.autosync_enabled():
+                if isinstance(instance, CoreDocument):
+                    if action in ("post_add", "post_remove", "post_clear"):
+                        PendingSearchUpdate.queue([instance.pk], ["labels"])
+                elif action in ("post_add", "post_remove"):
+                    # a label was added to or removed from documents
+                    PendingSearchUpdate.queue(kwargs["pk_set"], ["labels"])
+                elif action == "pre_clear":
+                    # a label is about to be removed from all its documents
+                    PendingSearchUpdate.queue(
+                        instance.coredocument_set.values_list("pk", flat=True),
+                        ["labels"],
+                    )
+            return
+
+        super().handle_m2m_changed(sender, instance, action, **kwargs)
 
     def update_if_core_document(self, sender, instance, **kwargs):
         """If the instance is a CoreDocument or a model related to a CoreDocument, queue up a re-index."""
         if not DEDConfig.autosync_enabled() or kwargs.get("raw"):
             return
 
-        # Check if instance is in the list of related models or is a CoreDocument,
-        related_models = SearchableDocument.django.related_models
-        if any(isinstance(instance, cls) for cls in [CoreDocument, *related_models]):
-            # queue up the task for 60 seconds from now, so that quick edits to the document don't all trigger
-            # a re-index
+        if isinstance(instance, CoreDocument):
+            # queue it up with other documents to be re-indexed in bulk a little later, so that quick edits to the
+            # document don't all trigger a re-index
+            PendingSearchUpdate.queue([instance.pk], [PendingSearchUpdate.FULL])
+        elif self.is_related(instance):
+            # finding the related documents can be slow, so do it in the background; queue up the task for 60
+            # seconds from now, so that quick edits don't all trigger it
             search_model_saved(instance.__class__._meta.label, instance.pk, schedule=60)
 
+    def is_related(self, instance):
+        return any(
+            isinstance(instance, cls)
+            for cls in SearchableDocument.django.related_models
+        )
 
-def get_processor():
-    config = apps.get_app_config("django_elasticsearch_dsl")
-    return BaseSignalProcessor(config.signal_processor.connections)
+
+def queue_search_updates(instance):
+    """Queue up search index updates for a CoreDocument, or for the documents related to an instance of a related
+    model. For related models, only the fields that depend on the model are updated, if possible.
+    """
+    if isinstance(instance, CoreDocument):
+        PendingSearchUpdate.queue([instance.pk], [PendingSearchUpdate.FULL])
+        return
+
+    sd = SearchableDocument()
+    docs = sd.get_instances_from_related(instance)
+    if docs is not None:
+        fields = sd.get_fields_from_related(instance) or [PendingSearchUpdate.FULL]
+        PendingSearchUpdate.queue(docs.values_list("pk", flat=True), fields)
 
 
 @background(queue="peachjam", remove_existing_tasks=True)
@@ -57,7 +104,14 @@ def search_model_saved(model_name, pk):
         log.info(f"Model {model_name} with pk {pk} does not exist. Ignoring task.")
         return
 
-    get_processor().handle_save(model_name, instance)
+    queue_search_updates(instance)
+
+
+@background(queue="peachjam")
+def apply_pending_search_updates():
+    if IndexUpdater().apply_pending():
+        # cached search results may now be stale
+        SearchResultCache.bump_generation()
 
 
 @background(queue="peachjam", remove_existing_tasks=True)
@@ -0,0 +1,156 @@
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from elasticsearch_dsl.response import Response
+
+from peachjam.models import CoreDocument, TimelineEvent, UserFollowing
+from peachjam_search.alerts import SavedSearchEvaluator
+from peachjam_search.models import SavedSearch
+
+
+class SavedSearchEvaluatorTest(TestCase):
+    fixtures = ["tests/countries", "tests/users", "documents/sample_documents"]
+
+    @patch("peachjam_search.compiler.RetrieverSearch.execute", autospec=True)
+    def test_identical_searches_execute_once(self, mock_search):
+        doc = CoreDocument.objects.first()
+        doc.created_at = timezone.now()
+        doc.date = timezone.now().date()
+        doc.save()
+        queries = []
+
+        def resp(search):
+            queries.append(search.to_dict())
+            return Response(
+                search,
+                {
+                    "_shards": {"failed": 0},
+                    "hits": {
+                        "total": {"value": 1},
+                        "hits": [
+                            {
+                                "_id": str(doc.pk),
+                                "_index": "test",
+                                "_score": 1.0,
+                                "_source": {
+                                    "expression_frbr_uri": doc.expression_frbr_uri
+                                },
+                            }
+                        ],
+                    },
+                },
+            )
+
+        mock_search.side_effect = resp
+
+        last_week = timezone.now() - timedelta(days=7)
+        follows = []
+        for user in User.objects.all()[:2]:
+            saved_search = SavedSearch.objects.create(
+                user=user, q="test", filters="nature=Judgment"
+            )
+            # a follow is created for each new saved search
+            follow = saved_search.followers.get()
+            follow.last_alerted_at = last_week
+            follow.save()
+            follows.append(follow)
+
+        SavedSearchEvaluator().update_follows(
+            UserFollowing.objects.filter(pk__in=[f.pk for f in follows])
+        )
+
+        self.assertEqual(1, len(queries))
+        self.assertIn(
+            json.dumps({"range": {"created_at": {"gt": last_week.isoformat()}}}),
+            json.dumps(queries[0]),
+        )
+        self.assertEqual(
+            2,
+            TimelineEvent.objects.filter(
+                user_following__in=follows,
+                event_type=TimelineEvent.EventTypes.SAVED_SEARCH,
+            ).count(),
+        )
+
+    @patch("peachjam_search.compiler.RetrieverSearch.execute", autospec=True)
+    def test_follows_with_different_watermarks(self, mock_search):
+        now = timezone.now()
+        old_doc, new_doc = CoreDocument.objects.all()[:2]
+        CoreDocument.objects.filter(pk=old_doc.pk).update(
+            created_at=now - timedelta(days=5), date=now.date()
+        )
+        CoreDocument.objects.filter(pk=new_doc.pk).update(
+            created_at=now, date=now.date()
+        )
+        last_week = now - timedelta(days=7)
+        yesterday = now - timedelta(days=1)
+        queries = []
+
+        def resp(search):
+            query = json.dumps(search.to_dict())
+            queries.append(query)
+            # the group's search finds the older document first, and fills the page of one hit
+            doc = new_doc if yesterday.isoformat() in query else old_doc
+            return Response(
+                search,
+                {
+                    "_shards": {"failed": 0},
+                    "hits": {
+                        "total": {"value": 2},
+                        "hits": [
+                            {
+                                "_id": str(doc.pk),
+                                "_index": "test",
+                                "_score": 1.0,
+                                "_source": {
+                                    "expression_frbr_uri": doc.expression_frbr_uri
+                                },
+                            }
+                        ],
+                    },
+                },
+            )
+
+        mock_search.side_effect = resp
+
+        follows = []
+        for user, watermark in zip(User.objects.all()[:2], [last_week, yesterday]):
+            saved_search = SavedSearch.objects.create(
+                user=user, q="test", filters="nature=Judgment"
+            )
+            follow = saved_search.followers.get()
+            follow.last_alerted_at = watermark
+            follow.save()
+            follows.append(follow)
+
+        evaluator = SavedSearchEvaluator()
+        evaluator.page_size = 1
+        evaluator.update_follows(
+            UserFollowing.objects.filter(pk__in=[f.pk for f in follows])
+        )
+
+        # the follow with the newer watermark searched again, and found the new document
+        self.assertEqual(2, len(queries))
+        events = TimelineEvent.objects.filter(
+            event_type=TimelineEvent.EventTypes.SAVED_SEARCH
+        )
+        self.assertEqual(
+            [old_doc.work_id],
+            [
+                w.pk
+                for e in events.filter(user_following=follows[0])
+                for w in e.subject_works.all()
+            ],
+        )
+        self.assertEqual(
+            [new_doc.work_id],
+            [
+                w.pk
+                for e in events.filter(user_following=follows[1])
+                for w in e.subject_works.all()
+            ],
+        )
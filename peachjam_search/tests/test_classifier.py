@@ -1,7 +1,7 @@
 from unittest import TestCase
 from unittest.mock import Mock
 
-from peachjam_search.classifier import QueryClassifier
+from peachjam_search.classifier import CachingQueryClassifier, QueryClassifier
 
 
 class ClassifierTest(TestCase):
@@ -71,3 +71,43 @@ class ClassifierTest(TestCase):
         self.assertEqual(qclass.label.value, "case_name")
         self.assertEqual(qclass.confidence, 1.0)
         model.predict_queries.assert_not_called()
+
+
+class CachingClassifierTest(TestCase):
+    def test_cached_queries_are_not_reclassified(self):
+        model = Mock()
+        model.predict_queries.return_value = [("legal_term", 0.9)]
+        cls = CachingQueryClassifier(ml_classifier=model)
+
+        first = cls.classify("appeal")
+        second = cls.classify("  * appeal")
+
+        self.assertEqual(first.label.value, "legal_term")
+        self.assertEqual(second.label.value, "legal_term")
+        self.assertEqual(second.query, "  * appeal")
+        model.predict_queries.assert_called_once_with(["appeal"])
+
+    def test_misses_are_batched_and_deduplicated(self):
+        model = Mock()
+        model.predict_queries.side_effect = lambda qs: [("legal_term", 0.9)] * len(qs)
+        cls = CachingQueryClassifier(ml_classifier=model, batch_size=2)
+
+        qclasses = cls.classify_queries(
+            ["appeal", "bail", "appeal", "review", "Donoghue v Stevenson"]
+        )
+
+        self.assertEqual(5, len(qclasses))
+        self.assertEqual("case_name", qclasses[4].label.value)
+        self.assertEqual(
+            [(["appeal", "bail"],), (["review"],)],
+            [c.args for c in model.predict_queries.call_args_list],
+        )
+
+    def test_cache_is_bounded(self):
+        model = Mock()
+        model.predict_queries.side_effect = lambda qs: [("legal_term", 0.9)] * len(qs)
+        cls = CachingQueryClassifier(ml_classifier=model, cache_size=2)
+
+        cls.classify_queries(["appeal", "bail", "review"])
+
+        self.assertEqual(["bail", "review"], list(cls.cache.keys()))
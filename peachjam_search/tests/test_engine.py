@@ -1,7 +1,10 @@
 import json
 from dataclasses import replace
+from threading import Event
 from unittest.mock import Mock, call, patch
 
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
 from django.http import QueryDict
 from django.test import TestCase  # noqa
 
@@ -10,10 +13,12 @@ from peachjam_search.engine import (
     PortionSearchEngine,
     PortionSearchFilters,
     SearchEngine,
+    get_search_executor,
     make_portion_search_query,
 )
 from peachjam_search.forms import SearchForm
 from peachjam_search.profiles import SearchProfile, SearchProfileSet
+from peachjam_search.result_cache import SearchResultCache
 from peachjam_search.search_pipeline import (
     FilterClause,
     FilteredWeight,
@@ -807,6 +812,62 @@ class TestSearchEngine(TestCase):
             json.dumps(d, indent=2, sort_keys=True),
         )
 
+    def test_cached_response_has_aggregations(self):
+        params = QueryDict("", mutable=True)
+        params["search"] = "test"
+        params["nature"] = "Act"
+        params["facets"] = "language"
+
+        engine = legacy_engine()
+        form = SearchForm(params)
+        self.assertTrue(form.is_valid())
+        form.configure_engine(engine)
+        engine.result_cache = SearchResultCache(
+            cache=LocMemCache("engine-results-test", {})
+        )
+        aggs = engine.build_search().to_dict()["aggs"]
+
+        data = {
+            "_shards": {"failed": 0},
+            "hits": {"total": {"value": 0}, "hits": []},
+            "aggregations": {},
+        }
+        response = Mock()
+        response.to_dict.return_value = data
+        engine.result_cache.get_or_execute(engine.search_query, lambda: response)
+
+        engine.set_search_query(engine.search_query)
+        with patch.object(engine, "compile") as mock_compile:
+            cached = engine.execute()
+
+        mock_compile.assert_not_called()
+        self.assertEqual(aggs, cached._search.to_dict()["aggs"])
+
+    def test_cached_concurrent_search_does_not_fetch_embedding(self):
+        engine = legacy_engine()
+        engine.set_search_query(
+            replace(engine.search_query, query="test", mode="hybrid")
+        )
+        engine.result_cache = SearchResultCache(
+            cache=LocMemCache("engine-concurrent-test", {})
+        )
+        response = Mock()
+        response.to_dict.return_value = {
+            "_shards": {"failed": 0},
+            "hits": {"total": {"value": 0}, "hits": []},
+        }
+        engine.result_cache.get_or_execute(engine.search_query, lambda: response)
+
+        with patch.object(
+            engine.compiler, "get_query_embedding"
+        ) as mock_get_query_embedding:
+            es_response, side_result = engine.execute_concurrently(lambda: "side")
+
+        mock_get_query_embedding.assert_not_called()
+        self.assertEqual("side", side_result)
+        self.assertEqual(0, es_response.hits.total.value)
+        self.assertIsNotNone(engine.plan)
+
     def test_gazette_publication_filters(self):
         params = QueryDict("", mutable=True)
         params["publication"] = "Government Gazette"
@@ -1964,3 +2025,47 @@ class TestSearchEngine(TestCase):
             retrievers[0]["standard"]["query"]["bool"]["filter"],
         )
         self.assertEqual(expected_filters, retrievers[1]["standard"]["filter"])
+
+    def test_hybrid_uses_prefetched_embedding(self):
+        engine = legacy_engine()
+        engine.set_search_query(
+            replace(engine.search_query, query="test", mode="hybrid")
+        )
+
+        with patch.object(
+            engine.compiler, "get_query_embedding", return_value=[0.1, 0.2]
+        ) as mock_get_query_embedding:
+            engine.prefetch_embedding(get_search_executor())
+            search = engine.build_search()
+
+        mock_get_query_embedding.assert_called_once_with("test")
+        self.assertFalse(engine.lexical_fallback)
+        self.assertIn("retriever", search.to_dict())
+        self.assertIn("embedding_wait", engine.timings)
+        self.assertIn("compile", engine.timings)
+
+    def test_hybrid_falls_back_to_text_when_embedding_is_slow(self):
+        engine = legacy_engine()
+        engine.set_search_query(
+            replace(engine.search_query, query="test", mode="hybrid")
+        )
+        release = Event()
+
+        def slow_embedding(query):
+            release.wait(5)
+            return [0.1, 0.2]
+
+        with patch.object(
+            engine.compiler, "get_query_embedding", side_effect=slow_embedding
+        ):
+            with self.settings(
+                PEACHJAM={**settings.PEACHJAM, "SEARCH_EMBEDDING_BUDGET": 0.01}
+            ):
+                engine.prefetch_embedding(get_search_executor())
+                search = engine.build_search()
+            release.set()
+
+        self.assertTrue(engine.lexical_fallback)
+        self.assertEqual("text", engine.plan.mode)
+        self.assertNotIn("retriever", search.to_dict())
+        self.assertTrue(engine.timings["lexical_fallback"])
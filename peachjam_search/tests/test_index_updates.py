@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+from background_task.models import Task
+from django.test import TestCase
+
+from peachjam.models import CoreDocument, Court, DocumentTopic, Label, Taxonomy
+from peachjam_search.documents import SearchableDocument
+from peachjam_search.index_updates import IndexUpdater
+from peachjam_search.models import PendingSearchUpdate
+from peachjam_search.tasks import apply_pending_search_updates, queue_search_updates
+
+
+class IndexUpdaterTestCase(TestCase):
+    fixtures = ["tests/countries", "documents/sample_documents"]
+
+    def setUp(self):
+        self.doc = CoreDocument.objects.filter(published=True).first()
+        root = Taxonomy.add_root(name="Collections")
+        self.topic = Taxonomy.objects.get(pk=root.pk).add_child(name="Land Rights")
+        DocumentTopic.objects.create(document=self.doc, topic=self.topic)
+        self.label = Label.objects.create(name="Reported", code="reported")
+        self.doc.labels.add(self.label)
+        PendingSearchUpdate.objects.all().delete()
+
+    def apply_pending(self):
+        """Apply pending updates, returning the actions that would be sent to elasticsearch."""
+        actions = []
+
+        def bulk(client, action_iter, **kwargs):
+            actions.extend(action_iter)
+            return len(actions), []
+
+        with patch("peachjam_search.index_updates.helpers.bulk", side_effect=bulk):
+            IndexUpdater().apply_pending()
+        return actions
+
+    def test_queue_collapses_duplicates(self):
+        PendingSearchUpdate.queue([self.doc.pk, self.doc.pk], ["labels"])
+        PendingSearchUpdate.queue([self.doc.pk], ["labels", "ranking"])
+        self.assertEqual(2, PendingSearchUpdate.objects.count())
+
+    def test_apply_pending(self):
+        PendingSearchUpdate.queue([self.doc.pk], ["ranking", "labels", "taxonomies"])
+        actions = self.apply_pending()
+
+        sd = SearchableDocument()
+        self.assertEqual(1, len(actions))
+        self.assertEqual("update", actions[0]["_op_type"])
+        self.assertEqual(self.doc.pk, actions[0]["_id"])
+        self.assertEqual(
+            {
+                "ranking": sd.prepare_ranking(self.doc),
+                "labels": sd.prepare_labels(self.doc),
+                "taxonomies": sorted(sd.prepare_taxonomies(self.doc)),
+            },
+            actions[0]["doc"],
+        )
+        self.assertFalse(PendingSearchUpdate.objects.exists())
+
+        # only queued fields are updated
+        PendingSearchUpdate.queue([self.doc.pk], ["labels"])
+        actions = self.apply_pending()
+        self.assertEqual({"labels": sd.prepare_labels(self.doc)}, actions[0]["doc"])
+        self.assertIn("reported", actions[0]["doc"]["labels"])
+
+    def test_failed_updates_are_retried(self):
+        PendingSearchUpdate.queue([self.doc.pk], ["ranking"])
+        with patch("peachjam_search.index_updates.helpers.bulk", side_effect=IOError):
+            with self.assertRaises(IOError):
+                IndexUpdater().apply_pending()
+        self.assertTrue(PendingSearchUpdate.objects.exists())
+
+    def test_apply_is_scheduled_once(self):
+        Task.objects.all().delete()
+        PendingSearchUpdate.queue([self.doc.pk], ["ranking"])
+        PendingSearchUpdate.queue([self.doc.pk], ["labels"])
+        self.assertEqual(
+            1,
+            Task.objects.filter(task_name=apply_pending_search_updates.name).count(),
+        )
+
+    def test_queue_document(self):
+        queue_search_updates(self.doc)
+        self.assertEqual(
+            [(self.doc.pk, PendingSearchUpdate.FULL)],
+            list(PendingSearchUpdate.objects.values_list("document_id", "field")),
+        )
+
+    def test_queue_and_apply_related(self):
+        court = Court.objects.get(pk=1)
+        judgment = court.judgment_set.filter(published=True).first()
+        queue_search_updates(court)
+
+        fields = set(
+            PendingSearchUpdate.objects.filter(document_id=judgment.pk).values_list(
+                "field", flat=True
+            )
+        )
+        self.assertIn("court", fields)
+        self.assertNotIn(PendingSearchUpdate.FULL, fields)
+
+        actions = self.apply_pending()
+        action = [a for a in actions if a["_id"] == judgment.pk][0]
+        self.assertEqual("update", action["_op_type"])
+        self.assertEqual(court.name, action["doc"]["court"])
+
+    def test_full_reindex(self):
+        PendingSearchUpdate.queue([self.doc.pk], [PendingSearchUpdate.FULL])
+        with patch(
+            "peachjam_search.index_updates.SearchableDocument.update",
+            return_value=(1, []),
+        ) as update:
+            IndexUpdater().apply_pending()
+        update.assert_called_once()
+        self.assertEqual([self.doc.pk], [d.pk for d in update.call_args[0][0]])
+        self.assertFalse(PendingSearchUpdate.objects.exists())
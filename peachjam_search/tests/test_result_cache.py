@@ -0,0 +1,112 @@
+import threading
+from dataclasses import replace
+from unittest.mock import Mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from peachjam_search.result_cache import SearchResultCache
+from peachjam_search.search_pipeline import SearchQuery
+
+
+def make_response(data):
+    response = Mock()
+    response.to_dict.return_value = data
+    return response
+
+
+class SearchResultCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("search-results-test", {})
+        self.cache.clear()
+        self.result_cache = SearchResultCache(cache=self.cache)
+        self.search_query = SearchQuery(
+            query="constitution",
+            field_queries={},
+            mode="text",
+            filters={"nature": ["Act"]},
+            facets=list(SearchQuery.default_facets),
+            page=1,
+            page_size=10,
+            ordering="-score",
+            explain=False,
+        )
+        self.data = {
+            "_shards": {"failed": 0},
+            "hits": {"total": {"value": 1}, "hits": [{"_id": "1"}]},
+            "aggregations": {"nature": {"buckets": []}},
+        }
+
+    def test_identical_queries_are_cached(self):
+        execute = Mock(return_value=make_response(self.data))
+
+        self.result_cache.get_or_execute(self.search_query, execute)
+        data = self.result_cache.get_or_execute(
+            replace(self.search_query, filters={"nature": ["Act"]}), execute
+        )
+
+        self.assertEqual(self.data, data)
+        execute.assert_called_once()
+
+    def test_generation_bump_invalidates(self):
+        execute = Mock(return_value=make_response(self.data))
+
+        self.result_cache.get_or_execute(self.search_query, execute)
+        SearchResultCache.bump_generation(self.cache)
+        self.result_cache.get_or_execute(self.search_query, execute)
+
+        self.assertEqual(2, execute.call_count)
+
+    def test_evicted_generation_does_not_revive_stale_results(self):
+        execute = Mock(return_value=make_response(self.data))
+
+        self.result_cache.get_or_execute(self.search_query, execute)
+        SearchResultCache.bump_generation(self.cache)
+        self.result_cache.get_or_execute(self.search_query, execute)
+        # the generation is evicted, the results from before the bump must not be used
+        self.cache.delete(SearchResultCache.generation_key)
+        self.result_cache.get_or_execute(self.search_query, execute)
+
+        self.assertEqual(3, execute.call_count)
+
+    def test_facets_reused_from_results(self):
+        execute = Mock(return_value=make_response(self.data))
+
+        self.result_cache.get_or_execute(self.search_query, execute)
+        data = self.result_cache.get_or_execute(
+            replace(self.search_query, page_size=0, ordering="-date"), execute
+        )
+
+        execute.assert_called_once()
+        self.assertEqual({"value": 1}, data["hits"]["total"])
+        self.assertEqual([], data["hits"]["hits"])
+        self.assertEqual(self.data["aggregations"], data["aggregations"])
+
+    def test_concurrent_queries_are_coalesced(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def execute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return make_response(self.data)
+
+        results = []
+
+        def search():
+            results.append(self.result_cache.get_or_execute(self.search_query, execute))
+
+        leader = threading.Thread(target=search)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=search) for _ in range(3)]
+        for t in followers:
+            t.start()
+        release.set()
+        for t in [leader, *followers]:
+            t.join(5)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual([self.data] * 4, results)
@@ -274,8 +274,11 @@ class SearchViewsTest(TestCase):
         self.assertIn("canDebugSearch", source)
         self.assertIn("/search/debug/", source)
 
+    @patch("elasticsearch.Elasticsearch.close_point_in_time")
+    @patch("elasticsearch.Elasticsearch.open_point_in_time")
     @patch("peachjam_search.compiler.RetrieverSearch.execute", autospec=True)
-    def test_download(self, mock_search):
+    def test_download(self, mock_search, mock_open_pit, mock_close_pit):
+        mock_open_pit.return_value = {"id": "pit-id"}
         doc = CoreDocument.objects.first()
         # this tests escaping dodgy chars in xlsx
         doc.title = "Title with \x02 dodgy char"
@@ -315,6 +318,59 @@ class SearchViewsTest(TestCase):
         )
         self.assertIn("no-cache", response.headers["Cache-Control"])
 
+    @patch("elasticsearch.Elasticsearch.close_point_in_time")
+    @patch("elasticsearch.Elasticsearch.open_point_in_time")
+    @patch("peachjam_search.compiler.RetrieverSearch.execute", autospec=True)
+    def test_download_csv_pages_through_all_results(
+        self, mock_search, mock_open_pit, mock_close_pit
+    ):
+        docs = list(CoreDocument.objects.all()[:3])
+        mock_open_pit.return_value = {"id": "pit-id"}
+        requests = []
+
+        def resp(search):
+            query = search.to_dict()
+            requests.append(query)
+            start = 0
+            if "search_after" in query:
+                start = query["search_after"][0]
+            page = docs[start : start + 2]
+            return Response(
+                search,
+                {
+                    "_shards": {
+                        "failed": 0,
+                    },
+                    "pit_id": "pit-id",
+                    "hits": {
+                        "hits": [
+                            {"_id": str(doc.pk), "sort": [start + i + 1]}
+                            for i, doc in enumerate(page)
+                        ],
+                    },
+                },
+            )
+
+        mock_search.side_effect = resp
+
+        self.client.force_login(self.user)
+        with patch.object(DocumentSearchView, "download_batch_size", 2):
+            response = self.client.get(
+                reverse("search:search_download") + "?search=test&format=csv"
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            content = b"".join(response.streaming_content).decode("utf-8")
+
+        # header plus one row per document
+        self.assertEqual(4, len(content.strip().splitlines()))
+        for doc in docs:
+            self.assertIn(doc.expression_frbr_uri, content)
+        self.assertEqual(2, len(requests))
+        self.assertEqual({"id": "pit-id", "keep_alive": "2m"}, requests[0]["pit"])
+        self.assertEqual([2], requests[1]["search_after"])
+        mock_close_pit.assert_called_once_with(id="pit-id")
+
     @override_settings(
         PEACHJAM={
             **settings.PEACHJAM,
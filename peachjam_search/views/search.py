@@ -1,4 +1,7 @@
+import csv
+import io
 import json
+import tempfile
 from dataclasses import replace
 from urllib.parse import urlencode, urlparse
 
@@ -8,7 +11,12 @@ from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMix
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Q
-from django.http import HttpResponseRedirect, QueryDict
+from django.http import (
+    FileResponse,
+    HttpResponseRedirect,
+    QueryDict,
+    StreamingHttpResponse,
+)
 from django.http.response import (
     Http404,
     HttpResponse,
@@ -33,6 +41,8 @@ from django.views.generic import (
     UpdateView,
 )
 from django_htmx.http import HttpResponseClientRedirect
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 from rest_framework.mixins import CreateModelMixin
 from rest_framework.permissions import AllowAny
 from rest_framework.viewsets import GenericViewSet
@@ -55,6 +65,7 @@ from peachjam_search.forms import (
     SearchForm,
 )
 from peachjam_search.models import SavedSearch, SearchTrace
+from peachjam_search.result_cache import SearchResultCache
 from peachjam_search.serializers import SearchClickSerializer, SearchHit
 from peachjam_subs.models import Subscription
 
@@ -107,6 +118,8 @@ class DocumentSearchView(TemplateView):
     user_can_debug = False
     # used by the /explain endpoint
     use_explain = False
+    # number of search results to fetch and export at a time when downloading
+    download_batch_size = 1000
 
     def get(self, request, *args, **kwargs):
         self.user_can_debug = self.request.user.has_perm(
@@ -135,14 +148,16 @@ class DocumentSearchView(TemplateView):
         if response:
             return response
 
-        es_response = engine.execute()
+        # match entities while the search is in flight
+        es_response, entity_hits = engine.execute_concurrently(
+            lambda: self.match_entities(engine)
+        )
         trace = self.save_search_trace(engine, es_response.hits.total.value)
 
         hits = SearchHit.from_es_hits(engine, es_response.hits)
         SearchHit.attach_documents(hits)
         # only keep those with documents
         hits = [h for h in hits if h.document]
-        entity_hits = self.match_entities(engine)
 
         response = {
             "count": es_response.hits.total.value,
@@ -232,22 +247,25 @@ class DocumentSearchView(TemplateView):
                 engine.search_query,
                 source=["_id"],
                 explain=False,
+                facets=[],
+                highlight={},
                 page=1,
-                page_size=1000,
+                page_size=self.download_batch_size,
             )
         )
-        response = engine.execute()
-        pks = [int(hit.meta.id) for hit in response.hits]
-
-        dataset = DownloadDocumentsResource().export(
-            DownloadDocumentsResource.get_objects_for_download(pks)
-        )
         fmt = DownloadDocumentsResource.download_formats[
             form.cleaned_data.get("format") or "xlsx"
         ]()
-        data = fmt.export_data(dataset)
+        datasets = self.iter_download_datasets(engine)
 
-        response = HttpResponse(data, content_type=fmt.get_content_type())
+        if fmt.get_extension() == "csv":
+            response = StreamingHttpResponse(
+                self.stream_csv(datasets), content_type=fmt.get_content_type()
+            )
+        else:
+            response = FileResponse(
+                self.build_xlsx(datasets), content_type=fmt.get_content_type()
+            )
         # prevent caching, so that we can enforce download permissions
         add_never_cache_headers(response)
 
@@ -256,13 +274,74 @@ class DocumentSearchView(TemplateView):
 
         return response
 
+    def iter_download_datasets(self, engine):
+        """Yield a dataset for each batch of search results, so that only one batch of documents is in memory
+        at a time. The first dataset is always yielded, even if it is empty, so that the headers are known.
+        """
+        resource = DownloadDocumentsResource()
+        pks = []
+        yielded = False
+
+        for hit in engine.scan():
+            pks.append(int(hit.meta.id))
+            if len(pks) >= self.download_batch_size:
+                yield resource.export(
+                    DownloadDocumentsResource.get_objects_for_download(pks)
+                )
+                yielded = True
+                pks = []
+
+        if pks or not yielded:
+            yield resource.export(
+                DownloadDocumentsResource.get_objects_for_download(pks)
+            )
+
+    def stream_csv(self, datasets):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush():
+            value = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return value
+
+        for i, dataset in enumerate(datasets):
+            if i == 0:
+                writer.writerow(dataset.headers)
+            for row in dataset:
+                writer.writerow(row)
+            yield flush()
+
+    def build_xlsx(self, datasets):
+        """Write the datasets into a write-only workbook, which keeps rows on disk rather than in memory, and return
+        the spooled file ready for streaming."""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+
+        for i, dataset in enumerate(datasets):
+            if i == 0:
+                ws.append(dataset.headers)
+            for row in dataset:
+                ws.append([self.clean_xlsx_value(v) for v in row])
+
+        f = tempfile.TemporaryFile()
+        wb.save(f)
+        f.seek(0)
+        return f
+
+    def clean_xlsx_value(self, value):
+        if isinstance(value, str):
+            return ILLEGAL_CHARACTERS_RE.sub("", value)
+        return value
+
     def make_search_engine(self, form):
         mode = "text"
         if settings.PEACHJAM["SEARCH_SEMANTIC"]:
             mode = form.cleaned_data.get("mode") or mode
         search_query = form.build_search_query(mode=mode)
         search_query = replace(search_query, explain=self.use_explain)
-        return SearchEngine(search_query)
+        return SearchEngine(search_query, result_cache=SearchResultCache())
 
     def make_entity_matcher(self):
         return EntityMatcher.get_instance()
@@ -270,7 +349,8 @@ class DocumentSearchView(TemplateView):
     def match_entities(self, engine):
         if engine.search_query.page != 1 or engine.search_query.field_queries:
             return []
-        return self.make_entity_matcher().match(engine.search_query.query)
+        with engine.timed("entity_matching"):
+            return self.make_entity_matcher().match(engine.search_query.query)
 
     def render(self, response):
         if "html" in self.request.GET and self.user_can_debug:
@@ -335,6 +415,7 @@ class DocumentSearchView(TemplateView):
                 ),
                 query_analysis=analysis_data,
                 search_profile=profile_name,
+                timings=getattr(engine, "timings", None) or None,
             )
 
 